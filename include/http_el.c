@@ -141,6 +141,8 @@ static const uint8_t normal_url_char[32] = {
 #define TOKEN(c) ((c == ' ') ? ' ' : tokens[(unsigned char)c])
 #define IS_URL_CHAR(c) (BIT_AT(normal_url_char, (unsigned char)c) || ((c) & 0x80))
 #define IS_HOST_CHAR(c) (IS_ALPHANUM(c) || (c) == '.' || (c) == '-' || (c) == '_')
+#define IS_CHUNK_STATE(s) ((s) >= s_chunk_size && (s) <= s_chunk_trailer)
+#define IS_HEAD_STATE(s) ((s) <= s_header_value || (s) >= s_resp_start)
 
 
 // States
@@ -165,6 +167,7 @@ typedef enum {
     s_chunk_parameters,
     s_chunk_data,
     s_chunk_complete,
+    s_chunk_trailer,
     s_body_complete,
     s_message_end,
 
@@ -198,11 +201,12 @@ typedef enum {
 
 // Supporting functions
 
-pbuffer * init_pbuffer(size_t size) {
+pbuffer * init_pbuffer(size_t size, size_t max_size) {
     pbuffer *buffer = malloc(sizeof(pbuffer));
     buffer->bytes = malloc(sizeof(char) * size);
     buffer->position = 0;
     buffer->size = size;
+    buffer->max_size = max_size;
 
     return buffer;
 }
@@ -211,6 +215,48 @@ void reset_pbuffer(pbuffer *buffer) {
     buffer->position = 0;
 }
 
+int grow_pbuffer(pbuffer *buffer, size_t min_size) {
+    size_t new_size = buffer->size;
+    char *bytes;
+
+    if (min_size > buffer->max_size) {
+        return ELERR_PBUFFER_OVERFLOW;
+    }
+
+    while (new_size < min_size) {
+        new_size *= 2;
+    }
+
+    if (new_size > buffer->max_size) {
+        new_size = buffer->max_size;
+    }
+
+    bytes = realloc(buffer->bytes, sizeof(char) * new_size);
+
+    if (bytes == NULL) {
+        return ELERR_PBUFFER_OVERFLOW;
+    }
+
+    buffer->bytes = bytes;
+    buffer->size = new_size;
+    return 0;
+}
+
+void shrink_pbuffer(pbuffer *buffer, size_t size) {
+    char *bytes;
+
+    buffer->position = 0;
+
+    if (buffer->size > size) {
+        bytes = realloc(buffer->bytes, sizeof(char) * size);
+
+        if (bytes != NULL) {
+            buffer->bytes = bytes;
+            buffer->size = size;
+        }
+    }
+}
+
 void free_pbuffer(pbuffer *buffer) {
     if (buffer->bytes != NULL) {
         free(buffer->bytes);
@@ -223,11 +269,13 @@ void free_pbuffer(pbuffer *buffer) {
 int store_byte_in_pbuffer(char byte, pbuffer *dest) {
     int retval = 0;
 
-    if (dest-> position + 1 < dest->size) {
+    if (dest->position + 1 >= dest->size) {
+        retval = grow_pbuffer(dest, dest->position + 2);
+    }
+
+    if (!retval) {
         dest->bytes[dest->position] = byte;
         dest->position += 1;
-    } else {
-        retval = ELERR_PBUFFER_OVERFLOW;
     }
 
     return retval;
@@ -236,11 +284,13 @@ int store_byte_in_pbuffer(char byte, pbuffer *dest) {
 int copy_into_pbuffer(const char *source, pbuffer *dest, size_t length) {
     int retval = 0;
 
-    if (dest->position + length < dest->size) {
-        memcpy(dest->bytes, source, length);
+    if (dest->position + length >= dest->size) {
+        retval = grow_pbuffer(dest, dest->position + length + 1);
+    }
+
+    if (!retval) {
+        memcpy(dest->bytes + dest->position, source, length);
         dest->position += length;
-    } else {
-        retval = ELERR_PBUFFER_OVERFLOW;
     }
 
     return retval;
@@ -249,15 +299,27 @@ int copy_into_pbuffer(const char *source, pbuffer *dest, size_t length) {
 void reset_buffer(http_parser *parser) {
     parser->bytes_read = 0;
     parser->index = 0;
+    parser->mark = 0;
 
     reset_pbuffer(parser->buffer);
 }
 
+void mark_buffer(http_parser *parser) {
+    parser->bytes_read = 0;
+    parser->index = 0;
+    parser->mark = parser->buffer->position;
+}
+
 int store_byte(char byte, http_parser *parser) {
     parser->bytes_read += 1;
     return store_byte_in_pbuffer(byte, parser->buffer);
 }
 
+int store_span(const char *span, size_t length, http_parser *parser) {
+    parser->bytes_read += length;
+    return copy_into_pbuffer(span, parser->buffer, length);
+}
+
 int on_cb(http_parser *parser, http_cb cb) {
     return cb(parser);
 }
@@ -266,6 +328,43 @@ int on_data_cb(http_parser *parser, http_data_cb cb) {
     return cb(parser, parser->buffer->bytes, parser->buffer->position);
 }
 
+// Batched header support
+
+int store_header_name(http_parser *parser) {
+    http_header_span *span;
+    size_t new_size;
+
+    if (parser->header_count == parser->header_spans_size) {
+        new_size = parser->header_spans_size * 2;
+        span = realloc(parser->header_spans, sizeof(http_header_span) * new_size);
+
+        if (span == NULL) {
+            return ELERR_OUT_OF_MEMORY;
+        }
+
+        parser->header_spans = span;
+        parser->header_spans_size = new_size;
+    }
+
+    span = &parser->header_spans[parser->header_count];
+    span->name_offset = parser->mark;
+    span->name_length = parser->buffer->position - parser->mark;
+
+    mark_buffer(parser);
+    return 0;
+}
+
+int store_header_value(http_parser *parser) {
+    http_header_span *span = &parser->header_spans[parser->header_count];
+
+    span->value_offset = parser->mark;
+    span->value_length = parser->buffer->position - parser->mark;
+    parser->header_count += 1;
+
+    mark_buffer(parser);
+    return 0;
+}
+
 #if DEBUG_OUTPUT
 char * http_el_state_name(http_el_state state) {
     switch (state) {
@@ -299,6 +398,8 @@ char * http_el_state_name(http_el_state state) {
             return "body complete";
         case s_chunk_complete:
             return "chunk complete";
+        case s_chunk_trailer:
+            return "chunk trailer";
         case s_resp_start:
             return "response start";
         case s_resp_status:
@@ -376,6 +477,11 @@ void reset_http_parser(http_parser *parser) {
     parser->content_length = 0;
     parser->http_major = 0;
     parser->http_minor = 0;
+    parser->header_count = 0;
+
+    if (parser->head != NULL) {
+        reset_pbuffer(parser->head);
+    }
 
     reset_buffer(parser);
     set_header_state(parser, h_general);
@@ -384,17 +490,20 @@ void reset_http_parser(http_parser *parser) {
 }
 
 int read_body(http_parser *parser, const http_parser_settings *settings, const char *data, size_t offset, size_t length) {
-    int retval = 0, real_length = length - offset;
-    size_t read = 0;
+    int retval = 0;
+    size_t read = 0, real_length = length - offset;
 
     if (parser->content_length >= real_length) {
-        retval = settings->on_body(parser, data + offset, real_length);
         read = real_length;
     } else {
-        retval = settings->on_body(parser, data + offset, parser->content_length);
         read = parser->content_length;
     }
 
+    // Raw chunk data goes out along with its framing instead
+    if (parser->state != s_chunk_data || !parser->raw_chunks) {
+        retval = settings->on_body(parser, data + offset, read);
+    }
+
     parser->content_length -= read;
     parser->bytes_read += read;
 
@@ -412,6 +521,39 @@ int read_body(http_parser *parser, const http_parser_settings *settings, const c
     return retval;
 }
 
+void end_chunks(http_parser *parser) {
+    if (parser->raw_chunks) {
+        // The trailer is part of the raw body so it has to be consumed
+        parser->index = 0;
+        set_http_state(parser, s_chunk_trailer);
+    } else {
+        // TODO:Feature - Implement trailing headers
+        //parser->flags |= F_TRAILING;
+        set_http_state(parser, s_body_complete);
+    }
+}
+
+int read_chunk_trailer(http_parser *parser, const http_parser_settings *settings, char next_byte) {
+    switch (next_byte) {
+        case CR:
+            break;
+
+        case LF:
+            // An empty line ends the trailer
+            if (parser->index == 0) {
+                set_http_state(parser, s_body_complete);
+            } else {
+                parser->index = 0;
+            }
+            break;
+
+        default:
+            parser->index = 1;
+    }
+
+    return 0;
+}
+
 int read_chunk_complete(http_parser *parser, const http_parser_settings *settings, char next_byte) {
     int retval = 0;
 
@@ -439,9 +581,7 @@ int read_chunk_parameters(http_parser *parser, const http_parser_settings *setti
 
         case LF:
             if (parser->content_length == 0) {
-                // TODO:Feature - Implement trailing headers
-                //parser->flags |= F_TRAILING;
-                set_http_state(parser, s_body_complete);
+                end_chunks(parser);
             } else {
                 set_http_state(parser, s_chunk_data);
             }
@@ -461,9 +601,7 @@ int read_chunk_size(http_parser *parser, const http_parser_settings *settings, c
 
         case LF:
             if (parser->content_length == 0) {
-                // TODO:Feature - Implement trailing headers
-                //parser->flags |= F_TRAILING;
-                set_http_state(parser, s_body_complete);
+                end_chunks(parser);
             } else {
                 set_http_state(parser, s_chunk_data);
             }
@@ -529,6 +667,8 @@ int process_header_by_state(http_parser *parser, const http_parser_settings *set
         case h_connection:
             if (lower == 'k') {
                 set_header_state(parser, h_matching_connection_keep_alive);
+            } else if (lower == 'c') {
+                set_header_state(parser, h_matching_connection_close);
             } else {
                 set_header_state(parser, h_general);
             }
@@ -558,6 +698,28 @@ int process_header_by_state(http_parser *parser, const http_parser_settings *set
             retval = store_byte(next_byte, parser);
             break;
 
+        case h_matching_connection_close:
+            parser->index += 1;
+            if (parser->index > sizeof(CLOSE) - 1 || lower != CLOSE[parser->index]) {
+                set_header_state(parser, h_general);
+            } else if (parser->index == sizeof(CLOSE) - 2) {
+                // Only a whole token counts, see h_connection_close
+                set_header_state(parser, h_connection_close);
+            }
+
+            retval = store_byte(next_byte, parser);
+            break;
+
+        case h_connection_close:
+            // "close" must end at a token boundary, not run on as "closed"
+            if (next_byte == ',' || next_byte == ' ' || next_byte == '\t') {
+                parser->flags |= F_CONNECTION_CLOSE;
+            }
+
+            set_header_state(parser, h_general);
+            retval = store_byte(next_byte, parser);
+            break;
+
         case h_content_length:
             // TODO(Complexity): refactor into function
             if (!IS_NUM(next_byte)) {
@@ -593,8 +755,18 @@ int read_header_value(http_parser *parser, const http_parser_settings *settings,
             break;
 
         case LF:
-            retval = on_data_cb(parser, settings->on_header_value);
-            reset_buffer(parser);
+            if (parser->header_state == h_connection_close) {
+                // The value ended right after "close"
+                parser->flags |= F_CONNECTION_CLOSE;
+            }
+
+            if (parser->header_spans != NULL) {
+                retval = store_header_value(parser);
+            } else {
+                retval = on_data_cb(parser, settings->on_header_value);
+                reset_buffer(parser);
+            }
+
             set_http_state(parser, s_header_field_start);
             set_header_state(parser, h_general);
             break;
@@ -707,8 +879,13 @@ int read_header_field(http_parser *parser, const http_parser_settings *settings,
             break;
 
         case ':':
-            retval = on_data_cb(parser, settings->on_header_field);
-            reset_buffer(parser);
+            if (parser->header_spans != NULL) {
+                retval = store_header_name(parser);
+            } else {
+                retval = on_data_cb(parser, settings->on_header_field);
+                reset_buffer(parser);
+            }
+
             set_http_state(parser, s_header_value);
             break;
 
@@ -943,12 +1120,136 @@ int start_response(http_parser *parser, const http_parser_settings *settings, ch
     return retval;
 }
 
+// Span scanning
+
+#define WORD_ONES           ((uint64_t) 0x0101010101010101ULL)
+#define WORD_HIGHS          ((uint64_t) 0x8080808080808080ULL)
+#define WORD_HAS_ZERO(w)    (((w) - WORD_ONES) & ~(w) & WORD_HIGHS)
+#define WORD_HAS_BYTE(w, b) WORD_HAS_ZERO((w) ^ (WORD_ONES * (uint8_t) (b)))
+
+size_t scan_header_value(const char *data, size_t length) {
+    size_t index = 0;
+    uint64_t word;
+
+    // Test eight bytes at a time for CR or LF
+    while (index + sizeof(word) <= length) {
+        memcpy(&word, data + index, sizeof(word));
+
+        if (WORD_HAS_BYTE(word, CR) || WORD_HAS_BYTE(word, LF)) {
+            break;
+        }
+
+        index += sizeof(word);
+    }
+
+    while (index < length && data[index] != CR && data[index] != LF) {
+        index++;
+    }
+
+    return index;
+}
+
+size_t scan_header_field(const char *data, size_t length) {
+    size_t index = 0;
+
+    while (index < length && TOKEN(data[index])) {
+        index++;
+    }
+
+    return index;
+}
+
+size_t scan_request_path(const char *data, size_t length) {
+    size_t index = 0;
+
+    while (index < length && IS_URL_CHAR(data[index])) {
+        index++;
+    }
+
+    return index;
+}
+
+int read_span(http_parser *parser, const char *data, size_t length, size_t *read) {
+    size_t span = 0;
+
+    switch (parser->state) {
+        case s_req_path:
+            span = scan_request_path(data, length);
+            break;
+
+        case s_header_field:
+            if (parser->header_state == h_general) {
+                span = scan_header_field(data, length);
+            }
+            break;
+
+        case s_header_value:
+            // Leading whitespace and special headers go byte by byte
+            if (parser->header_state == h_general && (parser->bytes_read > 0
+                    || (data[0] != SPACE && data[0] != '\t'))) {
+                span = scan_header_value(data, length);
+            }
+            break;
+
+        default:
+            break;
+    }
+
+    *read = span;
+    return span > 0 ? store_span(data, span, parser) : 0;
+}
+
+
 // Big state switch
-int http_parser_exec(http_parser *parser, const http_parser_settings *settings, const char *data, size_t length) {
-    int retval = 0, d_index;
+int http_parser_exec(http_parser *parser, const http_parser_settings *settings, const char *data, size_t length, size_t *consumed) {
+    int retval = 0;
+    int raw = 0;
+    size_t d_index, span, raw_mark = 0;
 
     for (d_index = 0; d_index < length; d_index++) {
-        char next_byte = data[d_index];
+        char next_byte;
+
+        // A callback may ask us to stop so the caller can keep what's left
+        if (parser->paused) {
+            break;
+        }
+
+        // Copy runs of plain bytes in one go rather than byte by byte
+        retval = read_span(parser, data + d_index, length - d_index, &span);
+
+        if (!retval && span > 0 && parser->head != NULL) {
+            retval = copy_into_pbuffer(data + d_index, parser->head, span);
+        }
+
+        if (retval) {
+            reset_http_parser(parser);
+            break;
+        }
+
+        d_index += span;
+
+        if (d_index == length) {
+            break;
+        }
+
+        next_byte = data[d_index];
+
+        // Keep the head as read, minus any blank lines in front of it
+        if (parser->head != NULL && IS_HEAD_STATE(parser->state) &&
+                (parser->head->position > 0 || (next_byte != CR && next_byte != LF))) {
+            retval = store_byte_in_pbuffer(next_byte, parser->head);
+
+            if (retval) {
+                reset_http_parser(parser);
+                break;
+            }
+        }
+
+        // Raw chunked bodies are handed out as the bytes seen on the wire
+        if (!raw && parser->raw_chunks && IS_CHUNK_STATE(parser->state)) {
+            raw = 1;
+            raw_mark = d_index;
+        }
 
 #if DEBUG_OUTPUT
         // Get the next character being processed during debug
@@ -1014,8 +1315,10 @@ int http_parser_exec(http_parser *parser, const http_parser_settings *settings,
 
             case s_body:
             case s_chunk_data:
-                read_body(parser, settings, data, d_index, length);
-                d_index += parser->bytes_read;
+                retval = read_body(parser, settings, data, d_index, length);
+
+                // Skip past the body bytes; the loop accounts for the last
+                d_index += parser->bytes_read - 1;
                 reset_buffer(parser);
                 break;
 
@@ -1023,12 +1326,25 @@ int http_parser_exec(http_parser *parser, const http_parser_settings *settings,
                 retval = read_chunk_complete(parser, settings, next_byte);
                 break;
 
+            case s_chunk_trailer:
+                retval = read_chunk_trailer(parser, settings, next_byte);
+                break;
+
             default:
                 retval = ELERR_BAD_STATE;
         }
 
         if (!retval && parser->state == s_body_complete) {
-            retval = on_cb(parser, settings->on_message_complete);
+            if (raw) {
+                raw = 0;
+                retval = settings->on_body(
+                    parser, data + raw_mark, d_index + 1 - raw_mark);
+            }
+
+            if (!retval) {
+                retval = on_cb(parser, settings->on_message_complete);
+            }
+
             reset_http_parser(parser);
         }
 
@@ -1038,9 +1354,23 @@ int http_parser_exec(http_parser *parser, const http_parser_settings *settings,
         }
     }
 
+    // Hand out whatever part of a raw chunked body this call has seen
+    if (raw && !retval && d_index > raw_mark) {
+        retval = settings->on_body(parser, data + raw_mark, d_index - raw_mark);
+
+        if (retval) {
+            reset_http_parser(parser);
+        }
+    }
+
+    *consumed = d_index;
     return retval;
 }
 
+void http_parser_pause(http_parser *parser, int paused) {
+    parser->paused = paused ? 1 : 0;
+}
+
 
 void http_parser_init(http_parser *parser, enum http_parser_type parser_type) {
     // Preserve app_data ref
@@ -1052,15 +1382,83 @@ void http_parser_init(http_parser *parser, enum http_parser_type parser_type) {
     // Set up the struct elements
     parser->app_data = app_data;
     parser->type = parser_type;
-    parser->buffer = init_pbuffer(HTTP_MAX_HEADER_SIZE);
+    parser->buffer = init_pbuffer(
+        HTTP_INITIAL_HEADER_SIZE, HTTP_MAX_HEADER_SIZE);
     reset_http_parser(parser);
 }
 
+void http_parser_reinit(http_parser *parser, enum http_parser_type parser_type) {
+    // Give back any memory a large head may have made the buffer grow to
+    shrink_pbuffer(parser->buffer, HTTP_INITIAL_HEADER_SIZE);
+
+    if (parser->head != NULL) {
+        shrink_pbuffer(parser->head, HTTP_INITIAL_HEADER_SIZE);
+    }
+
+    parser->type = parser_type;
+    parser->paused = 0;
+    reset_http_parser(parser);
+}
+
+void http_parser_set_max_header_size(http_parser *parser, size_t max_size) {
+    if (max_size < HTTP_INITIAL_HEADER_SIZE) {
+        max_size = HTTP_INITIAL_HEADER_SIZE;
+    }
+
+    parser->buffer->max_size = max_size;
+
+    if (parser->head != NULL) {
+        parser->head->max_size = max_size;
+    }
+}
+
 void free_http_parser(http_parser *parser) {
+    http_parser_batch_headers(parser, 0);
+    http_parser_capture_head(parser, 0);
     free_pbuffer(parser->buffer);
     free(parser);
 }
 
+int http_parser_batch_headers(http_parser *parser, int enabled) {
+    if (enabled && parser->header_spans == NULL) {
+        parser->header_spans = malloc(
+            sizeof(http_header_span) * HTTP_HEADER_SPANS_INIT);
+
+        if (parser->header_spans == NULL) {
+            return ELERR_OUT_OF_MEMORY;
+        }
+
+        parser->header_spans_size = HTTP_HEADER_SPANS_INIT;
+    } else if (!enabled && parser->header_spans != NULL) {
+        free(parser->header_spans);
+        parser->header_spans = NULL;
+        parser->header_spans_size = 0;
+    }
+
+    parser->header_count = 0;
+    return 0;
+}
+
+int http_parser_capture_head(http_parser *parser, int enabled) {
+    if (enabled && parser->head == NULL) {
+        parser->head = init_pbuffer(
+            HTTP_INITIAL_HEADER_SIZE, parser->buffer->max_size);
+
+        if (parser->head == NULL) {
+            return ELERR_PBUFFER_OVERFLOW;
+        }
+    } else if (!enabled && parser->head != NULL) {
+        free_pbuffer(parser->head);
+        parser->head = NULL;
+    }
+
+    return 0;
+}
+
+void http_parser_raw_chunks(http_parser *parser, int enabled) {
+    parser->raw_chunks = enabled ? 1 : 0;
+}
+
 int http_message_needs_eof(const http_parser *parser) {
     // If this is a request, no
     if (parser->type == HTTP_REQUEST) {
@@ -12,10 +12,17 @@ extern "C" {
 #define HTTP_EL_VERSION_MINOR 1
 
 #define HTTP_MAX_HEADER_SIZE (80 * 1024)
+#define HTTP_INITIAL_HEADER_SIZE 1024
+
+// Batched header spans start with room for this many headers and double
+// as needed. There's no limit on the number of headers other than the one
+// max_header_size puts on the whole head.
+#define HTTP_HEADER_SPANS_INIT 32
 
 
 // Type defs
 typedef struct pbuffer pbuffer;
+typedef struct http_header_span http_header_span;
 typedef struct http_parser http_parser;
 typedef struct http_parser_settings http_parser_settings;
 
@@ -50,6 +57,7 @@ enum HTTP_EL_ERROR {
     ELERR_BAD_CHUNK_SIZE = 10,
     ELERR_BAD_DATA_AFTER_CHUNK = 11,
     ELERR_BAD_STATUS_CODE = 12,
+    ELERR_OUT_OF_MEMORY = 13,
 
     ELERR_BAD_METHOD = 100,
 
@@ -62,6 +70,14 @@ struct pbuffer {
     char *bytes;
     size_t position;
     size_t size;
+    size_t max_size;
+};
+
+struct http_header_span {
+    size_t name_offset;
+    size_t name_length;
+    size_t value_offset;
+    size_t value_length;
 };
 
 struct http_parser_settings {
@@ -84,6 +100,8 @@ struct http_parser {
     unsigned char header_state;
     unsigned char type;
     unsigned char index;
+    unsigned char paused;
+    unsigned char raw_chunks;
 
     // Reserved fields
     unsigned long content_length;
@@ -99,6 +117,15 @@ struct http_parser {
 
     // Buffer
     pbuffer *buffer;
+    size_t mark;
+
+    // Head as read - NULL unless head capture is enabled
+    pbuffer *head;
+
+    // Batched header spans - NULL unless batching is enabled
+    http_header_span *header_spans;
+    size_t header_count;
+    size_t header_spans_size;
 
     // Optionally settable application data pointer
     void *app_data;
@@ -108,8 +135,14 @@ struct http_parser {
 // Functions
 void http_parser_init(http_parser *parser, enum http_parser_type parser_type);
 void free_http_parser(http_parser *parser);
-
-int http_parser_exec(http_parser *parser, const http_parser_settings *settings, const char *data, size_t len);
+void http_parser_reinit(http_parser *parser, enum http_parser_type parser_type);
+void http_parser_set_max_header_size(http_parser *parser, size_t max_size);
+int http_parser_batch_headers(http_parser *parser, int enabled);
+void http_parser_raw_chunks(http_parser *parser, int enabled);
+int http_parser_capture_head(http_parser *parser, int enabled);
+
+int http_parser_exec(http_parser *parser, const http_parser_settings *settings, const char *data, size_t len, size_t *consumed);
+void http_parser_pause(http_parser *parser, int paused);
 int http_should_keep_alive(const http_parser *parser);
 int http_transfer_encoding_chunked(const http_parser *parser);
 
@@ -1,4 +1,9 @@
 from .pipeline import (handles_request_head, handles_request_body,
                        handles_response_head, handles_response_body,
                        HttpFilter, HttpFilterPipeline, consume, reject,
-                       route, reply, next)
+                       route, reply, next, selects, intercept_body)
+from .offload import offload, configure_offload, THREAD_POOL, PROCESS_POOL
+from .stats import (enable_filter_stats, filter_stats, reset_filter_stats,
+                    format_filter_stats)
+from .cache import memoize, header_key, LruCache
+from .rules import HeaderRulesFilter, parse_rule
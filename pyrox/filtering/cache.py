@@ -0,0 +1,195 @@
+import time
+import functools
+import collections
+
+from tornado.concurrent import Future, chain_future
+from tornado.ioloop import IOLoop
+
+from .pipeline import FilterAction, _as_future
+
+
+"""
+Returned by LruCache.get for keys that have no live entry. None is a value
+that may be cached.
+"""
+MISSING = object()
+
+
+# Expiry only needs a clock that never goes backwards
+_clock = getattr(time, 'monotonic', time.time)
+
+
+class LruCache(object):
+    """
+    A bounded cache whose entries expire ttl seconds after they were stored.
+    Once full, the least recently used entry is evicted to make room. A
+    cache of max_entries 0 stores nothing.
+
+    Attributes:
+        hits        Number of lookups that found a live entry.
+        misses      Number of lookups that did not.
+        evictions   Number of entries removed to make room for new ones.
+    """
+    def __init__(self, max_entries=1024, ttl=60):
+        if max_entries < 0:
+            raise ValueError('max_entries may not be negative')
+
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Returns the value cached under key or MISSING if there is none or it
+        has expired.
+        """
+        entry = self._entries.pop(key, None)
+
+        if entry is None or entry[0] <= _clock():
+            self.misses += 1
+            return MISSING
+
+        # Reinserting moves the entry to the most recently used end
+        self._entries[key] = entry
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        if self.max_entries == 0:
+            return
+
+        self._entries.pop(key, None)
+
+        while len(self._entries) >= self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+        self._entries[key] = (_clock() + self.ttl, value)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        """
+        Returns a dictionary with the counters and size of this cache.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries)
+        }
+
+
+def header_key(header_name):
+    """
+    Returns a key function for memoize that keys on the values of the named
+    header of the message being filtered. Messages without the header are
+    not cached.
+    """
+    def key(head, *extra):
+        header = head.get_header(header_name)
+
+        if header is None or not header.values:
+            return None
+
+        return tuple(header.values)
+    return key
+
+
+def _is_transient(result):
+    return isinstance(result, FilterAction) and result.transient
+
+
+def memoize(key, ttl=60, max_entries=1024):
+    """
+    This function decorator may be used to cache what a filter handler
+    returns, either a FilterAction or any other value it computes, by a key
+    taken from the message it is given. Repeat calls with the same key are
+    answered from the cache without calling the handler.
+    ::
+        @filtering.handles_request_head
+        @filtering.memoize(filtering.header_key('X-Auth-Token'), ttl=300)
+        def on_request_head(self, request_head):
+            ...
+
+    Handlers may return futures. While the future for a key is pending,
+    other calls with the same key wait on it instead of calling the handler
+    again, and only successful results are cached. Actions marked transient,
+    such as the rejections of overloaded offloaded handlers, are never
+    cached.
+
+    The cache belongs to the decorated function so every instance of the
+    filter shares it. It is available as the cache attribute of the handler.
+
+    :param key: a function given the same arguments as the handler, less
+                self, that returns a hashable key or None to skip the cache
+                for that call. A string is taken as a header name to key on.
+    :param ttl: seconds that an entry is used for after it was cached
+    :param max_entries: number of entries kept before the least recently
+                        used one is evicted
+    """
+    if not callable(key):
+        key = header_key(key)
+
+    def decorator(handler_func):
+        cache = LruCache(max_entries, ttl)
+        pending = dict()
+
+        def on_done(cache_key, future):
+            del pending[cache_key]
+
+            if future.exception() is None:
+                result = future.result()
+
+                if not _is_transient(result):
+                    cache.put(cache_key, result)
+
+        @functools.wraps(handler_func)
+        def memoized(self, *args):
+            cache_key = key(*args)
+
+            if cache_key is None:
+                return handler_func(self, *args)
+
+            result = cache.get(cache_key)
+
+            if result is not MISSING:
+                return result
+
+            waiting = pending.get(cache_key)
+
+            if waiting is not None:
+                # Coalesce with the call already in flight for this key
+                future = Future()
+                chain_future(waiting, future)
+                return future
+
+            result = handler_func(self, *args)
+            future = _as_future(result)
+
+            if future is not None:
+                pending[cache_key] = future
+                IOLoop.current().add_future(
+                    future, functools.partial(on_done, cache_key))
+                return future
+
+            if not _is_transient(result):
+                cache.put(cache_key, result)
+
+            return result
+
+        # The pipeline checks the handler's own arguments, not ours
+        memoized._wrapped_handler = getattr(
+            handler_func, '_wrapped_handler', handler_func)
+        memoized.cache = cache
+        return memoized
+
+    return decorator
+
@@ -0,0 +1,154 @@
+import functools
+
+from tornado.ioloop import IOLoop
+
+try:
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+except ImportError:
+    # Python 2 needs the futures backport for this
+    ThreadPoolExecutor = None
+    ProcessPoolExecutor = None
+
+from pyrox.http import get_template
+from pyrox.http.templates import OVERLOADED
+from .pipeline import FilterAction, REPLY
+
+
+"""
+Pools that filter handlers may be offloaded to.
+"""
+THREAD_POOL = 'thread'
+PROCESS_POOL = 'process'
+
+
+_POOL_SIZES = {
+    THREAD_POOL: 4,
+    PROCESS_POOL: None
+}
+
+_EXECUTORS = dict()
+
+# Handlers offloaded to the process pool by the key workers find them under
+_PROCESS_HANDLERS = dict()
+
+
+def configure_offload(thread_pool_size=4, process_pool_size=None):
+    """
+    Sets the number of workers in the pools that offloaded filter handlers
+    run in. A process pool size of None uses one worker per CPU. Pools are
+    only started the first time a handler is offloaded to them, so this must
+    be called before that happens.
+    """
+    _POOL_SIZES[THREAD_POOL] = thread_pool_size
+    _POOL_SIZES[PROCESS_POOL] = process_pool_size
+
+
+def _executor(pool):
+    executor = _EXECUTORS.get(pool)
+
+    if executor is None:
+        if ThreadPoolExecutor is None:
+            raise ImportError(
+                'Offloading filters requires concurrent.futures. On Python 2 '
+                'install the futures package.')
+
+        if pool == THREAD_POOL:
+            executor = ThreadPoolExecutor(_POOL_SIZES[THREAD_POOL])
+        elif pool == PROCESS_POOL:
+            executor = ProcessPoolExecutor(_POOL_SIZES[PROCESS_POOL])
+        else:
+            raise ValueError('Unknown offload pool: {}'.format(pool))
+
+        _EXECUTORS[pool] = executor
+
+    return executor
+
+
+def _handler_key(handler_func):
+    # Stable across processes and unaffected by how the class names it
+    code = handler_func.__code__
+    return '{}:{}:{}'.format(
+        handler_func.__module__, code.co_name, code.co_firstlineno)
+
+
+def _call_offloaded(http_filter, key, args):
+    # Runs in a worker process where unpickling the filter imported the
+    # module that registered the handler
+    return _PROCESS_HANDLERS[key](http_filter, *args)
+
+
+class _QueueLimit(object):
+    """
+    Counts the calls a handler has waiting in or running on its pool. Both
+    ends of the count are only ever touched from the IOLoop.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self.outstanding = 0
+
+    def acquire(self):
+        if self.limit is not None and self.outstanding >= self.limit:
+            return False
+
+        self.outstanding += 1
+        return True
+
+    def release(self, future=None):
+        self.outstanding -= 1
+
+
+def offload(handler=None, pool=THREAD_POOL, queue_limit=None):
+    """
+    This function decorator may be used to run a request head handler in a
+    thread or process pool instead of on the IOLoop. It may be used as is or
+    called with arguments. The pipeline suspends until the handler's result
+    is back on the IOLoop.
+    ::
+        @filtering.handles_request_head
+        @filtering.offload(queue_limit=64)
+        def on_request_head(self, request_head):
+            ...
+
+    Handlers offloaded to the process pool get pickled copies of the filter
+    and the request so any changes they make to either are lost. Only the
+    returned action comes back.
+
+    :param pool: the pool to run the handler in, either THREAD_POOL or
+                 PROCESS_POOL
+    :param queue_limit: the number of calls to this handler that may be
+                        waiting or running at once. Requests over the limit
+                        are rejected with the overloaded response template.
+    """
+    def decorator(handler_func):
+        limit = _QueueLimit(queue_limit)
+
+        if pool == PROCESS_POOL:
+            key = _handler_key(handler_func)
+            _PROCESS_HANDLERS[key] = handler_func
+
+        @functools.wraps(handler_func)
+        def offloaded(self, *args):
+            if not limit.acquire():
+                # Overloads pass so they must never be cached as a decision
+                return FilterAction(
+                    REPLY, (get_template(OVERLOADED), None), transient=True)
+
+            if pool == PROCESS_POOL:
+                future = _executor(pool).submit(
+                    _call_offloaded, self, key, args)
+            else:
+                future = _executor(pool).submit(handler_func, self, *args)
+
+            IOLoop.current().add_future(future, limit.release)
+            return future
+
+        # The pipeline checks the handler's own arguments, not ours
+        offloaded._offloaded = handler_func
+        offloaded._wrapped_handler = getattr(
+            handler_func, '_wrapped_handler', handler_func)
+        offloaded._queue_limit = limit
+        return offloaded
+
+    if handler is not None:
+        return decorator(handler)
+    return decorator
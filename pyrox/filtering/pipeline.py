@@ -1,8 +1,16 @@
 import inspect
 
-from pyrox.http import HttpResponse
+from tornado import gen
+from tornado.concurrent import Future, chain_future, is_future
+from tornado.ioloop import IOLoop
+
+from pyrox.http import get_template
+from pyrox.http.selection import HttpMessageSelector, SelectorIndex
+from pyrox.http.templates import REJECTION
 from pyrox.log import get_logger
 
+from . import stats
+
 _LOG = get_logger(__name__)
 
 
@@ -14,13 +22,15 @@ CONSUME = 1
 REJECT = 2
 ROUTE = 3
 REPLY = 4
+INTERCEPT_BODY = 5
 
 _ACTION_NAMES = {
     0: 'NEXT_FILTER',
     1: 'CONSUME',
     2: 'REJECT',
     3: 'ROUTE',
-    4: 'REPLY'
+    4: 'REPLY',
+    5: 'INTERCEPT_BODY'
 }
 
 _BREAKING_ACTIONS = (CONSUME, REJECT, ROUTE, REPLY)
@@ -37,10 +47,18 @@ class FilterAction(object):
         kind        An integer value representing the kind of action this
                     object is intended to communicate.
         payload     An argument to be passed on to the consumer of this action.
+                    Replies and rejections carry a (response, body) tuple
+                    where the response is either an HttpResponse or a
+                    read-only ResponseTemplate.
+        transient   True when the action was decided by the state of the
+                    proxy rather than by the message, such as a rejection
+                    because a handler is overloaded. Caches do not keep
+                    transient actions.
     """
-    def __init__(self, kind=NEXT_FILTER, payload=None):
+    def __init__(self, kind=NEXT_FILTER, payload=None, transient=False):
         self.kind = kind
         self.payload = payload
+        self.transient = transient
 
     def breaks_pipeline(self):
         return self.kind in _BREAKING_ACTIONS
@@ -78,17 +96,30 @@ def handles_request_head(request_func):
     return request_func
 
 
-def handles_request_body(request_func):
+def handles_request_body(request_func=None, on_demand=False):
     """
     This function decorator may be used to mark a method as usable for
-    intercepting request body content.
+    intercepting request body content. It may be used as is or called with
+    arguments.
 
     handles_request_body will intercept the HTTP content in chunks as it
     arrives. This method, like others in the filter class may return a
     FilterAction.
+
+    :param on_demand: when True the handler is only given the bodies of
+                      requests that a request head handler of the same
+                      filter returned intercept_body() for. Requests that
+                      no body handler wants keep their framing and are
+                      passed through as read.
     """
-    request_func._handles_request_body = True
-    return request_func
+    def decorator(handler_func):
+        handler_func._handles_request_body = True
+        handler_func._on_demand = on_demand
+        return handler_func
+
+    if request_func is not None:
+        return decorator(request_func)
+    return decorator
 
 
 def handles_response_head(request_func):
@@ -104,17 +135,52 @@ def handles_response_head(request_func):
     return request_func
 
 
-def handles_response_body(request_func):
+def handles_response_body(request_func=None, on_demand=False):
     """
     This function decorator may be used to mark a method as usable for
-    intercepting response body content.
+    intercepting response body content. It may be used as is or called with
+    arguments.
 
     handles_response_body will intercept the HTTP content in chunks as they
     arrives. This method, like others in the filter class, may return a
     FilterAction.
+
+    :param on_demand: when True the handler is only given the bodies of
+                      responses that a response head handler of the same
+                      filter returned intercept_body() for.
     """
-    request_func._handles_response_body = True
-    return request_func
+    def decorator(handler_func):
+        handler_func._handles_response_body = True
+        handler_func._on_demand = on_demand
+        return handler_func
+
+    if request_func is not None:
+        return decorator(request_func)
+    return decorator
+
+
+def selects(path=None, path_prefix=None, methods=None, status_codes=None):
+    """
+    This class decorator may be used to limit the messages a filter sees.
+    Handlers of the filter are only called for requests whose path matches
+    the path regular expression from its start and starts with path_prefix
+    and whose method is one of methods. Response handlers are also limited
+    to the given status codes. Criteria that are left out match anything.
+    ::
+        @filtering.selects(path_prefix='/v1/', methods=('PUT', 'POST'))
+        class UploadFilter(filtering.HttpFilter):
+            ...
+
+    The selectors of all of the filters in a pipeline are evaluated
+    together, once per message, so filters that are not selected cost
+    nothing.
+    """
+    selector = HttpMessageSelector(path, path_prefix, methods, status_codes)
+
+    def decorator(filter_cls):
+        filter_cls._selector = selector
+        return filter_cls
+    return decorator
 
 
 class HttpFilter(object):
@@ -125,19 +191,12 @@ class HttpFilter(object):
     pass
 
 
-"""
-Default return object. This should be configurable.
-"""
-_DEFAULT_REJECT_RESP = HttpResponse()
-_DEFAULT_REJECT_RESP.version = b'1.1'
-_DEFAULT_REJECT_RESP.status = '400 Bad Request'
-_DEFAULT_REJECT_RESP.header('Content-Length').values.append('0')
-
 """
 Default filter action singletons.
 """
 _DEFAULT_PASS_ACTION = FilterAction(NEXT_FILTER)
 _DEFAULT_CONSUME_ACTION = FilterAction(CONSUME)
+_INTERCEPT_BODY_ACTION = FilterAction(INTERCEPT_BODY)
 
 
 def consume():
@@ -155,8 +214,15 @@ def reply(response, src=None):
     This call may optionally include a stream or a data blob to take the
     place of the response content body.
 
-    :param response: the response object to reply to the client with
+    :param response: the response object to reply to the client with or the
+                     name of a registered response template
     """
+    if isinstance(response, str):
+        template = get_template(response)
+
+        # The writer changes the framing of responses that carry a body
+        response = template if src is None else template.new_response()
+
     return FilterAction(REPLY, (response, src))
 
 
@@ -168,10 +234,13 @@ def reject(response=None):
     parameter is not provided then the function will default to the configured
     default response.
 
-    :param response: the response object to reply to the client with
+    :param response: the response object to reply to the client with or the
+                     name of a registered response template
     """
     if response is None:
-        return FilterAction(REPLY, (_DEFAULT_REJECT_RESP, None))
+        return FilterAction(REPLY, (get_template(REJECTION), None))
+    elif isinstance(response, str):
+        return FilterAction(REPLY, (get_template(response), None))
     else:
         return FilterAction(REPLY, (response, None))
 
@@ -197,6 +266,141 @@ def next():
     return _DEFAULT_PASS_ACTION
 
 
+def intercept_body():
+    """
+    Asks for the body of the message whose head is being handled to be given
+    to the on_demand body handlers of the filter. The head is passed down
+    the filter chain as with next().
+    """
+    return _INTERCEPT_BODY_ACTION
+
+
+def _takes_extra_args(method, event_arg_count):
+    """
+    Returns True if the handler method wants more than the event arguments
+    that every handler of its kind is passed, e.g. the request that goes
+    with a response.
+    """
+    try:
+        argspec = inspect.getfullargspec(method)
+    except AttributeError:
+        argspec = inspect.getargspec(method)
+
+    # Bound methods still list self
+    return len(argspec.args) != event_arg_count + 1
+
+
+"""
+Handler tables of the filter classes seen so far, keyed by class.
+"""
+_HANDLER_TABLES = dict()
+
+
+"""
+Decorator markers and the pipeline chains that the handlers they mark are
+added to along with how many event arguments every such handler gets.
+"""
+_HANDLER_KINDS = (
+    ('_handles_request_head', '_req_head_chain', 1),
+    ('_handles_request_body', '_req_body_chain', 2),
+    ('_handles_response_head', '_resp_head_chain', 1),
+    ('_handles_response_body', '_resp_body_chain', 2))
+
+
+"""
+Chains that filters intercept message bodies with.
+"""
+_BODY_CHAINS = ('_req_body_chain', '_resp_body_chain')
+
+
+"""
+Phases that the handlers of each chain are timed under.
+"""
+_CHAIN_PHASES = {
+    '_req_head_chain': stats.REQUEST_HEAD,
+    '_req_body_chain': stats.REQUEST_BODY,
+    '_resp_head_chain': stats.RESPONSE_HEAD,
+    '_resp_body_chain': stats.RESPONSE_BODY
+}
+
+
+def _discover_handlers(http_filter):
+    table = list()
+
+    for name, finst in inspect.getmembers(http_filter, inspect.ismethod):
+        _LOG.debug('Checking function instance {} for decorators'.format(finst))
+
+        # Wrapped handlers are called with what the handler itself takes
+        handler = getattr(finst, '_wrapped_handler', finst)
+
+        # Assume that if an attribute exists then it is decorated
+        for marker, chain_name, event_arg_count in _HANDLER_KINDS:
+            if hasattr(finst, marker):
+                _LOG.debug('Function instance {} is marked {}'.format(
+                    finst, marker))
+
+                if (hasattr(finst, '_offloaded') and
+                        marker != '_handles_request_head'):
+                    raise TypeError(
+                        'Only request head handlers may be offloaded: '
+                        '{}'.format(finst))
+
+                table.append((
+                    name,
+                    chain_name,
+                    _takes_extra_args(handler, event_arg_count),
+                    getattr(finst, '_on_demand', False)))
+
+    return tuple(table)
+
+
+def _handler_table(http_filter):
+    """
+    Returns the decorated handlers of the filter's class as a tuple of
+    (method name, chain name, takes extra args, on demand) entries. Filter classes are
+    only inspected the first time an instance of them is added.
+    """
+    cls = http_filter.__class__
+    table = _HANDLER_TABLES.get(cls)
+
+    if table is None:
+        table = _discover_handlers(http_filter)
+        _HANDLER_TABLES[cls] = table
+
+    return table
+
+
+def _as_future(result):
+    """
+    Returns the future a handler returned in place of a FilterAction or None
+    if it returned something else. Native coroutines are turned into
+    futures.
+    """
+    if is_future(result):
+        return result
+
+    if _is_coroutine(result):
+        return gen.convert_yielded(result)
+
+    return None
+
+
+def _is_coroutine(result):
+    # Native coroutines only exist on Python 3.5+
+    iscoroutine = getattr(inspect, 'iscoroutine', None)
+    return iscoroutine is not None and iscoroutine(result)
+
+
+def _filter_name(http_filter):
+    cls = http_filter.__class__
+    return '{}.{}'.format(cls.__module__, cls.__name__)
+
+
+def _request_path(request_head):
+    # Selectors look at the path only, not the query string
+    return request_head.url.split('?', 1)[0]
+
+
 class HttpFilterPipeline(object):
     """
     The filter pipeline represents a series of filters. This pipeline currently
@@ -206,6 +410,15 @@ class HttpFilterPipeline(object):
     chain, meaning that state may not be shared between requests during the
     lifetime of the filter chain or its filters.
 
+    Request head handlers may return a Future, or be coroutines, instead of
+    returning a FilterAction. The pipeline then suspends and on_request_head
+    returns a Future for the final action. The rest of the chain is run on
+    the IOLoop once the handler's future resolves.
+
+    Once a head has been filtered, wants_request_body and wants_response_body
+    tell whether any body handler is going to look at the body that follows
+    it. Bodies that no handler wants may be passed through as read.
+
 
     :param chain: A list of HttpFilter objects organized to act as a pipeline
                   with element 0 being the first to receive events.
@@ -216,56 +429,199 @@ class HttpFilterPipeline(object):
         self._resp_head_chain = list()
         self._resp_body_chain = list()
 
+        # Selectors of the filters added and their compiled index
+        self._selectors = list()
+        self._index = None
+
+        # Filters that are selected or intercept bodies on demand get a bit
+        self._next_bit = 1
+        self._unselective = 0
+        self._req_on_demand = 0
+        self._resp_on_demand = 0
+        self._req_body_bits = 0
+        self._resp_body_bits = 0
+
+        # Set when a body handler that is always called is added
+        self._req_body_always = False
+        self._resp_body_always = False
+
+        # The filters selected by the message currently being filtered and
+        # those of them that asked for its body
+        self._req_selected = 0
+        self._resp_selected = 0
+        self._req_demanded = 0
+        self._resp_demanded = 0
+
     def intercepts_req_body(self):
         return len(self._req_body_chain) > 0
 
     def intercepts_resp_body(self):
         return len(self._resp_body_chain) > 0
 
-    def add_filter(self, http_filter):
-        filter_methods = inspect.getmembers(http_filter, inspect.ismethod)
+    def wants_request_body(self):
+        """
+        Returns True if any body handler is going to be called for the body
+        of the request whose head was filtered last.
+        """
+        return self._req_body_always or bool(
+            self._req_body_bits & self._request_body_selection())
+
+    def wants_response_body(self):
+        """
+        Returns True if any body handler is going to be called for the body
+        of the response whose head was filtered last.
+        """
+        return self._resp_body_always or bool(
+            self._resp_body_bits & self._response_body_selection())
 
-        for method in filter_methods:
-            if len(method) < 1:
+    def add_filter(self, http_filter):
+        """
+        Adds the decorated handlers of http_filter to the pipeline. What each
+        handler should be called with is worked out here so that dispatching
+        an event costs no more than calling the handlers.
+        """
+        selector = getattr(http_filter, '_selector', None)
+        table = _handler_table(http_filter)
+        on_demand = any(entry[3] for entry in table)
+        bit = 0
+
+        if selector is not None or on_demand:
+            # The filter gets a bit of its own in the selection masks
+            bit = self._next_bit
+            self._next_bit <<= 1
+
+            if selector is not None:
+                self._selectors.append((bit, selector))
+                self._index = None
+            else:
+                self._unselective |= bit
+
+        for name, chain_name, takes_extra, on_demand in table:
+            method = getattr(http_filter, name)
+
+            if chain_name == '_req_body_chain':
+                self._req_body_bits |= bit
+                self._req_body_always |= bit == 0
+
+                if on_demand:
+                    self._req_on_demand |= bit
+            elif chain_name == '_resp_body_chain':
+                self._resp_body_bits |= bit
+                self._resp_body_always |= bit == 0
+
+                if on_demand:
+                    self._resp_on_demand |= bit
+
+            # Timing is decided here so dispatch never checks for it
+            if stats.filter_stats_enabled():
+                method = stats.timed(method, stats.histogram_for(
+                    _filter_name(http_filter), _CHAIN_PHASES[chain_name]))
+
+            getattr(self, chain_name).append((method, takes_extra, bit))
+
+    def clone(self):
+        """
+        Returns a new pipeline that dispatches to the same filter instances
+        as this one.
+        """
+        pipeline = HttpFilterPipeline()
+        pipeline._req_head_chain = list(self._req_head_chain)
+        pipeline._req_body_chain = list(self._req_body_chain)
+        pipeline._resp_head_chain = list(self._resp_head_chain)
+        pipeline._resp_body_chain = list(self._resp_body_chain)
+        pipeline._selectors = list(self._selectors)
+        pipeline._index = self._selector_index()
+        pipeline._next_bit = self._next_bit
+        pipeline._unselective = self._unselective
+        pipeline._req_on_demand = self._req_on_demand
+        pipeline._resp_on_demand = self._resp_on_demand
+        pipeline._req_body_bits = self._req_body_bits
+        pipeline._resp_body_bits = self._resp_body_bits
+        pipeline._req_body_always = self._req_body_always
+        pipeline._resp_body_always = self._resp_body_always
+        return pipeline
+
+    def _selector_index(self):
+        if self._index is None and self._selectors:
+            self._index = SelectorIndex(self._selectors)
+        return self._index
+
+    def _select_request(self, request_head):
+        index = self._selector_index()
+
+        if index is None:
+            return self._unselective
+
+        return self._unselective | index.select_request(
+            request_head.method, _request_path(request_head))
+
+    def _select_response(self, response_head, request_head=None):
+        index = self._selector_index()
+
+        if index is None:
+            return self._unselective
+
+        if request_head is None:
+            return self._unselective | index.select_response(
+                response_head.status)
+
+        return self._unselective | index.select_response(
+            response_head.status, request_head.method,
+            _request_path(request_head))
+
+    def _request_body_selection(self):
+        return ((self._req_selected & ~self._req_on_demand) |
+                (self._req_demanded & self._req_on_demand))
+
+    def _response_body_selection(self):
+        return ((self._resp_selected & ~self._resp_on_demand) |
+                (self._resp_demanded & self._resp_on_demand))
+
+    def _demand_body(self, chain, bit):
+        # Filters without a bit are given every body anyway
+        if chain is self._req_head_chain:
+            self._req_demanded |= bit
+        else:
+            self._resp_demanded |= bit
+
+    def _run_head(self, chain, start, last_action, head, extra, suspendable,
+                  selected):
+        for idx in range(start, len(chain)):
+            method, takes_extra, bit = chain[idx]
+
+            # Skip filters whose selector doesn't want this message
+            if bit and not selected & bit:
                 continue
 
-            finst = method[1]
-            _LOG.debug('Checking function instance {} for decorators'.format(finst))
-
-            # Assume that if an attribute exists then it is decorated
-            if hasattr(finst, '_handles_request_head'):
-                _LOG.debug('Function instance {} handles request head'.format(finst))
-                self._req_head_chain.append((http_filter, finst))
-
-            if hasattr(finst, '_handles_request_body'):
-                _LOG.debug('Function instance {} handles request body'.format(finst))
-                self._req_body_chain.append((http_filter, finst))
-
-            if hasattr(finst, '_handles_response_head'):
-                _LOG.debug('Function instance {} handles response head'.format(finst))
-                self._resp_head_chain.append((http_filter, finst))
-
-            if hasattr(finst, '_handles_response_body'):
-                _LOG.debug('Function instance {} handles response body'.format(finst))
-                self._resp_body_chain.append((http_filter, finst))
-
-    def _on_head(self, chain, *args):
-        last_action = next()
-
-        for http_filter, method in chain:
             try:
-                argspec = inspect.getargspec(method)
-
-                if len(argspec.args) == 2:
-                    action = method(*args[0:1])
+                if takes_extra:
+                    action = method(head, *extra)
                 else:
-                    action = method(*args)
+                    action = method(head)
 
             except Exception as ex:
                 _LOG.exception(ex)
                 action = reject()
 
             if action is not None:
+                if suspendable and not isinstance(action, FilterAction):
+                    future = _as_future(action)
+
+                    if future is not None:
+                        return self._suspend_head(
+                            future, chain, idx + 1, last_action, head, extra,
+                            selected)
+                elif is_future(action) or _is_coroutine(action):
+                    # Nothing waits on futures here so treat them as errors
+                    _LOG.error('Filter handler {} returned a future where '
+                               'it may not suspend.'.format(
+                                   getattr(method, '__name__', method)))
+                    action = reject()
+
+                if action.kind == INTERCEPT_BODY:
+                    self._demand_body(chain, bit)
+                    continue
+
                 last_action = action
 
                 if action.breaks_pipeline():
@@ -273,16 +629,51 @@ class HttpFilterPipeline(object):
 
         return last_action
 
-    def _on_body(self, chain, *args):
-        last_action = next()
+    def _suspend_head(self, future, chain, resume_at, last_action, head,
+                      extra, selected):
+        outcome = Future()
+
+        def on_action(done):
+            try:
+                action = done.result()
+            except Exception as ex:
+                _LOG.exception(ex)
+                action = reject()
+
+            if action is not None and action.kind == INTERCEPT_BODY:
+                self._demand_body(chain, chain[resume_at - 1][2])
+                action = None
+
+            if action is None:
+                action = last_action
+            elif action.breaks_pipeline():
+                outcome.set_result(action)
+                return
+
+            remaining = self._run_head(
+                chain, resume_at, action, head, extra, True, selected)
+
+            if is_future(remaining):
+                chain_future(remaining, outcome)
+            else:
+                outcome.set_result(remaining)
+
+        # Pick the chain back up on the IOLoop whichever thread resolves it
+        IOLoop.current().add_future(future, on_action)
+        return outcome
+
+    def _on_body(self, chain, selected, body_part, output, *extra):
+        last_action = _DEFAULT_PASS_ACTION
+
+        for method, takes_extra, bit in chain:
+            if bit and not selected & bit:
+                continue
 
-        for http_filter, method in chain:
             try:
-                argspec = inspect.getargspec(method)
-                if len(argspec.args) == 3:
-                    action = method(*args[0:2])
+                if takes_extra:
+                    action = method(body_part, output, *extra)
                 else:
-                    action = method(*args)
+                    action = method(body_part, output)
             except Exception as ex:
                 _LOG.exception(ex)
                 action = reject()
@@ -295,13 +686,31 @@ class HttpFilterPipeline(object):
         return last_action
 
     def on_request_head(self, request_head):
-        return self._on_head(self._req_head_chain, request_head)
+        """
+        Runs the request head through the pipeline. Returns the resulting
+        FilterAction or, if a handler suspended the pipeline, a Future that
+        resolves to it.
+        """
+        selected = self._select_request(request_head)
+        self._req_selected = selected
+        self._req_demanded = 0
+
+        return self._run_head(self._req_head_chain, 0, _DEFAULT_PASS_ACTION,
+                              request_head, (), True, selected)
 
     def on_request_body(self, body_part, output):
-        return self._on_body(self._req_body_chain, body_part, output)
+        return self._on_body(self._req_body_chain,
+                             self._request_body_selection(), body_part,
+                             output)
+
+    def on_response_head(self, response_head, *extra):
+        selected = self._select_response(response_head, *extra[:1])
+        self._resp_selected = selected
+        self._resp_demanded = 0
 
-    def on_response_head(self, *args):
-        return self._on_head(self._resp_head_chain, *args)
+        return self._run_head(self._resp_head_chain, 0, _DEFAULT_PASS_ACTION,
+                              response_head, extra, False, selected)
 
     def on_response_body(self, *args):
-        return self._on_body(self._resp_body_chain, *args)
+        return self._on_body(self._resp_body_chain,
+                             self._response_body_selection(), *args)
@@ -0,0 +1,175 @@
+import re
+
+from .pipeline import (HttpFilter, handles_request_head,
+                       handles_response_head, reject)
+
+
+"""
+Phases that header rules apply to.
+"""
+REQUEST = 'request'
+RESPONSE = 'response'
+
+
+"""
+Header rule operations.
+"""
+ADD = 'add'
+SET = 'set'
+REMOVE = 'remove'
+REQUIRE = 'require'
+REJECT = 'reject'
+
+_OPERATIONS = (ADD, SET, REMOVE, REQUIRE, REJECT)
+_TAKES_ARGUMENT = (ADD, SET, REJECT)
+
+
+class HeaderRule(object):
+    """
+    A single header rule as written in the [pipeline] configuration section.
+
+    Attributes:
+        name        The name the rule was configured under.
+        phase       Either REQUEST or RESPONSE.
+        operation   One of ADD, SET, REMOVE, REQUIRE or REJECT.
+        header      The name of the header the rule acts on.
+        argument    The value added or set, or the regular expression that
+                    rejects a message, or None.
+    """
+    __slots__ = ('name', 'phase', 'operation', 'header', 'argument')
+
+    def __init__(self, name, phase, operation, header, argument=None):
+        self.name = name
+        self.phase = phase
+        self.operation = operation
+        self.header = header
+        self.argument = argument
+
+
+def parse_rule(name, spec):
+    """
+    Parses a rule written as "<phase> <operation> <header> [<argument>]"
+    and returns it as a HeaderRule. A ValueError is raised if the rule is
+    malformed.
+    """
+    parts = spec.split(None, 3)
+
+    if len(parts) < 3:
+        raise ValueError('Malformed header rule {}: {}'.format(name, spec))
+
+    phase, operation, header = parts[:3]
+    argument = parts[3] if len(parts) > 3 else None
+
+    if phase not in (REQUEST, RESPONSE):
+        raise ValueError('Unknown phase for header rule {}: {}'.format(
+            name, phase))
+
+    if operation not in _OPERATIONS:
+        raise ValueError('Unknown operation for header rule {}: {}'.format(
+            name, operation))
+
+    if (argument is None) == (operation in _TAKES_ARGUMENT):
+        raise ValueError('Malformed header rule {}: {}'.format(name, spec))
+
+    return HeaderRule(name, phase, operation, header, argument)
+
+
+def _compile_phase(rules):
+    """
+    Groups the rules of one phase by header. Returns a tuple of checks, as
+    (header name, required, pattern) entries with the rejecting expressions
+    of each header folded into one, and a tuple of edits, as (header name,
+    operations) entries that keep the order the rules were given in.
+    """
+    required = dict()
+    patterns = dict()
+    edits = dict()
+    order = list()
+
+    for rule in rules:
+        nameval = rule.header.lower()
+
+        if nameval not in order:
+            order.append(nameval)
+
+        if rule.operation == REQUIRE:
+            required[nameval] = True
+        elif rule.operation == REJECT:
+            patterns.setdefault(nameval, list()).append(rule.argument)
+        else:
+            edits.setdefault(nameval, list()).append(
+                (rule.operation, rule.header, rule.argument))
+
+    checks = list()
+
+    for nameval in order:
+        if nameval in required or nameval in patterns:
+            pattern = None
+
+            if nameval in patterns:
+                pattern = re.compile('|'.join(
+                    '(?:{})'.format(expr) for expr in patterns[nameval]))
+
+            checks.append((nameval, nameval in required, pattern))
+
+    return (tuple(checks),
+            tuple((nameval, tuple(edits[nameval]))
+                  for nameval in order if nameval in edits))
+
+
+def _apply(checks, edits, head):
+    for nameval, required, pattern in checks:
+        header = head.get_header(nameval)
+
+        if header is None or not header.values:
+            if required:
+                return reject()
+            continue
+
+        if pattern is not None:
+            for value in header.values:
+                if pattern.search(value):
+                    return reject()
+
+    for nameval, operations in edits:
+        for operation, name, argument in operations:
+            if operation == REMOVE:
+                head.remove_header(name)
+            elif operation == SET:
+                head.replace_header(name).values.append(argument)
+            else:
+                head.header(name).values.append(argument)
+
+
+class HeaderRulesFilter(HttpFilter):
+    """
+    Built-in filter that applies the header rules of the [pipeline]
+    configuration section. Rules are grouped by header and their
+    expressions compiled once so a message costs one lookup per header
+    named by the rules, however many rules there are.
+
+    Every check is made against the message as it was received, before
+    any header is changed. A message that is missing a required header or
+    has a header value matching a rejecting expression is rejected.
+    Otherwise the headers are removed, set and added in the order their
+    rules were given.
+
+    Attributes:
+        phases      A frozenset of the phases that there are rules for.
+    """
+    def __init__(self, rules):
+        self.phases = frozenset(rule.phase for rule in rules)
+        self._request_checks, self._request_edits = _compile_phase(
+            [rule for rule in rules if rule.phase == REQUEST])
+        self._response_checks, self._response_edits = _compile_phase(
+            [rule for rule in rules if rule.phase == RESPONSE])
+
+    @handles_request_head
+    def on_request_head(self, request_head):
+        return _apply(self._request_checks, self._request_edits,
+                      request_head)
+
+    @handles_response_head
+    def on_response_head(self, response_head):
+        return _apply(self._response_checks, self._response_edits,
+                      response_head)
@@ -0,0 +1,216 @@
+import time
+import functools
+
+
+"""
+Names of the pipeline phases that filter handlers are timed in.
+"""
+REQUEST_HEAD = 'request_head'
+REQUEST_BODY = 'request_body'
+RESPONSE_HEAD = 'response_head'
+RESPONSE_BODY = 'response_body'
+
+
+"""
+Every power of two of microseconds is split into this many buckets which
+keeps the error of any recorded latency under 12.5%.
+"""
+_SUB_BUCKET_BITS = 3
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+
+
+"""
+Number of buckets in a histogram. The last bucket starts a little over two
+minutes and takes everything above that.
+"""
+_BUCKET_COUNT = 200
+
+
+_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+# Python 2 has no perf_counter
+_clock = getattr(time, 'perf_counter', time.time)
+
+
+_HISTOGRAMS = dict()
+_ENABLED = False
+
+
+def _bucket_index(value):
+    # Values are counted exactly until they need more than
+    # _SUB_BUCKET_BITS + 1 bits, then only their leading bits are kept
+    if value < _SUB_BUCKETS * 2:
+        return value
+
+    shift = value.bit_length() - _SUB_BUCKET_BITS - 1
+    index = _SUB_BUCKETS * (shift + 1) + (value >> shift) - _SUB_BUCKETS
+    return min(index, _BUCKET_COUNT - 1)
+
+
+def _bucket_ceiling(index):
+    if index < _SUB_BUCKETS * 2:
+        return index
+
+    shift, sub_bucket = divmod(index - _SUB_BUCKETS, _SUB_BUCKETS)
+    return ((sub_bucket + _SUB_BUCKETS + 1) << shift) - 1
+
+
+class Histogram(object):
+    """
+    Latency histogram with a fixed set of log-linear buckets in the style of
+    HdrHistogram. Recording a value is a handful of integer operations and
+    the histogram never grows.
+
+    Attributes:
+        count       Number of values recorded.
+        total       Sum of the values recorded in microseconds.
+        min         Smallest value recorded in microseconds.
+        max         Largest value recorded in microseconds.
+    """
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * _BUCKET_COUNT
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, seconds):
+        value = int(seconds * 1000000)
+
+        self.counts[_bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percentile):
+        """
+        Returns the value in microseconds that the given percentage of the
+        recorded values are at or below. Values are only as precise as the
+        bucket they were counted in.
+        """
+        if self.count == 0:
+            return 0
+
+        wanted = max(1, int(round(self.count * percentile / 100.0)))
+        seen = 0
+
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+
+            if seen >= wanted:
+                return min(_bucket_ceiling(index), self.max)
+
+        return self.max
+
+    def snapshot(self):
+        """
+        Returns a dictionary summarizing the histogram. Latencies are in
+        microseconds.
+        """
+        summary = {
+            'count': self.count,
+            'mean': float(self.total) / self.count if self.count else 0,
+            'min': self.min or 0,
+            'max': self.max
+        }
+
+        for percentile in _PERCENTILES:
+            summary['p{:g}'.format(percentile)] = self.percentile(percentile)
+
+        return summary
+
+
+def enable_filter_stats(enabled=True):
+    """
+    Turns timing of filter handlers on or off. Only pipelines that filters
+    are added to afterwards are affected. Handlers added while timing is off
+    are called directly and cost nothing extra.
+    """
+    global _ENABLED
+    _ENABLED = enabled
+
+
+def filter_stats_enabled():
+    return _ENABLED
+
+
+def histogram_for(filter_name, phase):
+    """
+    Returns the histogram that handlers of the named filter record their
+    latency into for the given phase. Instances of the same filter class
+    share their histograms.
+    """
+    key = (filter_name, phase)
+    histogram = _HISTOGRAMS.get(key)
+
+    if histogram is None:
+        histogram = Histogram()
+        _HISTOGRAMS[key] = histogram
+
+    return histogram
+
+
+def timed(handler, histogram):
+    """
+    Returns a function that calls handler and records how long the call took
+    into histogram. Only the time a handler spends on the IOLoop is
+    counted; a future it returns is not waited on.
+    """
+    @functools.wraps(handler)
+    def timed_handler(*args):
+        start = _clock()
+
+        try:
+            return handler(*args)
+        finally:
+            histogram.record(_clock() - start)
+
+    return timed_handler
+
+
+def filter_stats():
+    """
+    Returns the latency summaries of every timed filter as a dictionary of
+    filter names to dictionaries of phases to summaries.
+    """
+    stats = dict()
+
+    for (filter_name, phase), histogram in _HISTOGRAMS.items():
+        stats.setdefault(filter_name, dict())[phase] = histogram.snapshot()
+
+    return stats
+
+
+def reset_filter_stats():
+    """
+    Clears everything recorded so far. Pipelines that are already timing
+    their handlers keep recording into their histograms.
+    """
+    for histogram in _HISTOGRAMS.values():
+        histogram.__init__()
+
+
+def format_filter_stats():
+    """
+    Returns the latency summaries of every timed filter as a table. Latencies
+    are in microseconds.
+    """
+    columns = ['count', 'mean', 'min', 'max']
+    columns.extend('p{:g}'.format(pct) for pct in _PERCENTILES)
+
+    row = '{:<48} {:<14} ' + ' '.join('{:>10}' for column in columns)
+    lines = [row.format('filter', 'phase', *columns)]
+
+    for filter_name, phases in sorted(filter_stats().items()):
+        for phase, summary in sorted(phases.items()):
+            lines.append(row.format(filter_name, phase, *(
+                int(summary[column]) for column in columns)))
+
+    return '\n'.join(lines)
@@ -1,2 +1,5 @@
-from .parser import RequestParser, ResponseParser, ParserDelegate
+from .parser import (RequestParser, ResponseParser, ParserDelegate,
+                     configure_parsers)
 from .model import HttpHeader, HttpMessage, HttpRequest, HttpResponse
+from .templates import (ResponseTemplate, configure_templates, get_template,
+                        register_template)
@@ -1,4 +1,8 @@
-from .model_util import request_to_bytes, response_to_bytes
+from .model_util import (request_into, response_into,
+                         request_to_bytes, response_to_bytes,
+                         spliced_request_to_bytes, spliced_response_to_bytes,
+                         spliced_request_to_buffers,
+                         spliced_response_to_buffers)
 
 
 _EMPTY_HEADER_VALUES = ()
@@ -12,9 +16,11 @@ class HttpHeader(object):
         name        A bytearray or string value representing the field-name of
                     the header.
     """
-    def __init__(self, name):
+    __slots__ = ('name', 'values')
+
+    def __init__(self, name, values=None):
         self.name = name
-        self.values = list()
+        self.values = values if values is not None else list()
 
 
 class HttpMessage(object):
@@ -22,6 +28,10 @@ class HttpMessage(object):
     Parent class for requests and responses. Many of the elements in the
     messages share common structures.
 
+    Headers read by the parser are kept in a flat list of alternating field
+    names and values. A header only gets its own HttpHeader object once it
+    is asked for by name.
+
     Attributes:
         headers     A dictionary of the headers currently stored in this
                     HTTP message.
@@ -33,12 +43,22 @@ class HttpMessage(object):
                     used as a holding place for data that other filters
                     may then access and utilize. Setting entries in this
                     dictionary does not modify the HTTP model in anyway.
+                    Messages use __slots__ so other attributes may not be
+                    set on them; data for other filters belongs here.
     """
+    __slots__ = ('version', '_local_data', '_fields', '_index', '_headers',
+                 '_raw_head', '_raw_start_line', '_header_snapshot')
+
     def __init__(self, version='1.1'):
         self.version = version
-        self.local_data = dict()
 
+        self._local_data = None
+        self._fields = None
+        self._index = None
         self._headers = dict()
+        self._raw_head = None
+        self._raw_start_line = None
+        self._header_snapshot = None
         self.set_default_headers()
 
     def set_default_headers(self):
@@ -48,8 +68,159 @@ class HttpMessage(object):
         """
         pass
 
+    def set_header_fields(self, fields, raw_head=None):
+        """
+        Loads the headers of this message from a flat list of alternating
+        field names and values as handed out by a batching parser. If the
+        raw head the fields were read from is passed as well, to_bytes
+        returns it as is until either the start line or a header is changed.
+        """
+        self._fields = fields
+        self._index = None
+        self._headers = dict()
+        self._header_snapshot = None
+        self._raw_head = raw_head
+
+        if raw_head is not None:
+            self._raw_start_line = self._start_line()
+
+    def _build_index(self):
+        fields = self._fields
+        index = dict()
+
+        for idx in range(0, len(fields), 2):
+            nameval = fields[idx].lower()
+
+            if nameval not in index:
+                index[nameval] = idx
+
+        self._index = index
+        return index
+
+    def _promote(self, nameval):
+        """
+        Returns the header for the lowercased name, creating its HttpHeader
+        out of the flat field list if needed, or None if there's no such
+        header.
+        """
+        header = self._headers.get(nameval)
+
+        if header is None and self._fields:
+            index = self._index
+            if index is None:
+                index = self._build_index()
+
+            first = index.pop(nameval, None)
+
+            if first is not None:
+                fields = self._fields
+                header = HttpHeader(fields[first], [fields[first + 1]])
+                fields[first] = None
+
+                # Repeated fields fold into the same header
+                for idx in range(first + 2, len(fields), 2):
+                    name = fields[idx]
+
+                    if name is not None and name.lower() == nameval:
+                        header.values.append(fields[idx + 1])
+                        fields[idx] = None
+
+                self._headers[nameval] = header
+
+                if self._raw_head is not None:
+                    # Remember what the header looked like in the raw head
+                    if self._header_snapshot is None:
+                        self._header_snapshot = dict()
+
+                    self._header_snapshot[nameval] = (
+                        header, header.name, tuple(header.values))
+
+        return header
+
+    def _modified_headers(self):
+        """
+        Returns the names of the headers that no longer match the raw head.
+        """
+        snapshot = self._header_snapshot
+
+        if snapshot is None:
+            return list(self._headers)
+
+        modified = [nameval for nameval in self._headers
+                    if nameval not in snapshot]
+
+        for nameval, (header, name, values) in snapshot.items():
+            current = self._headers.get(nameval)
+
+            if (current is not header or current.name != name
+                    or tuple(current.values) != values):
+                modified.append(nameval)
+
+        return modified
+
+    def _start_line(self):
+        return (self.version,)
+
+    def to_bytes(self):
+        if self._raw_head is None:
+            return self._serialize()
+
+        keep_start_line = self._start_line() == self._raw_start_line
+        modified = self._modified_headers()
+
+        if keep_start_line and not modified:
+            return self._raw_head
+
+        return self._splice(keep_start_line, modified)
+
+    def to_buffers(self):
+        """
+        Returns the serialized head of this message as a list of buffers
+        meant to be handed to a gathering write. Unlike to_bytes, the head is
+        never copied into a single string.
+        """
+        if self._raw_head is None:
+            return [self._serialize_into(bytearray())]
+
+        keep_start_line = self._start_line() == self._raw_start_line
+        modified = self._modified_headers()
+
+        if keep_start_line and not modified:
+            return [self._raw_head]
+
+        return self._splice_buffers(keep_start_line, modified)
+
+    def write_into(self, buffer):
+        """
+        Serializes the head of this message onto the end of the bytearray
+        passed in and returns it.
+        """
+        if self._raw_head is None:
+            return self._serialize_into(buffer)
+
+        for part in self.to_buffers():
+            buffer.extend(part)
+        return buffer
+
+    @property
+    def local_data(self):
+        if self._local_data is None:
+            self._local_data = dict()
+        return self._local_data
+
+    @local_data.setter
+    def local_data(self, local_data):
+        self._local_data = local_data
+
     @property
     def headers(self):
+        fields = self._fields
+
+        if fields:
+            for idx in range(0, len(fields), 2):
+                if fields[idx] is not None:
+                    self._promote(fields[idx].lower())
+
         return self._headers
 
     def header(self, name):
@@ -60,8 +231,8 @@ class HttpMessage(object):
         returned.
         """
         nameval = name.lower()
-        header = self._headers.get(nameval, None)
-        if not header:
+        header = self._promote(nameval)
+        if header is None:
             header = HttpHeader(name)
             self._headers[nameval] = header
         return header
@@ -80,7 +251,7 @@ class HttpMessage(object):
         Unlike the header function, if the header does not exist then a None
         result is returned.
         """
-        return self._headers.get(name.lower(), None)
+        return self._promote(name.lower())
 
     def remove_header(self, name):
         """
@@ -89,7 +260,7 @@ class HttpMessage(object):
         If the header does not exist then a result of False is returned.
         """
         nameval = name.lower()
-        if nameval in self._headers:
+        if self._promote(nameval) is not None:
             del self._headers[nameval]
             return True
         return False
@@ -106,13 +277,29 @@ class HttpRequest(HttpMessage):
         url         A bytearray or string value representing the requests'
                     uri path including the query and fragment string.
     """
+    __slots__ = ('method', 'url')
+
     def __init__(self):
         super(HttpRequest, self).__init__()
         self.method = None
         self.url = None
 
-    def to_bytes(self):
-        return request_to_bytes(self)
+    def _start_line(self):
+        return (self.method, self.url, self.version)
+
+    def _serialize(self):
+        return request_to_bytes(self, self._fields, self._headers)
+
+    def _serialize_into(self, buffer):
+        return request_into(self, self._fields, self._headers, buffer)
+
+    def _splice(self, keep_start_line, modified):
+        return spliced_request_to_bytes(
+            self, self._raw_head, keep_start_line, modified, self._headers)
+
+    def _splice_buffers(self, keep_start_line, modified):
+        return spliced_request_to_buffers(
+            self, self._raw_head, keep_start_line, modified, self._headers)
 
 
 class HttpResponse(HttpMessage):
@@ -125,9 +312,25 @@ class HttpResponse(HttpMessage):
                     potentially its human readable component delimited by
                     a single space.
     """
+    __slots__ = ('status',)
+
     def __init__(self):
         super(HttpResponse, self).__init__()
         self.status = None
 
-    def to_bytes(self):
-        return response_to_bytes(self)
+    def _start_line(self):
+        return (self.version, self.status)
+
+    def _serialize(self):
+        return response_to_bytes(self, self._fields, self._headers)
+
+    def _serialize_into(self, buffer):
+        return response_into(self, self._fields, self._headers, buffer)
+
+    def _splice(self, keep_start_line, modified):
+        return spliced_response_to_bytes(
+            self, self._raw_head, keep_start_line, modified, self._headers)
+
+    def _splice_buffers(self, keep_start_line, modified):
+        return spliced_response_to_buffers(
+            self, self._raw_head, keep_start_line, modified, self._headers)
@@ -35,9 +35,35 @@ cdef header_to_bytes(char *name, object values, object bytes):
     bytes.extend(b'\r\n')
 
 
-cdef headers_to_bytes(object headers, object bytes):
+cdef field_to_bytes(char *name, object value, object bytes):
+    bytes.extend(name)
+    bytes.extend(b': ')
+    bytes.extend(value)
+    bytes.extend(b'\r\n')
+
+
+cdef headers_to_bytes(object fields, object headers, object bytes):
     cdef int needs_content_length = True
     cdef int has_transfer_encoding = False
+    cdef Py_ssize_t idx
+
+    # Fields that were never looked up are written out as they were read
+    if fields:
+        for idx in range(0, len(fields), 2):
+            name = fields[idx]
+
+            if name is None:
+                continue
+
+            nameval = name.lower()
+
+            if needs_content_length and nameval == 'content-length':
+                needs_content_length = False
+
+            if not has_transfer_encoding and nameval == 'transfer-encoding':
+                has_transfer_encoding = True
+
+            field_to_bytes(name, fields[idx + 1], bytes)
 
     for name, header in headers.items():
         if needs_content_length and name == 'content-length':
@@ -54,24 +80,201 @@ cdef headers_to_bytes(object headers, object bytes):
     bytes.extend(b'\r\n')
 
 
-def request_to_bytes(object http_request):
-    bytes = bytearray()
+cdef list kept_header_runs(object raw_head, object modified):
+    """
+    Returns the (start, end) offsets of the runs of raw header lines whose
+    headers were left alone. Neighbouring lines share a single run.
+    """
+    cdef Py_ssize_t line_start, line_end, colon
+    cdef Py_ssize_t run_start = -1
+    cdef Py_ssize_t head_end = len(raw_head)
+    cdef list runs = list()
+
+    # Skip the start line
+    line_start = raw_head.index(b'\n') + 1
+
+    while line_start < head_end:
+        line_end = raw_head.index(b'\n', line_start) + 1
+        colon = raw_head.find(b':', line_start, line_end)
+
+        if colon < 0:
+            # This is the blank line that ends the head
+            break
+
+        if raw_head[line_start:colon].lower() in modified:
+            if run_start >= 0:
+                runs.append((run_start, line_start))
+                run_start = -1
+        elif run_start < 0:
+            run_start = line_start
+
+        line_start = line_end
+
+    if run_start >= 0:
+        runs.append((run_start, line_start))
+
+    return runs
+
+
+cdef modified_headers_to_bytes(object modified, object headers, object bytes):
+    for name in modified:
+        header = headers.get(name)
+
+        if header is not None:
+            header_to_bytes(header.name, header.values, bytes)
+
+    bytes.extend(b'\r\n')
+
+
+cdef splice_headers(object raw_head, object modified, object headers,
+                    object bytes):
+    # Keep every raw header line whose header was left alone
+    for start, end in kept_header_runs(raw_head, modified):
+        bytes.extend(raw_head[start:end])
+
+    # Then write out the headers that were changed or added
+    modified_headers_to_bytes(modified, headers, bytes)
+
+
+cdef list splice_buffers(object raw_head, object modified, object headers,
+                         list buffers):
+    cdef object view = memoryview(raw_head)
+
+    for start, end in kept_header_runs(raw_head, modified):
+        buffers.append(view[start:end])
+
+    tail = bytearray()
+    modified_headers_to_bytes(modified, headers, tail)
+    buffers.append(tail)
+    return buffers
+
+
+cdef request_line_to_bytes(object http_request, object bytes):
     bytes.extend(http_request.method)
     bytes.extend(b' ')
     bytes.extend(http_request.url)
     bytes.extend(b' HTTP/')
     bytes.extend(http_request.version)
     bytes.extend(b'\r\n')
-    headers_to_bytes(http_request.headers, bytes)
-    return str(bytes)
 
 
-def response_to_bytes(object http_response):
-    bytes = bytearray()
+cdef status_line_to_bytes(object http_response, object bytes):
     bytes.extend(b'HTTP/')
     bytes.extend(http_response.version)
     bytes.extend(b' ')
     bytes.extend(http_response.status)
     bytes.extend(b'\r\n')
-    headers_to_bytes(http_response.headers, bytes)
+
+
+cdef raw_start_line_to_bytes(object raw_head, object bytes):
+    bytes.extend(raw_head[:raw_head.index(b'\n') + 1])
+
+
+cdef object raw_start_line_view(object raw_head):
+    return memoryview(raw_head)[:raw_head.index(b'\n') + 1]
+
+
+def request_into(object http_request, object fields, object headers,
+                 object buffer):
+    """
+    Serializes a request head onto the end of the bytearray passed in and
+    returns it. Nothing is copied once the head has been written.
+    """
+    request_line_to_bytes(http_request, buffer)
+    headers_to_bytes(fields, headers, buffer)
+    return buffer
+
+
+def response_into(object http_response, object fields, object headers,
+                  object buffer):
+    """
+    Serializes a response head onto the end of the bytearray passed in and
+    returns it. Nothing is copied once the head has been written.
+    """
+    status_line_to_bytes(http_response, buffer)
+    headers_to_bytes(fields, headers, buffer)
+    return buffer
+
+
+def request_to_bytes(object http_request, object fields, object headers):
+    return str(request_into(http_request, fields, headers, bytearray()))
+
+
+def response_to_bytes(object http_response, object fields, object headers):
+    return str(response_into(http_response, fields, headers, bytearray()))
+
+
+def spliced_request_to_bytes(object http_request, object raw_head,
+                             bint keep_start_line, object modified,
+                             object headers):
+    """
+    Serializes a request by reusing the parts of the raw head it was read
+    from that have not been modified.
+    """
+    bytes = bytearray()
+
+    if keep_start_line:
+        raw_start_line_to_bytes(raw_head, bytes)
+    else:
+        request_line_to_bytes(http_request, bytes)
+
+    splice_headers(raw_head, modified, headers, bytes)
     return str(bytes)
+
+
+def spliced_response_to_bytes(object http_response, object raw_head,
+                              bint keep_start_line, object modified,
+                              object headers):
+    """
+    Serializes a response by reusing the parts of the raw head it was read
+    from that have not been modified.
+    """
+    bytes = bytearray()
+
+    if keep_start_line:
+        raw_start_line_to_bytes(raw_head, bytes)
+    else:
+        status_line_to_bytes(http_response, bytes)
+
+    splice_headers(raw_head, modified, headers, bytes)
+    return str(bytes)
+
+
+def spliced_request_to_buffers(object http_request, object raw_head,
+                               bint keep_start_line, object modified,
+                               object headers):
+    """
+    Like spliced_request_to_bytes but returns a list of buffers for a
+    gathering write. The unmodified parts of the raw head are handed out as
+    memoryviews of it instead of being copied.
+    """
+    buffers = list()
+
+    if keep_start_line:
+        buffers.append(raw_start_line_view(raw_head))
+    else:
+        start_line = bytearray()
+        request_line_to_bytes(http_request, start_line)
+        buffers.append(start_line)
+
+    return splice_buffers(raw_head, modified, headers, buffers)
+
+
+def spliced_response_to_buffers(object http_response, object raw_head,
+                                bint keep_start_line, object modified,
+                                object headers):
+    """
+    Like spliced_response_to_bytes but returns a list of buffers for a
+    gathering write. The unmodified parts of the raw head are handed out as
+    memoryviews of it instead of being copied.
+    """
+    buffers = list()
+
+    if keep_start_line:
+        buffers.append(raw_start_line_view(raw_head))
+    else:
+        start_line = bytearray()
+        status_line_to_bytes(http_response, start_line)
+        buffers.append(start_line)
+
+    return splice_buffers(raw_head, modified, headers, buffers)
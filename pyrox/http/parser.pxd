@@ -1,14 +1,32 @@
 cdef extern from "http_el.h":
 
+    enum: HTTP_MAX_HEADER_SIZE
+
     cdef enum http_parser_type:
         HTTP_REQUEST, HTTP_RESPONSE
 
+    cdef struct pbuffer:
+        char *bytes
+        size_t position
+        size_t size
+
+    cdef struct http_header_span:
+        size_t name_offset
+        size_t name_length
+        size_t value_offset
+        size_t value_length
+
     cdef struct http_parser:
         unsigned long content_length
         void *app_data
         short http_major
         short http_minor
         short status_code
+        pbuffer *buffer
+        pbuffer *head
+        http_header_span *header_spans
+        size_t header_count
+        unsigned char raw_chunks
 
     ctypedef int (*http_data_cb) (http_parser*, char *at, size_t length) except -1
     ctypedef int (*http_cb) (http_parser*) except -1
@@ -28,7 +46,13 @@ cdef extern from "http_el.h":
 cdef extern from "http_el.c":
     void http_parser_init(http_parser *parser, http_parser_type ptype)
     void free_http_parser(http_parser *parser)
+    void http_parser_reinit(http_parser *parser, http_parser_type ptype)
+    void http_parser_set_max_header_size(http_parser *parser, size_t max_size)
+    int http_parser_batch_headers(http_parser *parser, int enabled)
+    void http_parser_raw_chunks(http_parser *parser, int enabled)
+    int http_parser_capture_head(http_parser *parser, int enabled)
 
-    int http_parser_exec(http_parser *parser, http_parser_settings *settings, char *data, size_t len) except -1
+    int http_parser_exec(http_parser *parser, http_parser_settings *settings, char *data, size_t len, size_t *consumed) except -1
+    void http_parser_pause(http_parser *parser, int paused)
     int http_should_keep_alive(http_parser *parser)
     int http_transfer_encoding_chunked(http_parser *parser)
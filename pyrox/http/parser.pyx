@@ -1,20 +1,101 @@
 from libc.string cimport strlen
-from libc.stdlib cimport malloc, free
+from libc.stdlib cimport malloc, realloc, free
 
 from cpython cimport bool, PyBytes_FromStringAndSize, PyBytes_FromString
+from cpython.buffer cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_SIMPLE
 
-from parser cimport http_parser_type, http_parser, http_parser_settings, http_parser_init, free_http_parser, http_parser_exec, http_should_keep_alive, http_transfer_encoding_chunked
+from parser cimport HTTP_MAX_HEADER_SIZE, http_parser_type, http_parser, http_parser_settings, http_header_span, http_parser_init, http_parser_reinit, http_parser_set_max_header_size, free_http_parser, http_parser_batch_headers, http_parser_raw_chunks, http_parser_capture_head, http_parser_exec, http_parser_pause, http_should_keep_alive, http_transfer_encoding_chunked
 
 import traceback
 
 _REQUEST_PARSER = 0
 _RESPONSE_PARSER = 1
 
-def RequestParser(parser_delegate):
-    return HttpEventParser(parser_delegate, _REQUEST_PARSER)
+_DEFAULT_PARSER_POOL_SIZE = 128
 
-def ResponseParser(parser_delegate):
-    return HttpEventParser(parser_delegate, _RESPONSE_PARSER)
+
+# Per-process free-list of parsers so that connections do not have to go
+# through malloc and free for every parser they create
+cdef http_parser **_parser_pool = NULL
+cdef size_t _parser_pool_size = 0
+cdef size_t _parser_pool_count = 0
+cdef size_t _max_header_size = HTTP_MAX_HEADER_SIZE
+
+
+def configure_parsers(max_header_size=None, pool_size=None):
+    """
+    Sets the process wide parser limits. The max_header_size argument caps
+    how large a parser's header buffer may grow. It is also the only limit
+    on how many headers a message may have. The pool_size argument sets how
+    many released parsers are kept around for reuse.
+    """
+    global _max_header_size, _parser_pool, _parser_pool_size
+
+    cdef http_parser **new_pool
+
+    if max_header_size is not None:
+        _max_header_size = max_header_size
+
+    if pool_size is not None:
+        while _parser_pool_count > pool_size:
+            free_http_parser(_take_pooled_parser())
+
+        new_pool = <http_parser **> realloc(
+            _parser_pool, sizeof(http_parser *) * pool_size)
+
+        if new_pool == NULL and pool_size > 0:
+            raise MemoryError('Unable to allocate parser pool')
+
+        _parser_pool = new_pool
+        _parser_pool_size = pool_size
+
+
+cdef http_parser * _take_pooled_parser():
+    global _parser_pool_count
+
+    _parser_pool_count -= 1
+    return _parser_pool[_parser_pool_count]
+
+
+cdef http_parser * _acquire_parser(http_parser_type parser_type):
+    cdef http_parser *parser
+
+    if _parser_pool_count > 0:
+        parser = _take_pooled_parser()
+        http_parser_reinit(parser, parser_type)
+    else:
+        parser = <http_parser *> malloc(sizeof(http_parser))
+        http_parser_init(parser, parser_type)
+
+    http_parser_set_max_header_size(parser, _max_header_size)
+    return parser
+
+
+cdef void _release_parser(http_parser *parser):
+    global _parser_pool_count
+
+    parser.app_data = NULL
+
+    if _parser_pool_count < _parser_pool_size:
+        _parser_pool[_parser_pool_count] = parser
+        _parser_pool_count += 1
+    else:
+        free_http_parser(parser)
+
+
+configure_parsers(pool_size=_DEFAULT_PARSER_POOL_SIZE)
+
+def RequestParser(parser_delegate, batch_headers=False, body_views=False,
+                  raw_chunks=False, capture_head=False):
+    return HttpEventParser(
+        parser_delegate, _REQUEST_PARSER, batch_headers, body_views,
+        raw_chunks, capture_head)
+
+def ResponseParser(parser_delegate, batch_headers=False, body_views=False,
+                   raw_chunks=False, capture_head=False):
+    return HttpEventParser(
+        parser_delegate, _RESPONSE_PARSER, batch_headers, body_views,
+        raw_chunks, capture_head)
 
 
 cdef int on_req_method(http_parser *parser, char *data, size_t length) except -1:
@@ -51,14 +132,49 @@ cdef int on_header_value(http_parser *parser, char *data, size_t length) except
     app_data.delegate.on_header_value(header_value)
     return 0
 
+cdef list header_list(http_parser *parser):
+    cdef list headers = list()
+    cdef http_header_span *span
+    cdef char *head = parser.buffer.bytes
+    cdef size_t idx
+
+    for idx in range(parser.header_count):
+        span = &parser.header_spans[idx]
+        headers.append(PyBytes_FromStringAndSize(
+            head + span.name_offset, span.name_length))
+        headers.append(PyBytes_FromStringAndSize(
+            head + span.value_offset, span.value_length))
+
+    return headers
+
 cdef int on_headers_complete(http_parser *parser) except -1:
     cdef object app_data = <object> parser.app_data
+
+    if parser.head != NULL:
+        app_data.delegate.on_raw_head(PyBytes_FromStringAndSize(
+            parser.head.bytes, parser.head.position))
+
+    if parser.header_spans != NULL:
+        app_data.delegate.on_headers(header_list(parser))
+
     app_data.delegate.on_headers_complete()
     return 0
 
 cdef int on_body(http_parser *parser, char *data, size_t length) except -1:
-    cdef object app_data = <object> parser.app_data
-    cdef object body_value = PyBytes_FromStringAndSize(data, length)
+    cdef ParserData app_data = <ParserData> parser.app_data
+    cdef object body_value
+    cdef size_t offset
+
+    if app_data.body_views:
+        # Hand out a view of the buffer passed to execute instead of a copy
+        if app_data.source_view is None:
+            app_data.source_view = memoryview(app_data.source)
+
+        offset = data - app_data.source_start
+        body_value = app_data.source_view[offset:offset + length]
+    else:
+        body_value = PyBytes_FromStringAndSize(data, length)
+
     app_data.delegate.on_body(
         body_value,
         length,
@@ -93,6 +209,24 @@ class ParserDelegate(object):
     def on_header_value(self, value):
         pass
 
+    def on_raw_head(self, head):
+        """
+        Called with the head of the message, start line and headers, exactly
+        as it was read when the parser has been set to capture heads. This
+        is called before on_headers and on_headers_complete.
+        """
+        pass
+
+    def on_headers(self, headers):
+        """
+        Called with a flat list of alternating field names and values when
+        the parser has been set to batch headers. By default this replays
+        each pair through on_header_field and on_header_value.
+        """
+        for idx in range(0, len(headers), 2):
+            self.on_header_field(headers[idx])
+            self.on_header_value(headers[idx + 1])
+
     def on_headers_complete(self):
         pass
 
@@ -106,18 +240,26 @@ class ParserDelegate(object):
 cdef class ParserData(object):
 
     cdef public object delegate
+    cdef bint body_views
+    cdef object source
+    cdef object source_view
+    cdef char *source_start
 
     def __init__(self, object delegate):
         self.delegate = delegate
+        self.body_views = False
 
 
 cdef class HttpEventParser(object):
 
     cdef http_parser *_parser
+    cdef http_parser_type _parser_type
     cdef http_parser_settings _settings
-    cdef object app_data
+    cdef ParserData app_data
 
-    def __init__(self, object delegate, kind=_REQUEST_PARSER):
+    def __init__(self, object delegate, kind=_REQUEST_PARSER,
+                 batch_headers=False, body_views=False, raw_chunks=False,
+                 capture_head=False):
         # set parser type
         if kind == _REQUEST_PARSER:
             parser_type = HTTP_REQUEST
@@ -127,10 +269,18 @@ cdef class HttpEventParser(object):
             raise Exception('Kind must be 0 for requests or 1 for responses')
 
         # initialize parser
-        self._parser = <http_parser *> malloc(sizeof(http_parser))
-        http_parser_init(self._parser, parser_type)
+        self._parser_type = parser_type
+        self._parser = _acquire_parser(parser_type)
+
+        # Collect header spans in C and deliver them in one call
+        http_parser_batch_headers(self._parser, 1 if batch_headers else 0)
+        http_parser_raw_chunks(self._parser, 1 if raw_chunks else 0)
+
+        # Keep a copy of each head as read for on_raw_head
+        http_parser_capture_head(self._parser, 1 if capture_head else 0)
 
         self.app_data = ParserData(delegate)
+        self.app_data.body_views = body_views
         self._parser.app_data = <void *>self.app_data
 
         # set callbacks
@@ -144,39 +294,123 @@ cdef class HttpEventParser(object):
         self._settings.on_body = <http_data_cb>on_body
         self._settings.on_message_complete = <http_cb>on_message_complete
 
+    property body_views:
+        """
+        When True, on_body is handed memoryview slices of the buffer passed
+        to execute instead of freshly copied bytes. A view stays valid for as
+        long as the caller leaves that buffer unmodified.
+        """
+        def __get__(self):
+            return self.app_data.body_views
+
+        def __set__(self, value):
+            self.app_data.body_views = value
+
+    property raw_chunks:
+        """
+        When True, chunked bodies are still validated but on_body is handed
+        the bytes as they were read, chunk sizes and trailer included,
+        instead of the decoded chunk data. The delegate may forward them
+        without having to re-encode each chunk. Takes effect from the next
+        chunk the parser reads.
+        """
+        def __get__(self):
+            if self._parser == NULL:
+                return False
+            return self._parser.raw_chunks != 0
+
+        def __set__(self, value):
+            if self._parser == NULL:
+                raise Exception('Parser destroyed or not initialized!')
+            http_parser_raw_chunks(self._parser, 1 if value else 0)
+
+    def reset(self, object delegate=None):
+        """
+        Resets the parser so that it may be reused for a new message. If a
+        delegate is passed it replaces the delegate set at construction.
+        """
+        if self._parser == NULL:
+            raise Exception('Parser destroyed or not initialized!')
+
+        if delegate is not None:
+            self.app_data.delegate = delegate
+
+        http_parser_reinit(self._parser, self._parser_type)
+
     def destroy(self):
         if self._parser != NULL:
-            free_http_parser(self._parser)
+            _release_parser(self._parser)
             self._parser = NULL
 
     def __dealloc__(self):
         self.destroy()
 
-    def execute(self, object data):
-        cdef object strval
+    def pause(self):
+        """
+        Pauses the parser. When called from within a delegate callback,
+        execute stops right after the current event and reports how many
+        bytes it consumed so that the caller may keep the remainder.
+        """
+        if self._parser != NULL:
+            http_parser_pause(self._parser, 1)
 
-        if isinstance(data, str) or isinstance(data, bytes):
-            strval = data
-        else:
-            if isinstance(data, list) or isinstance(data, bytearray):
-                strval = str(data)
-            else:
-                raise Exception('Can not coerce type: {} into str.'.format(
-                    type(data)))
+    def resume(self):
+        """
+        Resumes a paused parser. Any bytes left over from the paused call
+        to execute must be passed to execute again.
+        """
+        if self._parser != NULL:
+            http_parser_pause(self._parser, 0)
 
-        self._execute(strval, len(data))
+    def execute(self, object data, size_t offset=0, object length=None):
+        """
+        Parses the bytes of any object supporting the buffer protocol, such
+        as str, bytes, bytearray or memoryview, in place. The optional offset
+        and length arguments select a region of the buffer to parse.
+
+        Returns the number of bytes consumed, which is less than the number
+        of bytes handed in only if a callback paused the parser.
+        """
+        cdef Py_buffer view
+        cdef size_t data_len
+        cdef size_t consumed = 0
+
+        PyObject_GetBuffer(data, &view, PyBUF_SIMPLE)
 
-    cdef int _execute(self, char *data, size_t length) except -1:
-        cdef int retval
         try:
-            if self._parser == NULL:
-                raise Exception('Parser destroyed or not initialized!')
+            if offset > <size_t> view.len:
+                raise ValueError('Offset {} is past the end of the data'.format(
+                    offset))
+
+            data_len = view.len - offset
+
+            if length is not None:
+                if length > data_len:
+                    raise ValueError('Length {} runs past the end of the data'.format(
+                        length))
+                data_len = length
+
+            # Body views are sliced out of the buffer being parsed
+            self.app_data.source = data
+            self.app_data.source_start = <char *> view.buf
+
+            self._execute(<char *> view.buf + offset, data_len, &consumed)
+        finally:
+            self.app_data.source = None
+            self.app_data.source_view = None
+            PyBuffer_Release(&view)
+
+        return consumed
+
+    cdef int _execute(self, char *data, size_t length, size_t *consumed) except -1:
+        cdef int retval
+
+        if self._parser == NULL:
+            raise Exception('Parser destroyed or not initialized!')
 
-            retval = http_parser_exec(
-                self._parser, &self._settings, data, length)
-            if retval:
-                raise Exception('Failed with errno: {}'.format(retval))
-        except Exception as ex:
-            raise
+        retval = http_parser_exec(
+            self._parser, &self._settings, data, length, consumed)
+        if retval:
+            raise Exception('Failed with errno: {}'.format(retval))
 
         return 0
@@ -1,59 +1,195 @@
-class HttpMessageSelector(object):
-
-    def __init__(
-            self,
-            path_re,
-            interested_codes=None,
-            interested_methods=None):
-        self.interested_codes =\
-            interested_codes if interested_codes else list()
-        self.interested_methods =\
-            interested_methods if interested_codes else list()
-        self.path_re = re.compile(path_re)
-
-    def wants_status(self, status_code):
-        return status_code in self.interested_codes
-
-    def wants_path(self, path):
-        return self.path_re.matches(path)
-
-    def wants_method(self, method):
-        return method.lower() in self.interested_methods
+import re
 
 
-class FilterOptions(object):
+"""
+Most capture groups to put in one compiled path expression. Python 2 does
+not allow more than 100 groups in a single expression.
+"""
+_MAX_GROUPS = 90
 
-    def __init__(self, selector):
-        self.selector = selector
 
+"""
+Flags of an expression that sets none inline. Expressions that set their
+own would set them for every expression folded with them.
+"""
+_DEFAULT_FLAGS = re.compile('').flags
 
-class FilterHandler(http.ParserDelegate):
 
-    def __init__(self, filter_chain, options):
-        self.filter_chain = filter_chain
-        self.options = options
-        self.is_interested = False
-        self.current_header_field = None
-
-    def on_status(self, status_code):
-        if self.options.selector.wants_status(status_code):
-            self.is_interested = True
-
-    def on_req_method(self, method):
-        if self.options.selector.wants_method(method):
-            self.is_interested = True
-
-    def on_req_path(self, url):
-        if self.is_interested and not self.options.selector.wants_path(url):
-            self.is_interested = False
+class HttpMessageSelector(object):
+    """
+    Describes the HTTP messages a filter is interested in. Every criteria
+    left as None matches any message.
+
+    Attributes:
+        path_re         A compiled regular expression that the request path
+                        must match from its start.
+        path_prefix     A string the request path must start with.
+        methods         A frozenset of the request methods selected. Methods
+                        are matched case-sensitively.
+        status_codes    A frozenset of the response status codes selected,
+                        held as strings.
+    """
+    def __init__(self, path=None, path_prefix=None, methods=None,
+                 status_codes=None):
+        self.path_re = re.compile(path) if path is not None else None
+        self.path_prefix = path_prefix
+        self.methods = frozenset(methods) if methods else None
+        self.status_codes = frozenset(
+            str(code) for code in status_codes) if status_codes else None
+
+    def wants_status(self, status):
+        return self.status_codes is None or status[:3] in self.status_codes
 
-    def on_header_field(self, field):
-        if self.is_interested:
-            self.current_header_field = field
+    def wants_path(self, path):
+        if self.path_prefix is not None and not path.startswith(
+                self.path_prefix):
+            return False
 
-    def on_header_value(self, value):
-        if self.is_interested:
-            self.filter_chain.on_header(self.current_header_field, value)
+        return self.path_re is None or self.path_re.match(path) is not None
 
-    def on_message_complete(self):
-        self.is_interested = False
+    def wants_method(self, method):
+        return self.methods is None or method in self.methods
+
+
+class SelectorIndex(object):
+    """
+    All of the selectors of a pipeline compiled together so that finding
+    the filters interested in a message takes a fixed number of lookups
+    rather than one test per filter.
+
+    Selectors are given as (bit, selector) pairs and selecting a message
+    returns the bitwise OR of the bits of every selector that wants it.
+
+    Path prefixes are kept in one dictionary per distinct prefix length.
+    Path expressions are folded into optional lookaheads of a single
+    expression. One match of it tells which of them matched. Expressions
+    with named groups or inline flags are matched on their own instead as
+    folding them would clash with, or change, the expressions folded with
+    them. Expressions that use backreferences by number are not supported.
+    """
+    def __init__(self, selectors):
+        self._path_free = 0
+        self._method_free = 0
+        self._status_free = 0
+        self._method_masks = dict()
+        self._status_masks = dict()
+
+        prefixes = dict()
+        path_res = list()
+        lone_path_res = list()
+
+        for bit, selector in selectors:
+            if selector.path_re is None and selector.path_prefix is None:
+                self._path_free |= bit
+            elif selector.path_re is None:
+                by_length = prefixes.setdefault(
+                    len(selector.path_prefix), dict())
+                by_length[selector.path_prefix] = (
+                    by_length.get(selector.path_prefix, 0) | bit)
+            elif _can_fold(selector.path_re):
+                path_res.append((bit, selector))
+            else:
+                lone_path_res.append((bit, selector))
+
+            if selector.methods is None:
+                self._method_free |= bit
+            else:
+                for method in selector.methods:
+                    self._method_masks[method] = (
+                        self._method_masks.get(method, 0) | bit)
+
+            if selector.status_codes is None:
+                self._status_free |= bit
+            else:
+                for code in selector.status_codes:
+                    self._status_masks[code] = (
+                        self._status_masks.get(code, 0) | bit)
+
+        self._prefixes = tuple(sorted(prefixes.items()))
+        self._path_res = _compile_path_res(path_res)
+        self._lone_path_res = tuple(lone_path_res)
+
+    def select_request(self, method, path):
+        """
+        Returns the bits of the selectors that want a request with the given
+        method and path.
+        """
+        return self._select_path(path) & (
+            self._method_free | self._method_masks.get(method, 0))
+
+    def select_response(self, status, method=None, path=None):
+        """
+        Returns the bits of the selectors that want a response with the given
+        status. If the method and path of the request that the response is
+        for are not known, only the status is checked.
+        """
+        selected = self._status_free | self._status_masks.get(status[:3], 0)
+
+        if path is not None:
+            selected &= self.select_request(method, path)
+
+        return selected
+
+    def _select_path(self, path):
+        selected = self._path_free
+
+        for length, by_length in self._prefixes:
+            selected |= by_length.get(path[:length], 0)
+
+        for path_re, groups, bits in self._path_res:
+            matched = path_re.match(path).group(*groups)
+
+            if len(groups) == 1:
+                matched = (matched,)
+
+            for bit, value in zip(bits, matched):
+                if value is not None:
+                    selected |= bit
+
+        for bit, selector in self._lone_path_res:
+            if selector.wants_path(path):
+                selected |= bit
+
+        return selected
+
+
+def _can_fold(path_re):
+    return not path_re.groupindex and path_re.flags == _DEFAULT_FLAGS
+
+
+def _compile_path_res(path_res):
+    """
+    Folds the path expressions of the selectors into as few expressions as
+    Python allows. Each selector's expression becomes a lookahead that
+    either captures what it matched or falls back to matching nothing.
+    Returns a tuple of (expression, group indexes, selector bits) entries.
+    """
+    compiled = list()
+    parts = list()
+    groups = list()
+    bits = list()
+    group_count = 0
+
+    for bit, selector in path_res:
+        pattern = selector.path_re.pattern
+        prefix = selector.path_prefix
+        own_groups = selector.path_re.groups
+
+        if prefix is not None:
+            pattern = '(?=' + re.escape(prefix) + ')(?:' + pattern + ')'
+
+        if parts and group_count + own_groups + 1 > _MAX_GROUPS:
+            compiled.append((re.compile(''.join(parts)), tuple(groups),
+                             tuple(bits)))
+            parts, groups, bits, group_count = list(), list(), list(), 0
+
+        parts.append('(?=(' + pattern + ')|)')
+        groups.append(group_count + 1)
+        bits.append(bit)
+        group_count += own_groups + 1
+
+    if parts:
+        compiled.append((re.compile(''.join(parts)), tuple(groups),
+                         tuple(bits)))
+
+    return tuple(compiled)
@@ -0,0 +1,143 @@
+try:
+    from httplib import responses as _REASON_PHRASES
+except ImportError:
+    from http.client import responses as _REASON_PHRASES
+
+from pyrox.about import VERSION
+from .model import HttpHeader, HttpResponse
+
+
+"""
+Names of the response templates that Pyrox registers itself.
+"""
+PYROX_ERROR = 'pyrox_error'
+UPSTREAM_UNAVAILABLE = 'upstream_unavailable'
+REJECTION = 'rejection'
+OVERLOADED = 'overloaded'
+
+
+_TEMPLATES = dict()
+
+
+def _new_response(status_code):
+    response = HttpResponse()
+    response.version = b'1.1'
+    response.status = '{} {}'.format(
+        status_code, _REASON_PHRASES.get(status_code, 'Unknown'))
+    response.header('Server').values.append('pyrox/{}'.format(VERSION))
+    response.header('Content-Length').values.append('0')
+    return response
+
+
+class ResponseTemplate(object):
+    """
+    A canned response that is serialized once when it is registered. Writing
+    it out afterwards costs nothing more than handing over its bytes.
+
+    Templates may be read like an HttpResponse but not changed. Headers are
+    handed out as copies; use new_response for a response to change.
+
+    Attributes:
+        name        The name the template was registered under.
+        status      A string representing the status code and reason
+                    phrase of the canned response.
+    """
+    __slots__ = ('name', 'status', '_response', '_bytes', '_buffers')
+
+    def __init__(self, name, response):
+        self.name = name
+        self.status = response.status
+        self._response = response
+        self._bytes = bytes(response.to_bytes())
+        self._buffers = (self._bytes,)
+
+    @property
+    def version(self):
+        return self._response.version
+
+    def header(self, name):
+        """
+        Returns a copy of the header that matches the name via
+        case-insensitive matching. If the header does not exist, an empty
+        header is returned.
+        """
+        header = self.get_header(name)
+        return header if header is not None else HttpHeader(name)
+
+    def get_header(self, name):
+        """
+        Returns a copy of the header that matches the name via
+        case-insensitive matching, or None if the header does not exist.
+        """
+        header = self._response.get_header(name)
+
+        if header is None:
+            return None
+
+        return HttpHeader(header.name, list(header.values))
+
+    def to_bytes(self):
+        return self._bytes
+
+    def to_buffers(self):
+        return self._buffers
+
+    def new_response(self):
+        """
+        Returns a new HttpResponse with the status and headers of this
+        template for callers that need to change it before sending it.
+        """
+        response = HttpResponse()
+        response.version = self._response.version
+        response.status = self.status
+
+        for header in self._response.headers.values():
+            response.header(header.name).values.extend(header.values)
+
+        return response
+
+
+def register_template(name, status_code):
+    """
+    Registers a canned response with the given status code under name and
+    returns it. A template already registered under the same name is
+    replaced.
+    """
+    template = ResponseTemplate(name, _new_response(status_code))
+    _TEMPLATES[name] = template
+    return template
+
+
+def get_template(name):
+    """
+    Returns the response template registered under name. A KeyError is
+    raised if there is no such template.
+    """
+    template = _TEMPLATES.get(name)
+
+    if template is None:
+        raise KeyError('No response template named: {}'.format(name))
+
+    return template
+
+
+def configure_templates(pyrox_error_sc=502, rejection_sc=400,
+                        named_templates=None):
+    """
+    Builds the response templates for this process. The status codes map to
+    the options of the [templates] configuration section and any named
+    templates given as a dictionary of names to status codes are registered
+    alongside them.
+    """
+    register_template(PYROX_ERROR, pyrox_error_sc)
+    register_template(UPSTREAM_UNAVAILABLE, 503)
+    register_template(REJECTION, rejection_sc)
+    register_template(OVERLOADED, 503)
+
+    if named_templates:
+        for name, status_code in named_templates.items():
+            register_template(name, status_code)
+
+
+# Make sure the defaults are there even without a configuration
+configure_templates()
@@ -13,11 +13,43 @@ _DEFAULTS = {
         'key_file': None
     },
     'routing': {
-        'upstream_hosts': None
+        'upstream_hosts': None,
+        'router': 'round_robin',
+        'hash_key': 'path',
+        'hash_load_factor': 1.25
+    },
+    'health': {
+        'enabled': False,
+        'interval': 5.0,
+        'timeout': 2.0,
+        'rise': 2,
+        'fall': 3,
+        'path': None
+    },
+    'outliers': {
+        'enabled': False,
+        'consecutive_errors': 5,
+        'consecutive_server_errors': 5,
+        'latency_factor': 0.0,
+        'ejection_time': 30.0,
+        'max_ejection_time': 300.0,
+        'max_ejected_percent': 50
     },
     'pipeline': {
         'use_singletons': False
     },
+    'offload': {
+        'thread_pool_size': 4,
+        'process_pool_size': None
+    },
+    'stats': {
+        'filter_timing': False
+    },
+    'http': {
+        'max_header_size': 80 * 1024,
+        'parser_pool_size': 128,
+        'max_pipelined_requests': 16
+    },
     'templates': {
         'pyrox_error_sc': 502,
         'rejection_sc': 400
@@ -30,6 +62,12 @@ _DEFAULTS = {
 }
 
 
+"""
+Prefix of the [pipeline] options that are header rules.
+"""
+_RULE_PREFIX = 'rule.'
+
+
 def _split_and_strip(values_str, split_on):
     if split_on in values_str:
         return (value.strip() for value in values_str.split(split_on))
@@ -215,6 +253,26 @@ class PipelineConfiguration(ConfigurationPart):
             upstream = filter_1, filter_2
             downstream = filter_3
 
+    Simple header operations may instead be written as rules. Options named
+    "rule.<name>" are rules rather than filter aliases and take the form
+    "<phase> <operation> <header> [<argument>]" where phase is either
+    request or response. The operations are:
+
+        add <header> <value>        Adds a value to the header.
+        set <header> <value>        Replaces the header with the value.
+        remove <header>             Removes the header.
+        require <header>            Rejects messages without the header.
+        reject <header> <regex>     Rejects messages with a header value
+                                    that the expression matches.
+
+    All rules are compiled into one built-in filter that runs ahead of the
+    configured filters of the pipeline for its phase.
+    ::
+        [pipeline]
+            rule.need_agent = request require User-Agent
+            rule.no_curl = request reject User-Agent ^curl/
+            rule.via = request add Via 1.1 pyrox
+            rule.hide_server = response remove Server
     """
     @property
     def use_singletons(self):
@@ -251,6 +309,19 @@ class PipelineConfiguration(ConfigurationPart):
         """
         return self._pipeline_for('downstream')
 
+    @property
+    def header_rules(self):
+        """
+        Returns the header rules configured as a list of (name, rule) tuples
+        in the order they were given. If left unset this option defaults to
+        an empty list.
+        ::
+            rule.hide_server = response remove Server
+        """
+        return [(option[len(_RULE_PREFIX):], self.get(option))
+                for option in self.options()
+                if option.startswith(_RULE_PREFIX)]
+
     def _pipeline_for(self, stream):
         pipeline = list()
         filters = self._filter_dict()
@@ -266,10 +337,108 @@ class PipelineConfiguration(ConfigurationPart):
         for pfalias in self.options():
             if pfalias == 'downstream' or pfalias == 'upstream':
                 continue
+            if pfalias.startswith(_RULE_PREFIX):
+                continue
             filters[pfalias] = self.get(pfalias)
         return filters
 
 
+class HttpConfiguration(ConfigurationPart):
+    """
+    Class mapping for the Pyrox HTTP configuration section.
+    ::
+        # HTTP section
+        [http]
+    """
+    @property
+    def max_header_size(self):
+        """
+        Returns the maximum size in bytes that the head of a single HTTP
+        message may grow to before parsing fails. Parsers start with a small
+        buffer and only grow it up to this limit when a large head arrives.
+        If left unset this option defaults to 81920.
+        ::
+            max_header_size = 81920
+        """
+        return self.getint('max_header_size')
+
+    @property
+    def parser_pool_size(self):
+        """
+        Returns the number of released HTTP parsers each Pyrox process keeps
+        around for reuse by new connections. If left unset this option
+        defaults to 128.
+        ::
+            parser_pool_size = 128
+        """
+        return self.getint('parser_pool_size')
+
+    @property
+    def max_pipelined_requests(self):
+        """
+        Returns the number of requests a client may pipeline on a connection
+        ahead of the request currently being proxied. Waiting requests are
+        parsed and filtered as they arrive and their responses are relayed
+        in order. Pyrox stops reading from the client while this many
+        requests are waiting. If left unset this option defaults to 16.
+        ::
+            max_pipelined_requests = 16
+        """
+        return self.getint('max_pipelined_requests')
+
+
+class OffloadConfiguration(ConfigurationPart):
+    """
+    Class mapping for the Pyrox offload configuration section. Filter
+    handlers decorated with filtering.offload run in the pools sized here.
+    ::
+        # Offload section
+        [offload]
+    """
+    @property
+    def thread_pool_size(self):
+        """
+        Returns the number of threads each Pyrox process starts for running
+        offloaded filter handlers. Threads are only started once a handler
+        is offloaded to them. If left unset this option defaults to 4.
+        ::
+            thread_pool_size = 4
+        """
+        return self.getint('thread_pool_size')
+
+    @property
+    def process_pool_size(self):
+        """
+        Returns the number of worker processes each Pyrox process starts for
+        filter handlers offloaded to the process pool. If left unset this
+        option defaults to the number of CPUs.
+        ::
+            process_pool_size = 2
+        """
+        return self.getint('process_pool_size')
+
+
+class StatsConfiguration(ConfigurationPart):
+    """
+    Class mapping for the Pyrox stats configuration section.
+    ::
+        # Stats section
+        [stats]
+    """
+    @property
+    def filter_timing(self):
+        """
+        Returns a boolean value representing whether or not Pyrox should time
+        every filter handler call into per filter and per phase latency
+        histograms. Sending SIGUSR1 to Pyrox logs a summary of them at the
+        INFO level. Pipelines built with this off pay nothing for it. If left
+        unset this option defaults to false.
+        ::
+            filter_timing = True
+        """
+        return self.getboolean('filter_timing')
+
+
 class TemplatesConfiguration(ConfigurationPart):
     """
     Class mapping for the Pyrox teplates configuration section.
@@ -299,6 +468,24 @@ class TemplatesConfiguration(ConfigurationPart):
         """
         return self.getint('rejection_sc')
 
+    @property
+    def named_templates(self):
+        """
+        Returns a dictionary of any other options in this section. Each one
+        names a canned response with the status code it is set to that
+        filters may reply with by name.
+        ::
+            maintenance = 503
+        """
+        named = dict()
+
+        if self._cfg.has_section(self._name):
+            for option in self.options():
+                if option not in _DEFAULTS['templates']:
+                    named[option] = self.getint(option)
+
+        return named
+
 
 class RoutingConfiguration(ConfigurationPart):
     """
@@ -322,3 +509,207 @@ class RoutingConfiguration(ConfigurationPart):
         if hosts is not None:
             return [host for host in _split_and_strip(hosts, ',')]
         return None
+
+    @property
+    def router(self):
+        """
+        Returns the name of the router that picks the upstream host of each
+        request. One of:
+
+            round_robin         Takes each host in turn.
+            least_outstanding   Picks the host with the fewest requests in
+                                flight.
+            power_of_two        Picks the less busy of two random hosts.
+            ewma                Picks the better of two random hosts by
+                                their moving average latency weighted by
+                                their requests in flight.
+            consistent_hash     Sends requests with the same hash_key to the
+                                same host unless that host is overloaded.
+
+        If left unset this option defaults to round_robin.
+        ::
+            router = least_outstanding
+        """
+        return self.get('router')
+
+    @property
+    def hash_key(self):
+        """
+        Returns what the consistent_hash router hashes requests by. This may
+        be path, url, header:<name> or cookie:<name>. If left unset this
+        option defaults to path.
+        ::
+            hash_key = header:X-Tenant-Id
+        """
+        return self.get('hash_key')
+
+    @property
+    def hash_load_factor(self):
+        """
+        Returns how far above the average number of requests in flight a
+        host may go before the consistent_hash router sends the requests that
+        hash to it to the next host instead. If left unset this option
+        defaults to 1.25.
+        ::
+            hash_load_factor = 1.5
+        """
+        return self.getfloat('hash_load_factor')
+
+
+class HealthConfiguration(ConfigurationPart):
+    """
+    Class mapping for the Pyrox health check configuration section. Each
+    process probes every upstream host on its own and its router skips the
+    hosts that fail.
+    ::
+        # Health section
+        [health]
+    """
+    @property
+    def enabled(self):
+        """
+        Returns a boolean value representing whether or not Pyrox should
+        probe the upstream hosts. If left unset this option defaults to
+        false.
+        ::
+            enabled = True
+        """
+        return self.getboolean('enabled')
+
+    @property
+    def interval(self):
+        """
+        Returns the number of seconds between probes of each upstream host.
+        If left unset this option defaults to 5.
+        ::
+            interval = 10
+        """
+        return self.getfloat('interval')
+
+    @property
+    def timeout(self):
+        """
+        Returns the number of seconds a probe may take before it counts as
+        failed. If left unset this option defaults to 2.
+        ::
+            timeout = 1.5
+        """
+        return self.getfloat('timeout')
+
+    @property
+    def rise(self):
+        """
+        Returns the number of probes in a row an unhealthy upstream host
+        must pass before requests are routed to it again. If left unset this
+        option defaults to 2.
+        ::
+            rise = 3
+        """
+        return self.getint('rise')
+
+    @property
+    def fall(self):
+        """
+        Returns the number of probes in a row an upstream host must fail
+        before requests are no longer routed to it. If left unset this
+        option defaults to 3.
+        ::
+            fall = 2
+        """
+        return self.getint('fall')
+
+    @property
+    def path(self):
+        """
+        Returns the path that probes GET from each upstream host. Responses
+        with a status code below 400 pass. If left unset, probes only open a
+        connection to each host.
+        ::
+            path = /health
+        """
+        return self.get('path')
+
+
+class OutliersConfiguration(ConfigurationPart):
+    """
+    Class mapping for the Pyrox outlier detection configuration section.
+    Upstream hosts are ejected from routing based on how the requests sent
+    to them turn out. Each process keeps track of its own requests.
+    ::
+        # Outliers section
+        [outliers]
+    """
+    @property
+    def enabled(self):
+        """
+        Returns a boolean value representing whether or not Pyrox should
+        eject misbehaving upstream hosts. If left unset this option defaults
+        to false.
+        ::
+            enabled = True
+        """
+        return self.getboolean('enabled')
+
+    @property
+    def consecutive_errors(self):
+        """
+        Returns the number of requests in a row that may fail without a
+        response, such as on refused connections, before the upstream host
+        is ejected. If left unset this option defaults to 5.
+        ::
+            consecutive_errors = 3
+        """
+        return self.getint('consecutive_errors')
+
+    @property
+    def consecutive_server_errors(self):
+        """
+        Returns the number of responses in a row with a 5xx status code that
+        eject the upstream host. If left unset this option defaults to 5.
+        ::
+            consecutive_server_errors = 10
+        """
+        return self.getint('consecutive_server_errors')
+
+    @property
+    def latency_factor(self):
+        """
+        Returns how many times the median latency of the other upstream
+        hosts the moving average latency of a host may grow to before it is
+        ejected. Setting this to 0 disables ejection by latency. If left
+        unset this option defaults to 0.
+        ::
+            latency_factor = 3
+        """
+        return self.getfloat('latency_factor')
+
+    @property
+    def ejection_time(self):
+        """
+        Returns the number of seconds that a first ejection lasts. Hosts that
+        are ejected again soon after returning stay out this much longer
+        each time. If left unset this option defaults to 30.
+        ::
+            ejection_time = 10
+        """
+        return self.getfloat('ejection_time')
+
+    @property
+    def max_ejection_time(self):
+        """
+        Returns the longest an ejection may last in seconds. If left unset
+        this option defaults to 300.
+        ::
+            max_ejection_time = 120
+        """
+        return self.getfloat('max_ejection_time')
+
+    @property
+    def max_ejected_percent(self):
+        """
+        Returns the largest percentage of the upstream hosts that may be
+        ejected at once. If left unset this option defaults to 50.
+        ::
+            max_ejected_percent = 30
+        """
+        return self.getint('max_ejected_percent')
@@ -12,10 +12,17 @@ from tornado.netutil import bind_sockets
 from tornado.process import cpu_count
 
 from pyrox.log import get_logger, get_log_manager
-from pyrox.filtering import HttpFilterPipeline
+from pyrox.http import configure_parsers, configure_templates
+from pyrox.filtering import (HttpFilterPipeline, configure_offload,
+                             enable_filter_stats, format_filter_stats)
+from pyrox.filtering.rules import (HeaderRulesFilter, parse_rule, REQUEST,
+                                   RESPONSE)
 from pyrox.util.config import ConfigurationError
 from pyrox.server.config import load_pyrox_config
 from pyrox.server.proxyng import TornadoHttpProxy
+from pyrox.server.routing import new_router
+from pyrox.server.health import HealthChecker
+from pyrox.server.outliers import OutlierDetector
 
 
 _LOG = get_logger(__name__)
@@ -44,6 +51,20 @@ def stop_parent(signum, frame):
         os.kill(pid, signal.SIGTERM)
 
 
+def _log_filter_stats():
+    _LOG.info('Filter latencies (us) for process {}:\n{}'.format(
+        os.getpid(), format_filter_stats()))
+
+
+def dump_child_stats(signum, frame):
+    IOLoop.instance().add_callback_from_signal(_log_filter_stats)
+
+
+def dump_parent_stats(signum, frame):
+    for pid in _active_children_pids:
+        os.kill(pid, signal.SIGUSR1)
+
+
 def _resolve_filter_classes(cls_list):
     filter_cls_list = list()
 
@@ -77,23 +98,46 @@ def _resolve_filter_classes(cls_list):
     return filter_cls_list
 
 
-def _build_plfactory_closure(filter_cls_list):
+def _build_rules_filters(config):
+    # Header rules are compiled into one shared filter for both pipelines
+    rules = [parse_rule(name, spec)
+             for name, spec in config.pipeline.header_rules]
+
+    if not rules:
+        return (), ()
+
+    # The upstream pipeline filters responses and the downstream pipeline
+    # filters requests
+    rules_filter = HeaderRulesFilter(rules)
+    upstream = (rules_filter,) if RESPONSE in rules_filter.phases else ()
+    downstream = (rules_filter,) if REQUEST in rules_filter.phases else ()
+    return upstream, downstream
+
+
+def _build_plfactory_closure(filter_cls_list, builtin_filters=()):
     # Closure for creation of new pipelines
     def new_filter_pipeline():
         pipeline = HttpFilterPipeline()
+        for builtin_filter in builtin_filters:
+            pipeline.add_filter(builtin_filter)
         for cls in filter_cls_list:
             pipeline.add_filter(cls())
         return pipeline
     return new_filter_pipeline
 
 
-def _build_singleton_plfactory_closure(filter_classes, filter_instances):
+def _build_singleton_plfactory_closure(filter_classes, filter_instances,
+                                       builtin_filters=()):
+    # Singleton filters never change so the pipeline is only built once
+    template = HttpFilterPipeline()
+    for builtin_filter in builtin_filters:
+        template.add_filter(builtin_filter)
+    for cls in filter_classes:
+        template.add_filter(filter_instances[cls.__name__])
+
     # Closure for creation of new singleton pipelines
     def new_filter_pipeline():
-        pipeline = HttpFilterPipeline()
-        for cls in filter_classes:
-            pipeline.add_filter(filter_instances[cls.__name__])
-        return pipeline
+        return template.clone()
     return new_filter_pipeline
 
 
@@ -108,18 +152,24 @@ def _build_singleton_plfactories(config):
     for cls in all_classes:
         filter_instances[cls.__name__] = cls()
 
+    us_rules, ds_rules = _build_rules_filters(config)
+
     upstream = _build_singleton_plfactory_closure(
-        _resolve_filter_classes(config.pipeline.upstream), filter_instances)
+        _resolve_filter_classes(config.pipeline.upstream), filter_instances,
+        us_rules)
     downstream = _build_singleton_plfactory_closure(
-        _resolve_filter_classes(config.pipeline.downstream), filter_instances)
+        _resolve_filter_classes(config.pipeline.downstream), filter_instances,
+        ds_rules)
     return upstream, downstream
 
 
 def _build_plfactories(config):
+    us_rules, ds_rules = _build_rules_filters(config)
+
     upstream = _build_plfactory_closure(
-        _resolve_filter_classes(config.pipeline.upstream))
+        _resolve_filter_classes(config.pipeline.upstream), us_rules)
     downstream = _build_plfactory_closure(
-        _resolve_filter_classes(config.pipeline.downstream))
+        _resolve_filter_classes(config.pipeline.downstream), ds_rules)
 
     return upstream, downstream
 
@@ -129,6 +179,27 @@ def start_proxy(sockets, config):
     signal.signal(signal.SIGTERM, stop_child)
     signal.signal(signal.SIGINT, stop_child)
 
+    # Size the HTTP parsers for this process
+    configure_parsers(
+        max_header_size=config.http.max_header_size,
+        pool_size=config.http.parser_pool_size)
+
+    # Serialize the canned responses once up front
+    configure_templates(
+        pyrox_error_sc=config.templates.pyrox_error_sc,
+        rejection_sc=config.templates.rejection_sc,
+        named_templates=config.templates.named_templates)
+
+    # Size the pools for offloaded filters; they start on first use
+    configure_offload(
+        thread_pool_size=config.offload.thread_pool_size,
+        process_pool_size=config.offload.process_pool_size)
+
+    # Filters must be timed before any pipeline is built
+    if config.stats.filter_timing:
+        enable_filter_stats()
+        signal.signal(signal.SIGUSR1, dump_child_stats)
+
     # Create a PluginManager
     plugin_manager = pynsive.PluginManager()
     for path in config.core.plugin_paths:
@@ -157,11 +228,41 @@ def start_proxy(sockets, config):
 
         _LOG.debug('SSL enabled: {}'.format(ssl_options))
 
+    router = new_router(
+        config.routing.router,
+        config.routing.upstream_hosts,
+        config.routing.hash_key,
+        config.routing.hash_load_factor)
+
+    if config.health.enabled:
+        HealthChecker(
+            router,
+            config.health.interval,
+            config.health.timeout,
+            config.health.rise,
+            config.health.fall,
+            config.health.path).start()
+
+    outliers = None
+
+    if config.outliers.enabled:
+        outliers = OutlierDetector(
+            router,
+            config.outliers.consecutive_errors,
+            config.outliers.consecutive_server_errors,
+            config.outliers.latency_factor,
+            config.outliers.ejection_time,
+            config.outliers.max_ejection_time,
+            config.outliers.max_ejected_percent)
+
     # Create proxy server ref
     http_proxy = TornadoHttpProxy(
         filter_pipeline_factories,
         config.routing.upstream_hosts,
-        ssl_options)
+        ssl_options,
+        config.http.max_pipelined_requests,
+        router,
+        outliers)
 
     # Add our sockets for watching
     http_proxy.add_sockets(sockets)
@@ -232,6 +333,10 @@ you run Pyrox in production with this feature enabled.
     signal.signal(signal.SIGTERM, stop_parent)
     signal.signal(signal.SIGINT, signal.SIG_IGN)
 
+    # Children dump their own filter stats
+    if config.stats.filter_timing:
+        signal.signal(signal.SIGUSR1, dump_parent_stats)
+
     while len(_active_children_pids):
         try:
             pid, status = os.wait()
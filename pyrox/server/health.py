@@ -0,0 +1,190 @@
+import socket
+
+from tornado.ioloop import IOLoop
+
+from pyrox.log import get_logger
+from pyrox.tstream.iostream import SocketIOHandler, SSLSocketIOHandler
+from .routing import PROTOCOL_HTTPS
+
+
+_LOG = get_logger(__name__)
+
+
+"""
+Largest response head read from an upstream host when probing it over
+HTTP. Only the status line is looked at.
+"""
+_MAX_STATUS_LINE = 4096
+
+
+def _status_code(status_line):
+    parts = status_line.split(None, 2)
+
+    if len(parts) < 2 or not parts[0].startswith(b'HTTP/'):
+        return None
+
+    try:
+        return int(parts[1])
+    except ValueError:
+        return None
+
+
+class _Probe(object):
+    """
+    A single check of one route. The callback is called exactly once with
+    whether or not the route passed the check.
+    """
+    def __init__(self, route, path, timeout, callback, io_loop):
+        self._route = route
+        self._path = path
+        self._callback = callback
+        self._io_loop = io_loop
+        self._received = bytearray()
+        self._done = False
+
+        host, port, protocol = route
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, 0)
+
+        if protocol == PROTOCOL_HTTPS:
+            self._stream = SSLSocketIOHandler(self._sock, io_loop=io_loop)
+        else:
+            self._stream = SocketIOHandler(self._sock, io_loop=io_loop)
+
+        self._stream.on_close(self._on_close)
+        self._stream.on_error(self._on_error)
+        self._timeout = io_loop.add_timeout(
+            io_loop.time() + timeout, self._on_timeout)
+        self._stream.connect((host, port), self._on_connect)
+
+    def _on_connect(self):
+        # Refused connects are reported as writable too
+        if self._sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) != 0:
+            self._finish(False)
+        elif self._path is None:
+            self._finish(True)
+        else:
+            self._stream.read(self._on_read)
+            self._stream.write(
+                'GET {} HTTP/1.1\r\nHost: {}\r\nConnection: close\r\n'
+                '\r\n'.format(self._path, self._route[0]).encode('ascii'))
+
+    def _on_read(self, data):
+        self._received.extend(data)
+        end = self._received.find(b'\r\n')
+
+        if end >= 0:
+            status_code = _status_code(bytes(self._received[:end]))
+            self._finish(status_code is not None and status_code < 400)
+        elif len(self._received) > _MAX_STATUS_LINE:
+            self._finish(False)
+
+    def _on_error(self, error):
+        self._finish(False)
+
+    def _on_close(self):
+        self._finish(False)
+
+    def _on_timeout(self):
+        self._timeout = None
+        self._finish(False)
+
+    def _finish(self, healthy):
+        if self._done:
+            return
+
+        self._done = True
+
+        if self._timeout is not None:
+            self._io_loop.remove_timeout(self._timeout)
+            self._timeout = None
+
+        self._stream.on_close(None)
+        self._stream.on_error(None)
+
+        if not self._stream.closed():
+            self._stream.close()
+
+        self._callback(self._route, healthy)
+
+
+class HealthChecker(object):
+    """
+    Probes every route of a router on a timer and marks the routes that stop
+    answering as unhealthy so that the router skips them. A probe connects
+    to the route and, if a path is set, sends a GET for it. Probes pass if
+    they connect, or get a response with a status code below 400, within
+    the timeout.
+
+    Routes start out healthy. A route is marked unhealthy after fall probes
+    in a row fail and healthy again after rise probes in a row pass.
+
+    :param router: the RoutingHandler whose routes are checked
+    :param interval: seconds between probes of each route
+    :param timeout: seconds a probe may take before it fails
+    :param rise: passing probes in a row that mark a route healthy
+    :param fall: failing probes in a row that mark a route unhealthy
+    :param path: the path to GET, or None to only connect
+    """
+    def __init__(self, router, interval=5.0, timeout=2.0, rise=2, fall=3,
+                 path=None, io_loop=None):
+        self._router = router
+        self._interval = interval
+        self._timeout = timeout
+        self._rise = rise
+        self._fall = fall
+        self._path = path
+        self._io_loop = io_loop or IOLoop.current()
+        self._probing = set()
+        self._passed = dict()
+        self._failed = dict()
+        self._timer = None
+
+    def start(self):
+        if self._timer is None:
+            self._tick()
+
+    def stop(self):
+        if self._timer is not None:
+            self._io_loop.remove_timeout(self._timer)
+            self._timer = None
+
+    def _tick(self):
+        self._timer = self._io_loop.add_timeout(
+            self._io_loop.time() + self._interval, self._tick)
+        self.check()
+
+    def check(self):
+        """
+        Starts a probe of every route that isn't being probed already.
+        """
+        for route in self._router.routes:
+            if route not in self._probing:
+                self._probing.add(route)
+                _Probe(route, self._path, self._timeout, self.on_probed,
+                       self._io_loop)
+
+    def on_probed(self, route, healthy):
+        """
+        Counts the outcome of a probe of route towards the rise or fall
+        threshold and marks the route once it crosses one.
+        """
+        self._probing.discard(route)
+
+        if healthy:
+            self._failed[route] = 0
+            passed = self._passed.get(route, 0) + 1
+            self._passed[route] = passed
+
+            if passed >= self._rise and not self._router.healthy(route):
+                _LOG.info('Upstream {}:{} is healthy again.'.format(
+                    route[0], route[1]))
+                self._router.set_healthy(route, True)
+        else:
+            self._passed[route] = 0
+            failed = self._failed.get(route, 0) + 1
+            self._failed[route] = failed
+
+            if failed >= self._fall and self._router.healthy(route):
+                _LOG.warning('Upstream {}:{} failed {} health checks.'.format(
+                    route[0], route[1], failed))
+                self._router.set_healthy(route, False)
@@ -0,0 +1,176 @@
+from tornado.ioloop import IOLoop
+
+from pyrox.log import get_logger
+
+
+_LOG = get_logger(__name__)
+
+
+"""
+Weight of each new latency in the moving average kept per route.
+"""
+_LATENCY_WEIGHT = 0.1
+
+
+"""
+Requests a route must have completed before its latency is compared with
+that of the other routes.
+"""
+_MIN_LATENCY_SAMPLES = 20
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+class OutlierDetector(object):
+    """
+    Watches the outcome of the requests the proxy sends upstream and ejects
+    the routes that misbehave from their router. A route is ejected once it
+    fails the given number of requests in a row without a response, or
+    answers that many requests in a row with a 5xx status. When a latency
+    factor is set, a route is also ejected once its moving average latency
+    grows past that factor of the median of the other routes.
+
+    Ejections last the ejection time multiplied by the number of times in a
+    row the route was ejected, up to the max ejection time. A route that
+    stays in for the max ejection time after its return starts over. No
+    more than max_ejected_percent of the routes are ejected at once.
+
+    :param router: the RoutingHandler to eject routes from
+    :param consecutive_errors: failed requests in a row that eject a route
+    :param consecutive_server_errors: 5xx responses in a row that eject a
+                                      route
+    :param latency_factor: how many times the median latency a route may
+                           take before it is ejected, or 0 to not eject by
+                           latency
+    :param ejection_time: seconds that a first ejection lasts
+    :param max_ejection_time: the longest an ejection lasts in seconds
+    :param max_ejected_percent: the share of the routes that may be ejected
+                                at once
+    """
+    def __init__(self, router, consecutive_errors=5,
+                 consecutive_server_errors=5, latency_factor=0,
+                 ejection_time=30.0, max_ejection_time=300.0,
+                 max_ejected_percent=50, io_loop=None):
+        self._router = router
+        self._consecutive_errors = consecutive_errors
+        self._consecutive_server_errors = consecutive_server_errors
+        self._latency_factor = latency_factor
+        self._ejection_time = ejection_time
+        self._max_ejection_time = max_ejection_time
+        self._max_ejected_percent = max_ejected_percent
+        self._io_loop = io_loop or IOLoop.current()
+        self._errors = dict()
+        self._server_errors = dict()
+        self._latency = dict()
+        self._samples = dict()
+        self._ejections = dict()
+        self._returned = dict()
+
+    def ejections(self, route):
+        """
+        Returns the number of times in a row route has been ejected.
+        """
+        return self._ejections.get(route, 0)
+
+    def on_request_complete(self, route, latency, status_code):
+        """
+        Called when the response to a request sent to route has been relayed
+        in full.
+        """
+        if self._router.ejected(route):
+            return
+
+        self._errors[route] = 0
+
+        if status_code is not None and status_code >= 500:
+            server_errors = self._server_errors.get(route, 0) + 1
+            self._server_errors[route] = server_errors
+
+            if server_errors >= self._consecutive_server_errors:
+                self._eject(route, '{} server errors in a row'.format(
+                    server_errors))
+            return
+
+        self._server_errors[route] = 0
+
+        if self._latency_factor > 0:
+            self._on_latency(route, latency)
+
+    def on_request_failed(self, route):
+        """
+        Called when a request sent to route failed without a response
+        because of the route, such as when it refused the connection.
+        """
+        if self._router.ejected(route):
+            return
+
+        errors = self._errors.get(route, 0) + 1
+        self._errors[route] = errors
+
+        if errors >= self._consecutive_errors:
+            self._eject(route, '{} failed requests in a row'.format(errors))
+
+    def _on_latency(self, route, latency):
+        samples = self._samples.get(route, 0) + 1
+        self._samples[route] = samples
+
+        average = self._latency.get(route)
+
+        if average is None:
+            average = latency
+        else:
+            average += (latency - average) * _LATENCY_WEIGHT
+        self._latency[route] = average
+
+        if samples < _MIN_LATENCY_SAMPLES:
+            return
+
+        others = [self._latency[other] for other in self._router.routes
+                  if other != route and not self._router.ejected(other) and
+                  self._samples.get(other, 0) >= _MIN_LATENCY_SAMPLES]
+
+        if others and average > self._latency_factor * _median(others):
+            self._eject(route, 'average latency of {:.3f}s'.format(average))
+
+    def _eject(self, route, reason):
+        routes = self._router.routes
+        ejected = sum(1 for other in routes if self._router.ejected(other))
+
+        if (ejected + 1) * 100 > self._max_ejected_percent * len(routes):
+            return
+
+        now = self._io_loop.time()
+        returned = self._returned.get(route)
+
+        # Routes that misbehave again soon after returning stay out longer
+        if returned is None or now - returned >= self._max_ejection_time:
+            ejections = 1
+        else:
+            ejections = self._ejections.get(route, 0) + 1
+
+        self._ejections[route] = ejections
+        duration = min(self._ejection_time * ejections,
+                       self._max_ejection_time)
+
+        _LOG.warning('Ejecting upstream {}:{} for {:.0f}s after {}.'.format(
+            route[0], route[1], duration, reason))
+
+        self._router.set_ejected(route, True)
+        self._io_loop.add_timeout(now + duration, lambda: self._return(route))
+
+    def _return(self, route):
+        _LOG.info('Returning upstream {}:{}.'.format(route[0], route[1]))
+
+        self._errors[route] = 0
+        self._server_errors[route] = 0
+        self._latency.pop(route, None)
+        self._samples.pop(route, None)
+        self._returned[route] = self._io_loop.time()
+        self._router.set_ejected(route, False)
@@ -1,19 +1,23 @@
 import socket
+import collections
 
 import tornado
 import tornado.ioloop
 import tornado.process
 
-from .routing import RoundRobinRouter, PROTOCOL_HTTP, PROTOCOL_HTTPS
+from tornado.concurrent import is_future
+
+from .routing import (RoutingHandler, new_router, ROUND_ROBIN,
+                      PROTOCOL_HTTP, PROTOCOL_HTTPS)
 
 from pyrox.tstream.iostream import (SSLSocketIOHandler, SocketIOHandler,
                                     StreamClosedError)
 from pyrox.tstream.tcpserver import TCPServer
 
 from pyrox.log import get_logger
-from pyrox.about import VERSION
 from pyrox.http import (HttpRequest, HttpResponse, RequestParser,
-                        ResponseParser, ParserDelegate)
+                        ResponseParser, ParserDelegate, get_template)
+from pyrox.http.templates import PYROX_ERROR, UPSTREAM_UNAVAILABLE
 import traceback
 
 _LOG = get_logger(__name__)
@@ -26,48 +30,63 @@ _CHUNK_CLOSE = b'0\r\n\r\n'
 
 
 """
-Default return object on error. This should be configurable.
+String ending a chunk of a HTTP chunked encoding body.
 """
-_BAD_GATEWAY_RESP = HttpResponse()
-_BAD_GATEWAY_RESP.version = b'1.1'
-_BAD_GATEWAY_RESP.status = '502 Bad Gateway'
-_BAD_GATEWAY_RESP.header('Server').values.append('pyrox/{}'.format(VERSION))
-_BAD_GATEWAY_RESP.header('Content-Length').values.append('0')
+_CRLF = b'\r\n'
+
 
 """
-Default return object on no route or upstream not responding. This should
-be configurable.
+Default number of requests a client may pipeline ahead of the request
+currently being proxied before Pyrox stops reading from it.
 """
-_UPSTREAM_UNAVAILABLE = HttpResponse()
-_UPSTREAM_UNAVAILABLE.version = b'1.1'
-_UPSTREAM_UNAVAILABLE.status = '503 Service Unavailable'
-_UPSTREAM_UNAVAILABLE.header('Server').values.append('pyrox/{}'.format(VERSION))
-_UPSTREAM_UNAVAILABLE.header('Content-Length').values.append('0')
+_DEFAULT_MAX_PIPELINED = 16
 
 
 def _write_to_stream(stream, data, is_chunked, callback=None):
     if is_chunked:
-        # Format and write this chunk
-        chunk = bytearray()
-        chunk.extend(hex(len(data))[2:])
-        chunk.extend('\r\n')
-        chunk.extend(data)
-        chunk.extend('\r\n')
-        stream.write(chunk, callback)
+        # Frame the chunk around the data instead of copying it
+        chunk_size = '{:x}\r\n'.format(len(data))
+        stream.write((chunk_size, data, _CRLF), callback)
     else:
         stream.write(data, callback)
 
 
 class AccumulationStream(object):
+    """
+    Output given to body filters. A handler keeps one for its whole
+    connection and its buffer is only allocated once a filter writes to it,
+    so filters that leave the body as it is cost nothing per chunk. Filters
+    that write nothing signal that the chunk they were given goes out
+    unchanged.
+    """
 
     def __init__(self):
-        self.bytes = bytearray()
+        self._bytes = None
+
+    @property
+    def bytes(self):
+        if self._bytes is None:
+            self._bytes = bytearray()
+        return self._bytes
 
     def write(self, data):
         self.bytes.extend(data)
 
     def size(self):
-        return len(self.bytes)
+        return len(self._bytes) if self._bytes is not None else 0
+
+    def take(self, data):
+        """
+        Returns what filters wrote since the last call or data if they wrote
+        nothing. The returned buffer is handed over to the caller and the
+        next write starts a new one.
+        """
+        if not self._bytes:
+            return data
+
+        written = self._bytes
+        self._bytes = None
+        return written
 
 
 class ProxyHandler(ParserDelegate):
@@ -77,13 +96,22 @@ class ProxyHandler(ParserDelegate):
 
     - Handling of header field names.
     - Tracking rejection of message sessions.
+    - Switching the parser between passing bodies through as read and
+      decoding them for body filters, one message at a time.
+
+    Attributes:
+        parser      The parser feeding this handler, if it should be switched
+                    to suit each message.
     """
     def __init__(self, filter_pl, http_msg):
         self._filter_pl = filter_pl
         self._http_msg = http_msg
         self._chunked = False
         self._last_header_field = None
+        self._raw_head = None
         self._intercepted = False
+        self._intercepting_body = False
+        self.parser = None
 
     def on_http_version(self, major, minor):
         self._http_msg.version = '{}.{}'.format(major, minor)
@@ -96,26 +124,95 @@ class ProxyHandler(ParserDelegate):
         header.values.append(value)
         self._last_header_field = None
 
+    def on_raw_head(self, head):
+        self._raw_head = head
+
+    def on_headers(self, headers):
+        # Headers are only indexed if a filter asks for them
+        self._http_msg.set_header_fields(headers, self._raw_head)
+        self._raw_head = None
+
+    def _negotiate_body(self, http_msg, intercept):
+        """
+        Sets up the body of http_msg to be either intercepted by body filters
+        or passed through as read. Returns True if the body must be chunk
+        encoded on its way out.
+        """
+        self._intercepting_body = intercept
+
+        # Filters get decoded chunks copied out of the read buffer
+        if self.parser is not None:
+            self.parser.raw_chunks = not intercept
+            self.parser.body_views = not intercept
+
+        # Filters may change the body so its length can't be kept
+        if intercept and http_msg.get_header('content-length'):
+            http_msg.remove_header('content-length')
+            http_msg.remove_header('transfer-encoding')
+            http_msg.header('transfer-encoding').values.append('chunked')
+            return True
+
+        return False
+
+
+class PipelinedRequest(object):
+    """
+    A request read off of a downstream connection. Clients may pipeline
+    several requests before the first response goes out so each request
+    carries its own filter action, body framing and any body received
+    before it could be sent upstream.
+    """
+
+    def __init__(self, request, action, chunked):
+        self.request = request
+        self.action = action
+        self.chunked = chunked
+        self.body = None
+        self.complete = False
+        self.keep_alive = False
+
+    def store_chunk(self, body_fragment):
+        if not self.body:
+            self.body = bytearray()
+        self.body.extend(body_fragment)
+
 
 class DownstreamHandler(ProxyHandler):
     """
     This proxy handler manages data coming from downstream of the proxy.
     This data comes from the client initiating the request against the
     proxy.
+
+    Requests pipelined by the client are parsed and filtered as they
+    arrive but only the request at the front of the queue is proxied.
+    The next request is sent once the response to the one before it has
+    been relayed so that responses reach the client in order. When more
+    than max_pipelined requests are waiting, or a waiting request starts
+    sending a body, the on_hold callback is called to stop reading from
+    downstream until on_release is called.
+
+    Filters may also leave the action for a request head to a Future. The
+    handler then holds reading in the same way until the action is known
+    and only then queues or proxies the request.
     """
 
-    def __init__(self, downstream, filter_pl, connect_upstream):
+    def __init__(self, downstream, filter_pl, connect_upstream,
+                 max_pipelined=_DEFAULT_MAX_PIPELINED, on_hold=None,
+                 on_release=None):
         super(DownstreamHandler, self).__init__(filter_pl, HttpRequest())
         self._downstream = downstream
         self._upstream = None
-        self._keep_alive = False
-        self._preread_body = None
         self._connect_upstream = connect_upstream
+        self._max_pipelined = max_pipelined
+        self._on_hold = on_hold
+        self._on_release = on_release
+        self._holding = False
+        self._suspended = None
 
-    def _store_chunk(self, body_fragment):
-        if not self._preread_body:
-            self._preread_body = bytearray()
-        self._preread_body.extend(body_fragment)
+        self._reading = None
+        self._active = None
+        self._pipelined = collections.deque()
+        self._accumulator = AccumulationStream()
 
     def on_req_method(self, method):
         self._http_msg.method = method
@@ -124,93 +221,198 @@ class DownstreamHandler(ProxyHandler):
         self._http_msg.url = url
 
     def on_headers_complete(self):
-        # Execute against the pipeline
-        action = self._filter_pl.on_request_head(self._http_msg)
+        request = self._http_msg
 
-        # If we are intercepting the request body do some negotiation
-        if self._filter_pl.intercepts_req_body():
-            self._chunked = True
+        # Execute against the pipeline
+        action = self._filter_pl.on_request_head(request)
 
-            # If there's a content length, negotiate the transfer encoding
-            if self._http_msg.get_header('content-length'):
-                self._http_msg.remove_header('content-length')
-                self._http_msg.remove_header('transfer-encoding')
+        pending = PipelinedRequest(request, action, False)
+        self._reading = pending
 
-                self._http_msg.header('transfer-encoding').values.append('chunked')
+        # The next request on this connection gets a fresh message
+        self._http_msg = HttpRequest()
 
-        # If we're rejecting then we're not going to connect to upstream
-        if not action.should_connect_upstream():
-            self._intercepted = True
-            self._response_tuple = action.payload
+        if is_future(action):
+            # A filter is still deciding; nothing more is read until it has
+            pending.action = None
+            self._suspend(pending, action)
         else:
-            # Hold up on the client side until we're done negotiating
-            # connections.
-            self._downstream.handle.disable_reading()
+            self._negotiate_request_body(pending)
+            self._dispatch(pending)
 
-            # We're routing to upstream; we need to know where to go
-            if action.is_routing():
-                self._connect_upstream(self._http_msg, action.payload)
-            else:
-                self._connect_upstream(self._http_msg)
+    def _negotiate_request_body(self, pending):
+        # Only bodies that a filter wants are decoded and re-chunked
+        pending.chunked = self._negotiate_body(
+            pending.request,
+            pending.action.should_connect_upstream() and
+            self._filter_pl.wants_request_body())
 
     def on_body(self, bytes, length, is_chunked):
-        if self._downstream.reading():
-            # Hold up on the client side until we're done with this chunk
-            self._downstream.handle.disable_reading()
+        pending = self._reading
+
+        if is_chunked and self._intercepting_body:
+            pending.chunked = True
 
         # Rejections simply discard the body
-        if not self._intercepted:
-            accumulator = AccumulationStream()
+        if pending.action.should_connect_upstream():
             data = bytes
 
-            self._filter_pl.on_request_body(data, accumulator)
+            if self._intercepting_body:
+                self._filter_pl.on_request_body(bytes, self._accumulator)
+                data = self._accumulator.take(bytes)
 
-            if accumulator.size() > 0:
-                data = accumulator.bytes
+            if pending is self._active and self._upstream:
+                if self._downstream.reading():
+                    # Hold up on the client side until we're done with this
+                    # chunk
+                    self._downstream.handle.disable_reading()
 
-            if self._upstream:
                 # When we write to the stream set the callback to resume
                 # reading from downstream.
-                _write_to_stream(self._upstream, data, is_chunked,
-                                 self._downstream.handle.resume_reading)
+                _write_to_stream(self._upstream, data, pending.chunked,
+                                 self._resume_reading)
             else:
                 # If we're not connected upstream, store the fragment
                 # for later
-                self._store_chunk(data)
+                pending.store_chunk(data)
+
+                # Don't buffer the bodies of waiting requests without bound
+                if pending is not self._active:
+                    self._hold()
 
     def on_upstream_connect(self, upstream):
         self._upstream = upstream
+        pending = self._active
 
-        if self._preread_body and len(self._preread_body) > 0:
-            _write_to_stream(self._upstream, self._preread_body,
-                             self._chunked,
-                             self._downstream.handle.resume_reading)
-            self._preread_body = None
+        if pending.body:
+            _write_to_stream(self._upstream, pending.body,
+                             pending.chunked,
+                             self._resume_reading)
+            pending.body = None
+
+        if pending.complete:
+            self._finish_request(pending)
 
     def on_message_complete(self, is_chunked, keep_alive):
-        self._keep_alive = bool(keep_alive)
+        pending = self._reading
+        self._reading = None
+
+        pending.complete = True
+        pending.keep_alive = bool(keep_alive)
+
+        if is_chunked and self._intercepting_body:
+            pending.chunked = True
+
+        if pending is self._active:
+            if not pending.action.should_connect_upstream():
+                self._reply(pending)
+            elif self._upstream:
+                self._finish_request(pending)
+
+    def on_response_complete(self):
+        """
+        Called once the response to the request at the front of the queue
+        has been written downstream.
+        """
+        pending = self._active
+        self._active = None
+        self._upstream = None
 
-        if self._intercepted:
-            # Commit the response to the client (aka downstream)
-            writer = ResponseWriter(
-                self._response_tuple[0],
-                self._response_tuple[1],
-                self._downstream,
-                self.complete)
+        if pending is None or not pending.keep_alive:
+            # We're done here - close up shop
+            self._downstream.close()
+        elif self._pipelined:
+            self._proxy(self._pipelined.popleft())
+            self._release()
+        else:
+            self._resume_reading()
 
-            writer.commit()
+    def _dispatch(self, pending):
+        if self._active is None:
+            self._proxy(pending)
+        else:
+            self._pipelined.append(pending)
 
-        elif is_chunked:
-            # Finish the body with the closing chunk for the origin server
-            self._upstream.write(_CHUNK_CLOSE, self.complete)
+            if len(self._pipelined) >= self._max_pipelined:
+                self._hold()
 
-    def complete(self):
-        if self._keep_alive:
-            # Clean up the message obj
-            self._http_msg = HttpRequest()
+    def _proxy(self, pending):
+        self._active = pending
+        action = pending.action
+
+        # If we're rejecting then we're not going to connect to upstream
+        if not action.should_connect_upstream():
+            if pending.complete:
+                self._reply(pending)
         else:
-            # We're done here - close up shop
-            self._downstream.close()
+            # Hold up on the client side until we're done negotiating
+            # connections.
+            self._downstream.handle.disable_reading()
+
+            # We're routing to upstream; we need to know where to go
+            if action.is_routing():
+                self._connect_upstream(pending.request, action.payload)
+            else:
+                self._connect_upstream(pending.request)
+
+    def _reply(self, pending):
+        # Commit the response to the client (aka downstream)
+        writer = ResponseWriter(
+            pending.action.payload[0],
+            pending.action.payload[1],
+            self._downstream,
+            self.on_response_complete)
+
+        writer.commit()
+
+    def _finish_request(self, pending):
+        if pending.chunked:
+            # Finish the body with the closing chunk for the origin server
+            self._upstream.write(_CHUNK_CLOSE, self._resume_reading)
+        else:
+            self._resume_reading()
+
+    def _resume_reading(self):
+        if (not self._holding and self._suspended is None
+                and not self._downstream.closed()):
+            self._downstream.handle.resume_reading()
+
+    def _hold(self):
+        if not self._holding:
+            self._holding = True
+
+            if self._suspended is None and self._on_hold is not None:
+                self._on_hold()
+
+    def _release(self):
+        if self._holding:
+            self._holding = False
+
+            if self._suspended is None and self._on_release is not None:
+                self._on_release()
+
+    def _suspend(self, pending, future):
+        self._suspended = pending
+
+        if not self._holding and self._on_hold is not None:
+            self._on_hold()
+
+        future.add_done_callback(
+            lambda done: self._on_action_ready(pending, done))
+
+    def _on_action_ready(self, pending, future):
+        self._suspended = None
+
+        if self._downstream.closed():
+            return
+
+        pending.action = future.result()
+        self._negotiate_request_body(pending)
+        self._dispatch(pending)
+
+        # Dispatching may have filled the pipeline up
+        if not self._holding and self._on_release is not None:
+            self._on_release()
 
 
 class ResponseWriter(object):
@@ -234,16 +436,19 @@ class ResponseWriter(object):
             # Set to chunked to make the transfer easier
             self._response.header('transfer-encoding').values.append('chunked')
 
-        self._stream.write(self._response.to_bytes(), self.write_body)
+        self._stream.write(self._response.to_buffers(), self.write_body)
 
     def write_body(self):
         if self._source is not None:
             src_type = type(self._source)
 
-            if src_type is bytearray or src_type is bytes or srt_type is str:
+            if src_type is bytearray or src_type is bytes or src_type is str:
                 self.write_body_as_array()
             else:
-                raise TypeError('Unable to use {} as response body'.format(srt_type))
+                raise TypeError('Unable to use {} as response body'.format(src_type))
+        else:
+            # Nothing to stream after the head
+            self._on_complete()
 
     def write_body_as_array(self):
         src_len = len(self._source)
@@ -268,45 +473,43 @@ class UpstreamHandler(ProxyHandler):
     proxy.
     """
 
-    def __init__(self, downstream, upstream, filter_pl, request):
+    def __init__(self, downstream, upstream, filter_pl, request,
+                 on_complete=None):
         super(UpstreamHandler, self).__init__(filter_pl, HttpResponse())
         self._downstream = downstream
         self._upstream = upstream
         self._request = request
+        self._on_complete = on_complete
+        self._keep_alive = False
+        self._accumulator = AccumulationStream()
+        self.status_code = None
 
     def on_status(self, status_code):
+        self.status_code = status_code
         self._http_msg.status = str(status_code)
 
     def on_headers_complete(self):
         action = self._filter_pl.on_response_head(self._http_msg, self._request)
 
-        # If we are intercepting the response body do some negotiation
-        if self._filter_pl.intercepts_resp_body():
-
-            # If there's a content length, negotiate the transfer encoding
-            if self._http_msg.get_header('content-length'):
-                self._chunked = True
-                self._http_msg.remove_header('content-length')
-                self._http_msg.remove_header('transfer-encoding')
-
-                self._http_msg.header('transfer-encoding').values.append('chunked')
+        # Only bodies that a filter wants are decoded and re-chunked
+        self._chunked = self._negotiate_body(
+            self._http_msg, self._filter_pl.wants_response_body())
 
         if action.is_rejecting():
             self._intercepted = True
             self._response_tuple = action.payload
         else:
-            self._downstream.write(self._http_msg.to_bytes())
+            self._downstream.write(self._http_msg.to_buffers())
 
     def on_body(self, bytes, length, is_chunked):
         # Rejections simply discard the body
         if not self._intercepted:
-            accumulator = AccumulationStream()
             data = bytes
 
-            self._filter_pl.on_response_body(data, accumulator, self._request)
-
-            if accumulator.size() > 0:
-                data = accumulator.bytes
+            if self._intercepting_body:
+                self._filter_pl.on_response_body(
+                    bytes, self._accumulator, self._request)
+                data = self._accumulator.take(bytes)
 
             # Hold up on the upstream side until we're done sending this chunk
             self._upstream.handle.disable_reading()
@@ -316,25 +519,27 @@ class UpstreamHandler(ProxyHandler):
             _write_to_stream(
                 self._downstream,
                 data,
-                is_chunked or self._chunked,
+                self._chunked or (is_chunked and self._intercepting_body),
                 self._upstream.handle.resume_reading)
 
     def on_message_complete(self, is_chunked, keep_alive):
-        callback = self._upstream.close
+        self._keep_alive = bool(keep_alive)
         self._upstream.handle.disable_reading()
 
-        if keep_alive:
-            self._http_msg = HttpResponse()
-            callback = self._downstream.handle.resume_reading
-
         if self._intercepted:
             # Serialize our message to them
-            self._downstream.write(self._http_msg.to_bytes(), callback)
-        elif is_chunked or self._chunked:
+            self._downstream.write(self._http_msg.to_bytes(), self.complete)
+        elif self._chunked or (is_chunked and self._intercepting_body):
             # Finish the last chunk.
-            self._downstream.write(_CHUNK_CLOSE, callback)
+            self._downstream.write(_CHUNK_CLOSE, self.complete)
         else:
-            callback()
+            self.complete()
+
+    def complete(self):
+        if self._on_complete is not None:
+            self._on_complete(self._keep_alive)
+        elif not self._keep_alive:
+            self._upstream.close()
 
 
 class ConnectionTracker(object):
@@ -351,6 +556,21 @@ class ConnectionTracker(object):
             if not stream.closed():
                 stream.close()
 
+    def release(self, close=False):
+        """
+        Marks the target in use as idle. Streams to idle targets are kept
+        for reuse unless close is set but closing them no longer ends the
+        proxy connection.
+        """
+        target = self._target_in_use
+        self._target_in_use = None
+
+        if close:
+            stream = self._streams.pop(target, None)
+
+            if stream is not None and not stream.closed():
+                stream.close()
+
     def connect(self, target):
         self._target_in_use = target
         live_stream = self._streams.get(target)
@@ -383,7 +603,9 @@ class ConnectionTracker(object):
             # Disable error cb on close
             live_stream.on_error(None)
 
-            del self._streams[target]
+            if self._streams.get(target) is live_stream:
+                del self._streams[target]
+
             if self._target_in_use == target:
                 self.destroy()
                 self._on_target_closed()
@@ -394,11 +616,12 @@ class ConnectionTracker(object):
             # Dsiable close cb on error
             live_stream.on_close(None)
 
-            if self._target_in_use == target:
+            if self._streams.get(target) is live_stream:
                 del self._streams[target]
-                if self._target_in_use == target:
-                    self.destroy()
-                    self._on_target_error(error)
+
+            if self._target_in_use == target:
+                self.destroy()
+                self._on_target_error(error)
         live_stream.on_error(on_error)
 
         # Build and set the on_connect callback and then connect
@@ -412,11 +635,18 @@ class ProxyConnection(object):
     A proxy connection manages the lifecycle of the sockets opened during a
     proxied client request against Pyrox.
     """
-    def __init__(self, us_filter_pl, ds_filter_pl, downstream, router):
+    def __init__(self, us_filter_pl, ds_filter_pl, downstream, router,
+                 max_pipelined=_DEFAULT_MAX_PIPELINED, outliers=None):
         self._ds_filter_pl = ds_filter_pl
         self._us_filter_pl = us_filter_pl
         self._router = router
+        self._outliers = outliers
         self._upstream_parser = None
+        self._held_read = None
+
+        # The route of the request in flight upstream and when it was sent
+        self._route = None
+        self._route_started = None
         self._upstream_tracker = ConnectionTracker(
             self._on_upstream_live,
             self._on_upstream_close,
@@ -427,8 +657,20 @@ class ProxyConnection(object):
         self._downstream_handler = DownstreamHandler(
             self._downstream,
             self._ds_filter_pl,
-            self._connect_upstream)
-        self._downstream_parser = RequestParser(self._downstream_handler)
+            self._connect_upstream,
+            max_pipelined,
+            self._hold_downstream,
+            self._release_downstream)
+        self._downstream_parser = RequestParser(
+            self._downstream_handler,
+            batch_headers=True,
+            body_views=not ds_filter_pl.intercepts_req_body(),
+            raw_chunks=not ds_filter_pl.intercepts_req_body(),
+            capture_head=True)
+
+        # Only pipelines with body filters switch modes between requests
+        if ds_filter_pl.intercepts_req_body():
+            self._downstream_handler.parser = self._downstream_parser
         self._downstream.on_close(self._on_downstream_close)
         self._downstream.read(self._on_downstream_read)
 
@@ -436,21 +678,23 @@ class ProxyConnection(object):
         if route is not None:
             # This does some type checking for routes passed up via filter
             self._router.set_next(route)
-        upstream_target = self._router.get_next()
+        upstream_target = self._router.get_next(request)
 
         if upstream_target is None:
-            self._downstream.write(_UPSTREAM_UNAVAILABLE.to_bytes(),
-                self._downstream.handle.resume_reading)
+            self._downstream.write(get_template(UPSTREAM_UNAVAILABLE).to_bytes(),
+                self._downstream_handler.on_response_complete)
             return
 
-        # Hold downstream reads
-        self._hold_downstream = True
-
         # Update the request to proxy upstream and store it
         request.replace_header('host').values.append(
             '{}:{}'.format(upstream_target[0], upstream_target[1]))
         self._request = request
 
+        # Let the router know how loaded the target is
+        self._route = upstream_target
+        self._route_started = tornado.ioloop.IOLoop.current().time()
+        self._router.on_request_start(upstream_target)
+
         try:
             self._upstream_tracker.connect(upstream_target)
         except Exception as ex:
@@ -461,17 +705,29 @@ class ProxyConnection(object):
             self._downstream,
             upstream,
             self._us_filter_pl,
-            self._request)
+            self._request,
+            self._on_upstream_complete)
 
+        # Reuse the response parser across keep-alive responses
         if self._upstream_parser:
-            self._upstream_parser.destroy()
-        self._upstream_parser = ResponseParser(self._upstream_handler)
+            self._upstream_parser.reset(self._upstream_handler)
+        else:
+            self._upstream_parser = ResponseParser(
+                self._upstream_handler,
+                batch_headers=True,
+                body_views=not self._us_filter_pl.intercepts_resp_body(),
+                raw_chunks=not self._us_filter_pl.intercepts_resp_body(),
+                capture_head=True)
+
+        if self._us_filter_pl.intercepts_resp_body():
+            self._upstream_handler.parser = self._upstream_parser
 
         # Set the read callback
         upstream.read(self._on_upstream_read)
 
-        # Send the proxied request object
-        upstream.write(self._request.to_bytes())
+        # Send the proxied request head. Any body already read goes out
+        # right behind it and both are sent with a single gathering send.
+        upstream.write(self._request.to_buffers())
 
         # Drop the ref to the proxied request head
         self._request = None
@@ -479,7 +735,36 @@ class ProxyConnection(object):
         # Set up our downstream handler
         self._downstream_handler.on_upstream_connect(upstream)
 
+    def _on_upstream_complete(self, keep_alive):
+        self._end_route(failed=False,
+                        status_code=self._upstream_handler.status_code)
+        self._upstream_tracker.release(close=not keep_alive)
+        self._downstream_handler.on_response_complete()
+
+    def _end_route(self, failed, status_code=None, upstream_failed=False):
+        route = self._route
+
+        if route is None:
+            return
+
+        self._route = None
+
+        if failed:
+            self._router.on_request_failed(route)
+
+            # Only failures of the upstream count against it
+            if upstream_failed and self._outliers is not None:
+                self._outliers.on_request_failed(route)
+        else:
+            latency = (tornado.ioloop.IOLoop.current().time() -
+                       self._route_started)
+            self._router.on_request_complete(route, latency)
+
+            if self._outliers is not None:
+                self._outliers.on_request_complete(route, latency, status_code)
+
     def _on_downstream_close(self):
+        self._end_route(failed=True)
         self._upstream_tracker.destroy()
         self._downstream_parser.destroy()
         self._downstream_parser = None
@@ -492,11 +777,15 @@ class ProxyConnection(object):
 
     def _on_upstream_error(self, error):
         _LOG.error('Upstream error: {}'.format(error))
+        self._end_route(failed=True, upstream_failed=True)
 
         if not self._downstream.closed():
-            self._downstream.write(_BAD_GATEWAY_RESP.to_bytes())
+            self._downstream.write(get_template(PYROX_ERROR).to_bytes(),
+                self._downstream_handler.on_response_complete)
 
     def _on_upstream_close(self):
+        self._end_route(failed=True, upstream_failed=True)
+
         if not self._downstream.closed():
             self._downstream.close()
 
@@ -504,9 +793,37 @@ class ProxyConnection(object):
             self._upstream_parser.destroy()
             self._upstream_parser = None
 
+    def _hold_downstream(self):
+        # Stop parsing where we are and keep whatever is left of the read
+        self._downstream_parser.pause()
+        self._downstream.handle.disable_reading()
+
+    def _release_downstream(self):
+        if self._downstream_parser is None:
+            return
+
+        self._downstream_parser.resume()
+
+        if self._held_read is not None:
+            data, offset = self._held_read
+            self._held_read = None
+            self._parse_downstream(data, offset)
+
     def _on_downstream_read(self, data):
+        if self._held_read is not None:
+            held, offset = self._held_read
+            self._held_read = None
+
+            data = held[offset:] + data
+
+        self._parse_downstream(data, 0)
+
+    def _parse_downstream(self, data, offset):
         try:
-            self._downstream_parser.execute(data)
+            consumed = self._downstream_parser.execute(data, offset)
+
+            if offset + consumed < len(data):
+                self._held_read = (data, offset + consumed)
         except StreamClosedError:
             pass
         except Exception as ex:
@@ -529,11 +846,24 @@ class TornadoHttpProxy(TCPServer):
     :param pipelines: This is a tuple with the upstream filter pipeline factory
                       as the first element and the downstream filter pipeline
                       factory as the second element.
+    :param max_pipelined: The number of requests a client may pipeline ahead
+                          of the request being proxied before Pyrox stops
+                          reading from it.
+    :param router: The router that picks the upstream target of each
+                   request, or the name of the router to create.
+    :param outliers: The OutlierDetector told of the outcome of every
+                     request sent upstream, if any.
     """
     def __init__(self, pipeline_factories, default_us_targets=None,
-                 ssl_options=None):
+                 ssl_options=None, max_pipelined=_DEFAULT_MAX_PIPELINED,
+                 router=ROUND_ROBIN, outliers=None):
         super(TornadoHttpProxy, self).__init__(ssl_options=ssl_options)
-        self._router = RoundRobinRouter(default_us_targets)
+        self._outliers = outliers
+        if isinstance(router, RoutingHandler):
+            self._router = router
+        else:
+            self._router = new_router(router, default_us_targets)
+        self._max_pipelined = max_pipelined
         self.us_pipeline_factory = pipeline_factories[0]
         self.ds_pipeline_factory = pipeline_factories[1]
 
@@ -542,4 +872,6 @@ class TornadoHttpProxy(TCPServer):
             self.us_pipeline_factory(),
             self.ds_pipeline_factory(),
             downstream,
-            self._router)
+            self._router,
+            self._max_pipelined,
+            self._outliers)
@@ -1,4 +1,9 @@
 import sys
+import math
+import time
+import bisect
+import random
+import hashlib
 
 
 if sys.version_info.major == 2:
@@ -7,6 +12,10 @@ elif sys.version_info.major == 3:
     from urllib.parse import urlparse
 
 
+# Latencies only need a clock that never goes backwards
+_clock = getattr(time, 'monotonic', time.time)
+
+
 PROTOCOL_HTTP = 0
 PROTOCOL_HTTPS = 1
 
@@ -24,6 +33,38 @@ _DEFAULT_PROTOCOL = PROTOCOL_HTTP
 _DEFAULT_PROTOCOL_PORT = _PROTOCOL_DEFAULT_PORTS[_DEFAULT_PROTOCOL]
 
 
+"""
+Names of the routers that may be selected in the [routing] configuration
+section.
+"""
+ROUND_ROBIN = 'round_robin'
+LEAST_OUTSTANDING = 'least_outstanding'
+POWER_OF_TWO = 'power_of_two'
+EWMA = 'ewma'
+CONSISTENT_HASH = 'consistent_hash'
+
+
+"""
+Seconds it takes for a latency measured by the EWMA router to lose most of
+its weight.
+"""
+_DEFAULT_EWMA_DECAY = 10.0
+
+
+"""
+Points each route gets on the consistent hash ring. More points spread the
+keys more evenly.
+"""
+_RING_POINTS = 160
+
+
+"""
+How far above the average load a route may go before the consistent hash
+router spills its keys over to the next route on the ring.
+"""
+_DEFAULT_LOAD_FACTOR = 1.25
+
+
 def parse_route_url(url):
     parsed_url = urlparse(url)
 
@@ -67,10 +108,22 @@ class NoRoutesAvailableError(Exception):
 
 
 class RoutingHandler(object):
-
+    """
+    Base class of the routers that pick the upstream target of each request.
+    The proxy reports the start and the end of every request it sends
+    upstream so that routers may take the load of each target into
+    account. Routes are (host, port, protocol) tuples.
+
+    Routes may be marked unhealthy by a health checker or ejected by an
+    outlier detector. Either way they are skipped until they are marked
+    healthy or returned again.
+    """
     def __init__(self, routes=None):
         self.routes = list()
         self._next_route = None
+        self._unhealthy = set()
+        self._ejected = set()
+        self._unavailable = set()
 
         if routes is not None:
             for route in routes:
@@ -85,20 +138,75 @@ class RoutingHandler(object):
         else:
             raise TypeError('A route must be either a valid URL string.')
 
-    def get_next(self):
+    def get_next(self, request=None):
+        """
+        Returns the route for the next request. Routers that pick routes by
+        what is being requested are passed the HttpRequest.
+        """
         next = None
 
         if self._next_route is not None:
             next = self._next_route
             self._next_route = None
         else:
-            next = self._get_next()
+            next = self._get_next_for(request)
 
         return next
 
+    def set_healthy(self, route, healthy):
+        if healthy:
+            self._unhealthy.discard(route)
+        else:
+            self._unhealthy.add(route)
+        self._unavailable = self._unhealthy | self._ejected
+
+    def healthy(self, route):
+        return route not in self._unhealthy
+
+    def set_ejected(self, route, ejected):
+        if ejected:
+            self._ejected.add(route)
+        else:
+            self._ejected.discard(route)
+        self._unavailable = self._unhealthy | self._ejected
+
+    def ejected(self, route):
+        return route in self._ejected
+
+    def available_routes(self):
+        """
+        Returns the routes that are neither unhealthy nor ejected.
+        """
+        if not self._unavailable:
+            return self.routes
+        return [route for route in self.routes
+                if route not in self._unavailable]
+
+    def _get_next_for(self, request):
+        return self._get_next()
+
     def _get_next(self):
         raise NoRoutesAvailableError('No routes available.')
 
+    def on_request_start(self, route):
+        """
+        Called when a request is about to be sent to route.
+        """
+        pass
+
+    def on_request_complete(self, route, latency):
+        """
+        Called when the response to a request sent to route has been relayed
+        in full. The latency is in seconds.
+        """
+        pass
+
+    def on_request_failed(self, route):
+        """
+        Called when a request sent to route ended without a response.
+        """
+        pass
+
 
 class RoundRobinRouter(RoutingHandler):
 
@@ -108,10 +216,294 @@ class RoundRobinRouter(RoutingHandler):
 
     def _get_next(self):
         next_route = None
+        routes = self.available_routes()
 
-        if len(self.routes) > 0:
+        if len(routes) > 0:
             self._last_default += 1
-            idx = self._last_default % len(self.routes)
-            next_route = self.routes[idx]
+            idx = self._last_default % len(routes)
+            next_route = routes[idx]
 
         return next_route
+
+
+class LoadAwareRouter(RoutingHandler):
+    """
+    Base class of the routers that keep track of the requests outstanding
+    on each route.
+    """
+    def __init__(self, routes):
+        super(LoadAwareRouter, self).__init__(routes)
+        self._outstanding = dict((route, 0) for route in self.routes)
+
+    def outstanding(self, route):
+        return self._outstanding.get(route, 0)
+
+    def on_request_start(self, route):
+        self._outstanding[route] = self._outstanding.get(route, 0) + 1
+
+    def on_request_complete(self, route, latency):
+        self._finished(route)
+
+    def on_request_failed(self, route):
+        self._finished(route)
+
+    def _finished(self, route):
+        outstanding = self._outstanding.get(route, 0)
+
+        if outstanding > 0:
+            self._outstanding[route] = outstanding - 1
+
+
+class LeastOutstandingRouter(LoadAwareRouter):
+    """
+    Routes each request to the route with the fewest requests outstanding.
+    Ties are broken in turn so idle routes still share the load.
+    """
+    def __init__(self, routes):
+        super(LeastOutstandingRouter, self).__init__(routes)
+        self._last_default = 0
+
+    def _get_next(self):
+        routes = self.available_routes()
+
+        if len(routes) == 0:
+            return None
+
+        self._last_default += 1
+        best = None
+        best_outstanding = None
+
+        for offset in range(len(routes)):
+            route = routes[(self._last_default + offset) % len(routes)]
+            outstanding = self._outstanding.get(route, 0)
+
+            if best is None or outstanding < best_outstanding:
+                best = route
+                best_outstanding = outstanding
+
+        return best
+
+
+class PowerOfTwoRouter(LoadAwareRouter):
+    """
+    Picks two routes at random and routes each request to the one of them
+    with fewer requests outstanding. This keeps close to the balance of
+    least outstanding routing while avoiding herding on the single least
+    loaded route.
+    """
+    def _get_next(self):
+        routes = self.available_routes()
+
+        if len(routes) < 2:
+            return routes[0] if routes else None
+
+        first, second = random.sample(routes, 2)
+
+        if self._score(second) < self._score(first):
+            return second
+        return first
+
+    def _score(self, route):
+        return self._outstanding.get(route, 0)
+
+
+class EwmaRouter(PowerOfTwoRouter):
+    """
+    Keeps an exponentially weighted moving average of the latency of each
+    route and scores routes by that latency multiplied by the requests
+    they have outstanding. Each request goes to the better of two routes
+    picked at random. Routes without measurements score lowest so that they
+    get measured.
+
+    :param decay: seconds over which an older measurement loses most of its
+                  weight
+    """
+    def __init__(self, routes, decay=_DEFAULT_EWMA_DECAY):
+        super(EwmaRouter, self).__init__(routes)
+        self._decay = decay
+        self._latency = dict()
+        self._measured = dict()
+
+    def latency(self, route):
+        return self._latency.get(route, 0.0)
+
+    def on_request_complete(self, route, latency, now=None):
+        super(EwmaRouter, self).on_request_complete(route, latency)
+
+        if now is None:
+            now = _clock()
+
+        last = self._measured.get(route)
+        self._measured[route] = now
+
+        if last is None:
+            self._latency[route] = latency
+        else:
+            # Measurements far apart weigh the newer one more
+            weight = math.exp(-max(now - last, 0.0) / self._decay)
+            self._latency[route] = (
+                self._latency[route] * weight + latency * (1.0 - weight))
+
+    def _score(self, route):
+        return self._latency.get(route, 0.0) * (
+            self._outstanding.get(route, 0) + 1)
+
+
+def _hash(value):
+    if not isinstance(value, bytes):
+        value = value.encode('utf-8')
+
+    # The first 32 bits of the MD5 digest, as ketama does
+    return int(hashlib.md5(value).hexdigest()[:8], 16)
+
+
+def _path_key(request):
+    return request.url.split('?', 1)[0]
+
+
+def _url_key(request):
+    return request.url
+
+
+def _header_key(name):
+    def key(request):
+        header = request.get_header(name)
+
+        if header is None or not header.values:
+            return None
+        return header.values[0]
+    return key
+
+
+def _cookie_key(name):
+    def key(request):
+        header = request.get_header('cookie')
+
+        if header is None:
+            return None
+
+        for value in header.values:
+            for cookie in value.split(';'):
+                cookie_name, _, cookie_value = cookie.strip().partition('=')
+
+                if cookie_name == name:
+                    return cookie_value
+        return None
+    return key
+
+
+def request_key(spec):
+    """
+    Returns a function that takes the key to hash out of a HttpRequest, or
+    None if the request has no such key. The spec is one of "path", "url",
+    "header:<name>" or "cookie:<name>". A ValueError is raised for any
+    other spec.
+    """
+    kind, _, name = spec.partition(':')
+
+    if kind == 'path' and not name:
+        return _path_key
+    if kind == 'url' and not name:
+        return _url_key
+    if kind == 'header' and name:
+        return _header_key(name)
+    if kind == 'cookie' and name:
+        return _cookie_key(name)
+
+    raise ValueError('Unknown request key: {}'.format(spec))
+
+
+class ConsistentHashRouter(LoadAwareRouter):
+    """
+    Routes requests with the same key to the same route for as long as that
+    route isn't overloaded, which keeps caching origins warm. Routes are
+    placed on a hash ring by their address so adding or removing one only
+    moves the keys of the routes next to it.
+
+    Loads are bounded: a route takes a request only while it has fewer
+    requests in flight than load_factor times the average. Otherwise the
+    request goes to the next route along the ring. Requests without a key
+    go to the least loaded route.
+
+    :param key: what to hash requests by, see request_key
+    :param load_factor: how far above the average load a route may go
+    """
+    def __init__(self, routes, key='path', load_factor=_DEFAULT_LOAD_FACTOR):
+        super(ConsistentHashRouter, self).__init__(routes)
+        self._key = request_key(key)
+        self._load_factor = load_factor
+        self._build_ring()
+
+    def _build_ring(self):
+        points = list()
+
+        for route in self.routes:
+            for idx in range(_RING_POINTS):
+                points.append((_hash('{}:{}-{}'.format(
+                    route[0], route[1], idx)), route))
+
+        points.sort()
+        self._ring_hashes = [point[0] for point in points]
+        self._ring_routes = [point[1] for point in points]
+
+    def _get_next_for(self, request):
+        routes = self.available_routes()
+
+        if len(routes) == 0:
+            return None
+
+        key = self._key(request) if request is not None else None
+
+        if key is None:
+            return min(routes, key=self.outstanding)
+
+        # Routes are full once they carry more than their share of the load
+        # counting the request being routed
+        total = sum(self._outstanding.values()) + 1
+        capacity = math.ceil(self._load_factor * total / len(routes))
+
+        ring_routes = self._ring_routes
+        start = bisect.bisect(self._ring_hashes, _hash(key))
+        first = None
+
+        # Unavailable routes pass their keys on as if they had been removed
+        for offset in range(len(ring_routes)):
+            route = ring_routes[(start + offset) % len(ring_routes)]
+
+            if route in self._unavailable:
+                continue
+
+            if self._outstanding.get(route, 0) < capacity:
+                return route
+
+            if first is None:
+                first = route
+
+        return first
+
+
+_ROUTERS = {
+    ROUND_ROBIN: RoundRobinRouter,
+    LEAST_OUTSTANDING: LeastOutstandingRouter,
+    POWER_OF_TWO: PowerOfTwoRouter,
+    EWMA: EwmaRouter,
+    CONSISTENT_HASH: ConsistentHashRouter
+}
+
+
+def new_router(name, routes, hash_key='path',
+               load_factor=_DEFAULT_LOAD_FACTOR):
+    """
+    Returns a new router of the kind named for the given route URLs. The
+    hash key and load factor only apply to the consistent hash router. A
+    ValueError is raised if there's no router by that name.
+    """
+    router_cls = _ROUTERS.get(name)
+
+    if router_cls is None:
+        raise ValueError('Unknown router: {}'.format(name))
+
+    if router_cls is ConsistentHashRouter:
+        return router_cls(routes, hash_key, load_factor)
+
+    return router_cls(routes)
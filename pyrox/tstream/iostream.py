@@ -3,6 +3,7 @@ from __future__ import absolute_import, division, print_function,\
 
 import collections
 import errno
+import itertools
 import socket
 import logging
 import ssl
@@ -30,6 +31,20 @@ _ERRNO_WOULDBLOCK = (errno.EWOULDBLOCK, errno.EAGAIN)
 # They should be caught and handled less noisily than other errors.
 _ERRNO_CONNRESET = (errno.ECONNRESET, errno.ECONNABORTED, errno.EPIPE)
 
+# Gathering sends need socket.sendmsg which is only there on Python 3.3+
+_HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+# Most buffers handed to a single gathering send. This stays well below
+# IOV_MAX on the platforms we care about.
+_MAX_GATHERED_BUFFERS = 64
+
+# Where sends can't gather, queued buffers are joined into one send as long
+# as the result stays under this many bytes. Larger buffers go out as they
+# are rather than being copied.
+_MAX_COALESCED_BYTES = 16 * 1024
+
+_UNICODE = type(u'')
+
 # Nice constant for enabling debug output
 import sys
 
@@ -37,6 +52,27 @@ import sys
 _SHOULD_LOG_DEBUG_OUTPUT = gen_log.isEnabledFor(logging.DEBUG)
 
 
+def _check_writable(src):
+    if not isinstance(src, (basestring, bytearray, memoryview)):
+        raise TypeError(
+            "bytes/bytearray/memoryview/unicode/str objects only")
+
+
+def _as_sendable(src):
+    # Partial sends slice by byte so unicode is encoded up front
+    if isinstance(src, _UNICODE):
+        return src.encode('utf-8')
+    return src
+
+
+def _as_bytes(src):
+    if isinstance(src, memoryview):
+        return src.tobytes()
+    if isinstance(src, bytearray):
+        return bytes(src)
+    return src
+
+
 class StreamClosedError(IOError):
     """Exception raised by `IOStream` methods when the stream is closed.
 
@@ -61,20 +97,70 @@ class WriteQueue(object):
             return (self._write_queue[0], self._last_send_idx)
         return None
 
+    def gather(self, max_buffers=_MAX_GATHERED_BUFFERS):
+        """
+        Returns up to max_buffers of the queued buffers, in order, with the
+        part of the first one that was already sent cut off.
+        """
+        gathered = list(itertools.islice(self._write_queue, max_buffers))
+
+        if gathered and self._last_send_idx > 0:
+            gathered[0] = memoryview(gathered[0])[self._last_send_idx:]
+
+        return gathered
+
+    def coalesce(self, max_bytes=_MAX_COALESCED_BYTES):
+        """
+        Returns the next buffer to send where sends can't gather. Small
+        buffers at the front of the queue are joined into one first, as
+        long as the joined buffer stays within max_bytes.
+        """
+        queue = self._write_queue
+
+        if self._last_send_idx > 0:
+            return memoryview(queue[0])[self._last_send_idx:]
+
+        total = len(queue[0])
+        count = 1
+
+        for src in itertools.islice(queue, 1, None):
+            if total + len(src) > max_bytes:
+                break
+
+            total += len(src)
+            count += 1
+
+        if count > 1:
+            joined = b''.join(_as_bytes(queue.popleft()) for _ in range(count))
+            queue.appendleft(joined)
+
+        return queue[0]
+
     def clear(self):
         self._write_queue.clear()
+        self._last_send_idx = 0
 
     def append(self, src):
-        self._write_queue.append(src)
+        self._write_queue.append(_as_sendable(src))
+
+    def extend(self, srcs):
+        self._write_queue.extend(_as_sendable(src) for src in srcs)
 
     def advance(self, bytes_to_advance):
-        next_src = self._write_queue[0]
+        while bytes_to_advance > 0 and self._write_queue:
+            remaining = len(self._write_queue[0]) - self._last_send_idx
+
+            if bytes_to_advance >= remaining:
+                self._write_queue.popleft()
+                self._last_send_idx = 0
+                bytes_to_advance -= remaining
+            else:
+                self._last_send_idx += bytes_to_advance
+                bytes_to_advance = 0
 
-        if bytes_to_advance + self._last_send_idx >= len(next_src):
+        # Empty buffers at the front have nothing left to send
+        while self._write_queue and len(self._write_queue[0]) == 0:
             self._write_queue.popleft()
-            self._last_send_idx = 0
-        else:
-            self._last_send_idx += bytes_to_advance
 
 
 class IOHandler(object):
@@ -198,6 +284,9 @@ class FileDescriptorHandle(object):
 
 class SocketIOHandler(IOHandler):
 
+    # Whether queued buffers go out with one gathering send
+    _gathers = _HAS_SENDMSG
+
     def __init__(self, sock, io_loop=None, recv_chunk_size=4096):
         super(SocketIOHandler, self).__init__(io_loop)
 
@@ -270,13 +359,25 @@ class SocketIOHandler(IOHandler):
         self.handle.resume_reading()
 
     def write(self, msg, callback=None):
+        """
+        Queues msg to be sent. msg may also be a list or tuple of buffers,
+        in which case they are sent in order without being joined first.
+        Queued buffers are sent together with a single gathering send
+        where the platform supports it.
+        """
         self._assert_not_closed()
 
-        if not isinstance(msg, basestring) and not isinstance(msg, bytearray):
-            raise TypeError("bytes/bytearray/unicode/str objects only")
+        if isinstance(msg, (list, tuple)):
+            for src in msg:
+                _check_writable(src)
 
-        # Append the data for writing - this should not copy the data
-        self._write_queue.append(msg)
+            # Queue each buffer as is - this should not copy the data
+            self._write_queue.extend(msg)
+        else:
+            _check_writable(msg)
+
+            # Append the data for writing - this should not copy the data
+            self._write_queue.append(msg)
         # Enable writing on the FD
         self.handle.resume_writing()
         # Set our callback - writing None to the method below is okay
@@ -328,6 +429,11 @@ class SocketIOHandler(IOHandler):
     def _do_write(self, send_buffer):
         return self._socket.send(send_buffer)
 
+    def _do_writev(self, send_buffers):
+        if len(send_buffers) > 1:
+            return self._socket.sendmsg(send_buffers)
+        return self._do_write(send_buffers[0])
+
     def _handle_events(self, fd, events):
         #gen_log.debug('Handle event for stream(fd: {})'.format(self.handle.fd))
 
@@ -383,15 +489,16 @@ class SocketIOHandler(IOHandler):
     def handle_write(self):
         if self._write_queue.has_next():
             try:
-                msg = None
-
                 while self._write_queue.has_next():
-                    msg, offset = self._write_queue.next()
-                    sent = self._do_write(msg[offset:])
+                    if self._gathers:
+                        sent = self._do_writev(self._write_queue.gather())
+                    else:
+                        sent = self._do_write(self._write_queue.coalesce())
                     self._write_queue.advance(sent)
             except (socket.error, IOError, OSError) as ex:
                 if ex.args[0] in _ERRNO_WOULDBLOCK:
-                    self._write_queue.appendleft(msg)
+                    # Nothing was sent; try again on the next send event
+                    pass
                 else:
                     self._write_queue.clear()
                     self.handle_error(ex.args[0])
@@ -445,6 +552,9 @@ class SSLSocketIOHandler(SocketIOHandler):
     before constructing the `SSLSocketIOHandler`. Unconnected sockets will be
     wrapped when `SSLSocketIOHandler.connect` is finished.
     """
+    # SSL sockets can't gather so small buffers are joined into one record
+    _gathers = False
+
     def __init__(self, *args, **kwargs):
         """The ``ssl_options`` keyword argument may either be a dictionary
         of keywords arguments for `ssl.wrap_socket`, or an `ssl.SSLContext`
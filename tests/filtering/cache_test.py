@@ -0,0 +1,150 @@
+import mock
+import unittest
+
+from tornado.concurrent import Future
+from tornado.testing import AsyncTestCase
+
+import pyrox.filtering as filtering
+from pyrox.filtering import cache
+from pyrox.filtering.pipeline import FilterAction, REPLY
+from pyrox.http import HttpRequest
+
+
+def _request(token):
+    request = HttpRequest()
+    request.header('X-Auth-Token').values.append(token)
+    return request
+
+
+class TokenFilter(filtering.HttpFilter):
+
+    def __init__(self):
+        self.calls = list()
+
+    @filtering.handles_request_head
+    @filtering.memoize('X-Auth-Token', ttl=60, max_entries=2)
+    def on_request_head(self, request_head):
+        token = request_head.get_header('X-Auth-Token').values[0]
+        self.calls.append(token)
+
+        if token == 'bad':
+            return filtering.reject()
+        return filtering.next()
+
+
+class AsyncTokenFilter(filtering.HttpFilter):
+
+    def __init__(self):
+        self.futures = list()
+
+    @filtering.handles_request_head
+    @filtering.memoize(lambda request_head: request_head.url)
+    def on_request_head(self, request_head):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+class WhenUsingLruCaches(unittest.TestCase):
+
+    def test_least_recently_used_entries_are_evicted(self):
+        lru = cache.LruCache(max_entries=2)
+        lru.put('a', 1)
+        lru.put('b', 2)
+        lru.get('a')
+        lru.put('c', 3)
+
+        self.assertEqual(1, lru.get('a'))
+        self.assertIs(cache.MISSING, lru.get('b'))
+        self.assertEqual(1, lru.evictions)
+
+    def test_entries_expire(self):
+        lru = cache.LruCache(ttl=10)
+
+        with mock.patch.object(cache, '_clock', return_value=100):
+            lru.put('a', None)
+            self.assertIsNone(lru.get('a'))
+
+        with mock.patch.object(cache, '_clock', return_value=110):
+            self.assertIs(cache.MISSING, lru.get('a'))
+
+        self.assertEqual({'hits': 1, 'misses': 1, 'evictions': 0,
+                          'entries': 0}, lru.stats())
+
+    def test_empty_caches_store_nothing(self):
+        lru = cache.LruCache(max_entries=0)
+        lru.put('a', 1)
+
+        self.assertIs(cache.MISSING, lru.get('a'))
+        self.assertEqual(0, len(lru))
+
+    def test_negative_sizes_are_rejected(self):
+        with self.assertRaises(ValueError):
+            cache.LruCache(max_entries=-1)
+
+
+class WhenMemoizingHandlers(unittest.TestCase):
+
+    def setUp(self):
+        TokenFilter.on_request_head.cache.clear()
+
+    def test_repeat_decisions_skip_the_handler(self):
+        http_filter = TokenFilter()
+        pipeline = filtering.HttpFilterPipeline()
+        pipeline.add_filter(http_filter)
+
+        first = pipeline.on_request_head(_request('bad'))
+        second = pipeline.on_request_head(_request('bad'))
+        pipeline.on_request_head(_request('good'))
+
+        self.assertIs(first, second)
+        self.assertTrue(second.is_replying())
+        self.assertEqual(['bad', 'good'], http_filter.calls)
+
+    def test_messages_without_a_key_are_not_cached(self):
+        key = cache.header_key('X-Auth-Token')
+
+        self.assertIsNone(key(HttpRequest()))
+        self.assertEqual(('abc',), key(_request('abc')))
+
+    def test_transient_results_are_not_cached(self):
+        class Overloaded(filtering.HttpFilter):
+            @filtering.memoize(lambda head: 'key')
+            def decide(self, head):
+                return FilterAction(REPLY, transient=True)
+
+        http_filter = Overloaded()
+        http_filter.decide(None)
+
+        self.assertEqual(0, len(Overloaded.decide.cache))
+
+
+class WhenMemoizingFutures(AsyncTestCase):
+
+    def _wait_for(self, future):
+        self.io_loop.add_future(future, self.stop)
+        return self.wait().result()
+
+    def test_concurrent_misses_are_coalesced(self):
+        http_filter = AsyncTokenFilter()
+        pipeline = filtering.HttpFilterPipeline()
+        pipeline.add_filter(http_filter)
+
+        request = HttpRequest()
+        request.url = '/tenants/1'
+
+        first = pipeline.on_request_head(request)
+        second = pipeline.on_request_head(request)
+        self.assertEqual(1, len(http_filter.futures))
+
+        route = filtering.route('localhost:8080')
+        http_filter.futures[0].set_result(route)
+
+        self.assertIs(route, self._wait_for(first))
+        self.assertIs(route, self._wait_for(second))
+        self.assertIs(route, pipeline.on_request_head(request))
+        self.assertEqual(1, len(http_filter.futures))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import functools
+import threading
+import unittest
+
+from tornado.testing import AsyncTestCase
+
+import pyrox.filtering as filtering
+from pyrox.filtering.offload import ThreadPoolExecutor, PROCESS_POOL
+
+
+class OffloadedFilter(filtering.HttpFilter):
+
+    def __init__(self):
+        self.threads = list()
+
+    @filtering.handles_request_head
+    @filtering.offload
+    def on_request_head(self, request_head):
+        self.threads.append(threading.current_thread())
+        return filtering.reject()
+
+
+class BlockingFilter(filtering.HttpFilter):
+
+    def __init__(self, release):
+        self.release = release
+
+    @filtering.handles_request_head
+    @filtering.offload(queue_limit=1)
+    def on_request_head(self, request_head):
+        self.release.wait(5)
+        return filtering.next()
+
+
+def passthrough(handler_func):
+    @functools.wraps(handler_func)
+    def wrapper(self, *args):
+        return handler_func(self, *args)
+
+    wrapper._wrapped_handler = getattr(
+        handler_func, '_wrapped_handler', handler_func)
+    return wrapper
+
+
+class AliasedProcessFilter(filtering.HttpFilter):
+
+    def _consume(self, request_head):
+        return filtering.consume()
+
+    # Neither the attribute name nor the outer wrapper match the function
+    on_request_head = filtering.handles_request_head(
+        passthrough(filtering.offload(pool=PROCESS_POOL)(_consume)))
+
+
+class BodyFilter(filtering.HttpFilter):
+
+    @filtering.handles_request_body
+    @filtering.offload
+    def on_request_body(self, body_part, output):
+        pass
+
+
+@unittest.skipIf(ThreadPoolExecutor is None, 'concurrent.futures missing')
+class WhenOffloadingFilters(AsyncTestCase):
+
+    def _wait_for(self, future):
+        self.io_loop.add_future(future, self.stop)
+        return self.wait().result()
+
+    def test_handler_runs_off_the_ioloop_thread(self):
+        http_filter = OffloadedFilter()
+
+        pipeline = filtering.HttpFilterPipeline()
+        pipeline.add_filter(http_filter)
+
+        action = self._wait_for(pipeline.on_request_head('request'))
+
+        self.assertTrue(action.is_replying())
+        self.assertIsNot(threading.current_thread(), http_filter.threads[0])
+
+    def test_calls_over_the_queue_limit_are_rejected(self):
+        release = threading.Event()
+
+        pipeline = filtering.HttpFilterPipeline()
+        pipeline.add_filter(BlockingFilter(release))
+
+        first = pipeline.on_request_head('request')
+        second = pipeline.on_request_head('request')
+
+        self.assertTrue(second.is_replying())
+        self.assertTrue(second.transient)
+
+        release.set()
+        self.assertFalse(self._wait_for(first).breaks_pipeline())
+
+    def test_process_pool_finds_wrapped_and_aliased_handlers(self):
+        pipeline = filtering.HttpFilterPipeline()
+        pipeline.add_filter(AliasedProcessFilter())
+
+        action = self._wait_for(pipeline.on_request_head('request'))
+        self.assertTrue(action.is_consuming())
+
+    def test_only_request_heads_may_be_offloaded(self):
+        with self.assertRaises(TypeError):
+            filtering.HttpFilterPipeline().add_filter(BodyFilter())
+
+
+if __name__ == '__main__':
+    unittest.main()
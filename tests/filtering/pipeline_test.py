@@ -1,6 +1,9 @@
 import mock
 import unittest
 
+from tornado.concurrent import Future
+from tornado.testing import AsyncTestCase
+
 import pyrox.filtering as filtering
 
 
@@ -51,11 +54,52 @@ class WhenBuildingPipelines(unittest.TestCase):
 
         self.assertTrue(http_filter.were_expected_calls_made())
 
+    def test_dispatch_does_not_inspect_handlers(self):
+        pipeline = filtering.HttpFilterPipeline()
+
+        http_filter = TestFilterWithAllDecorators()
+        pipeline.add_filter(http_filter)
+
+        with mock.patch('pyrox.filtering.pipeline.inspect') as inspect:
+            pipeline.on_request_head(mock.MagicMock())
+            pipeline.on_request_body(mock.MagicMock(), mock.MagicMock())
+
+        self.assertFalse(inspect.method_calls)
+        self.assertTrue(http_filter.on_req_body_called)
+
+    def test_filter_classes_are_only_inspected_once(self):
+        filtering.HttpFilterPipeline().add_filter(
+            TestFilterWithAllDecorators())
+
+        pipeline = filtering.HttpFilterPipeline()
+        http_filter = TestFilterWithAllDecorators()
+
+        with mock.patch('pyrox.filtering.pipeline.inspect') as inspect:
+            pipeline.add_filter(http_filter)
+
+        self.assertFalse(inspect.method_calls)
+
+        pipeline.on_response_head(mock.MagicMock())
+        self.assertTrue(http_filter.on_resp_head_called)
+
+    def test_cloned_pipelines_share_filters(self):
+        pipeline = filtering.HttpFilterPipeline()
+
+        http_filter = TestFilterWithAllDecorators()
+        pipeline.add_filter(http_filter)
+
+        clone = pipeline.clone()
+        clone.on_request_head(mock.MagicMock())
+        clone.on_request_body(mock.MagicMock(), mock.MagicMock())
+
+        self.assertTrue(clone.intercepts_req_body())
+        self.assertTrue(http_filter.on_req_head_called)
+        self.assertTrue(http_filter.on_req_body_called)
+
 
 class TestHttpFilterPipeline(unittest.TestCase):
     def test_response_methods_pass_optional_request(self):
         resp_head = mock.MagicMock()
-        resp_body = mock.MagicMock()
         req_head = mock.MagicMock()
         msg_part = mock.MagicMock()
         out = mock.MagicMock()
@@ -95,5 +139,202 @@ class TestHttpFilterPipeline(unittest.TestCase):
         self.assertTrue(resp_filter.were_expected_calls_made())
     
 
+@filtering.selects(path_prefix='/v1/', methods=('PUT', 'POST'))
+class UploadFilter(TestFilterWithAllDecorators):
+    pass
+
+
+@filtering.selects(status_codes=(500, 503))
+class FailureFilter(TestFilterWithAllDecorators):
+    pass
+
+
+def _request(method, url):
+    request = mock.MagicMock()
+    request.method = method
+    request.url = url
+    return request
+
+
+def _response(status):
+    response = mock.MagicMock()
+    response.status = status
+    return response
+
+
+class WhenFiltersSelectMessages(unittest.TestCase):
+
+    def setUp(self):
+        self.upload_filter = UploadFilter()
+        self.failure_filter = FailureFilter()
+        self.other_filter = TestFilterWithAllDecorators()
+
+        self.pipeline = filtering.HttpFilterPipeline()
+        self.pipeline.add_filter(self.upload_filter)
+        self.pipeline.add_filter(self.failure_filter)
+        self.pipeline.add_filter(self.other_filter)
+
+    def test_filters_not_selected_are_skipped(self):
+        self.pipeline.on_request_head(_request('GET', '/v1/objects'))
+        self.pipeline.on_request_body(mock.MagicMock(), mock.MagicMock())
+
+        self.assertFalse(self.upload_filter.on_req_head_called)
+        self.assertFalse(self.upload_filter.on_req_body_called)
+        self.assertTrue(self.other_filter.on_req_head_called)
+        self.assertTrue(self.other_filter.on_req_body_called)
+
+    def test_selected_filters_are_called(self):
+        self.pipeline.on_request_head(_request('PUT', '/v1/objects?x=1'))
+        self.pipeline.on_request_body(mock.MagicMock(), mock.MagicMock())
+
+        self.assertTrue(self.upload_filter.on_req_head_called)
+        self.assertTrue(self.upload_filter.on_req_body_called)
+
+    def test_responses_are_selected_by_status(self):
+        self.pipeline.on_response_head(_response('200 OK'))
+        self.assertFalse(self.failure_filter.on_resp_head_called)
+
+        self.pipeline.on_response_head(_response('503 Service Unavailable'))
+        self.pipeline.on_response_body(mock.MagicMock(), mock.MagicMock())
+        self.assertTrue(self.failure_filter.on_resp_head_called)
+        self.assertTrue(self.failure_filter.on_resp_body_called)
+
+    def test_responses_are_selected_by_request(self):
+        self.pipeline.on_response_head(
+            _response('200 OK'), _request('GET', '/v1/objects'))
+        self.assertFalse(self.upload_filter.on_resp_head_called)
+
+        self.pipeline.on_response_head(
+            _response('200 OK'), _request('POST', '/v1/objects'))
+        self.assertTrue(self.upload_filter.on_resp_head_called)
+
+    def test_clones_keep_selectors(self):
+        clone = self.pipeline.clone()
+        clone.on_request_head(_request('GET', '/'))
+
+        self.assertFalse(self.upload_filter.on_req_head_called)
+        self.assertTrue(self.other_filter.on_req_head_called)
+
+
+class OnDemandBodyFilter(filtering.HttpFilter):
+
+    def __init__(self):
+        self.bodies = list()
+
+    @filtering.handles_request_head
+    def on_req_head(self, request_head):
+        if request_head.method == 'POST':
+            return filtering.intercept_body()
+
+    @filtering.handles_request_body(on_demand=True)
+    def on_req_body(self, body_part, output):
+        self.bodies.append(body_part)
+
+
+class WhenFiltersInterceptBodiesOnDemand(unittest.TestCase):
+
+    def setUp(self):
+        self.body_filter = OnDemandBodyFilter()
+        self.pipeline = filtering.HttpFilterPipeline()
+        self.pipeline.add_filter(self.body_filter)
+
+    def test_bodies_are_only_given_when_asked_for(self):
+        action = self.pipeline.on_request_head(_request('GET', '/'))
+        self.pipeline.on_request_body('a', mock.MagicMock())
+
+        self.assertFalse(action.breaks_pipeline())
+        self.assertFalse(self.pipeline.wants_request_body())
+        self.assertEqual([], self.body_filter.bodies)
+
+        action = self.pipeline.on_request_head(_request('POST', '/'))
+        self.pipeline.on_request_body('b', mock.MagicMock())
+
+        self.assertEqual(filtering.pipeline.NEXT_FILTER, action.kind)
+        self.assertTrue(self.pipeline.wants_request_body())
+        self.assertEqual(['b'], self.body_filter.bodies)
+
+    def test_filters_without_on_demand_always_want_bodies(self):
+        self.pipeline.add_filter(TestFilterWithAllDecorators())
+        self.pipeline.on_request_head(_request('GET', '/'))
+
+        self.assertTrue(self.pipeline.wants_request_body())
+        self.assertTrue(self.pipeline.wants_response_body())
+
+
+class FilterWaitingOnFuture(filtering.HttpFilter):
+
+    def __init__(self, future):
+        self.future = future
+
+    @filtering.handles_request_head
+    def on_req_head(self, request_head):
+        return self.future
+
+
+class ResponseFilterWaitingOnFuture(filtering.HttpFilter):
+
+    @filtering.handles_response_head
+    def on_resp_head(self, response_head):
+        return Future()
+
+
+class FilterRejecting(filtering.HttpFilter):
+
+    @filtering.handles_request_head
+    def on_req_head(self, request_head):
+        return filtering.reject()
+
+
+class WhenFiltersReturnFutures(AsyncTestCase):
+
+    def _wait_for(self, future):
+        self.io_loop.add_future(future, self.stop)
+        return self.wait().result()
+
+    def test_pipeline_resumes_when_future_resolves(self):
+        future = Future()
+
+        pipeline = filtering.HttpFilterPipeline()
+        pipeline.add_filter(FilterWaitingOnFuture(future))
+        pipeline.add_filter(FilterRejecting())
+
+        outcome = pipeline.on_request_head(mock.MagicMock())
+        self.assertFalse(outcome.done())
+
+        future.set_result(filtering.next())
+        self.assertTrue(self._wait_for(outcome).is_replying())
+
+    def test_breaking_action_from_future_ends_pipeline(self):
+        future = Future()
+        route = filtering.route('localhost:8080')
+
+        pipeline = filtering.HttpFilterPipeline()
+        pipeline.add_filter(FilterWaitingOnFuture(future))
+        pipeline.add_filter(FilterRejecting())
+
+        outcome = pipeline.on_request_head(mock.MagicMock())
+        future.set_result(route)
+
+        self.assertIs(route, self._wait_for(outcome))
+
+    def test_failed_future_rejects(self):
+        future = Future()
+
+        pipeline = filtering.HttpFilterPipeline()
+        pipeline.add_filter(FilterWaitingOnFuture(future))
+
+        outcome = pipeline.on_request_head(mock.MagicMock())
+        future.set_exception(ValueError('token service is down'))
+
+        self.assertTrue(self._wait_for(outcome).is_replying())
+
+    def test_futures_from_response_heads_reject(self):
+        pipeline = filtering.HttpFilterPipeline()
+        pipeline.add_filter(ResponseFilterWaitingOnFuture())
+
+        action = pipeline.on_response_head(mock.MagicMock())
+        self.assertTrue(action.is_replying())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+import pyrox.filtering as filtering
+from pyrox.http import HttpRequest, HttpResponse
+
+
+def _rules(**specs):
+    return filtering.HeaderRulesFilter(
+        [filtering.parse_rule(name, spec)
+         for name, spec in sorted(specs.items())])
+
+
+def _request(**headers):
+    request = HttpRequest()
+
+    for name, value in headers.items():
+        request.header(name.replace('_', '-')).values.append(value)
+
+    return request
+
+
+class WhenParsingHeaderRules(unittest.TestCase):
+
+    def test_arguments_keep_their_spaces(self):
+        rule = filtering.parse_rule('via', 'request add Via 1.1 pyrox')
+
+        self.assertEqual('request', rule.phase)
+        self.assertEqual('add', rule.operation)
+        self.assertEqual('Via', rule.header)
+        self.assertEqual('1.1 pyrox', rule.argument)
+
+    def test_malformed_rules_raise(self):
+        for spec in ('request add Via', 'request remove Via x',
+                     'later remove Via', 'request drop Via', 'request'):
+            with self.assertRaises(ValueError):
+                filtering.parse_rule('bad', spec)
+
+
+class WhenApplyingHeaderRules(unittest.TestCase):
+
+    def test_missing_required_headers_reject(self):
+        rules = _rules(a='request require User-Agent')
+
+        self.assertTrue(rules.on_request_head(_request()).is_replying())
+        self.assertIsNone(rules.on_request_head(_request(User_Agent='x')))
+
+    def test_matching_values_reject(self):
+        rules = _rules(a='request reject User-Agent ^curl/',
+                       b='request reject user-agent ^wget/')
+
+        self.assertTrue(rules.on_request_head(
+            _request(User_Agent='wget/1.0')).is_replying())
+        self.assertTrue(rules.on_request_head(
+            _request(User_Agent='curl/7.0')).is_replying())
+        self.assertIsNone(rules.on_request_head(
+            _request(User_Agent='firefox')))
+
+    def test_headers_are_edited_in_order(self):
+        rules = _rules(a='request remove X-Internal',
+                       b='request set Host example.com',
+                       c='request add Via 1.1 pyrox',
+                       d='request add Via 1.0 other')
+        request = _request(X_Internal='secret', Host='localhost', Via='x')
+
+        rules.on_request_head(request)
+
+        self.assertIsNone(request.get_header('x-internal'))
+        self.assertEqual(['example.com'], request.get_header('host').values)
+        self.assertEqual(
+            ['x', '1.1 pyrox', '1.0 other'], request.get_header('via').values)
+
+    def test_rules_only_apply_to_their_phase(self):
+        rules = _rules(a='response remove Server')
+        response = HttpResponse()
+        response.header('Server').values.append('httpd')
+
+        self.assertEqual(frozenset(['response']), rules.phases)
+        self.assertIsNone(rules.on_request_head(_request()))
+
+        rules.on_response_head(response)
+        self.assertIsNone(response.get_header('server'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import mock
+import unittest
+
+import pyrox.filtering as filtering
+from pyrox.filtering import stats
+
+
+class TimedFilter(filtering.HttpFilter):
+
+    @filtering.handles_request_head
+    def on_req_head(self, request_head):
+        pass
+
+    @filtering.handles_response_body
+    def on_resp_body(self, body_part, output):
+        pass
+
+
+_TIMED_FILTER = '{}.TimedFilter'.format(__name__)
+
+
+class WhenRecordingLatencies(unittest.TestCase):
+
+    def test_small_values_are_exact(self):
+        histogram = stats.Histogram()
+
+        for micros in range(1, 11):
+            histogram.record(micros / 1000000.0 + 0.0000001)
+
+        self.assertEqual(10, histogram.count)
+        self.assertEqual(5, histogram.percentile(50))
+        self.assertEqual(10, histogram.percentile(100))
+
+    def test_large_values_stay_within_their_bucket(self):
+        histogram = stats.Histogram()
+        histogram.record(0.0012)
+        histogram.record(0.5)
+
+        self.assertTrue(1200 <= histogram.percentile(50) < 1200 * 1.125)
+        self.assertEqual(500000, histogram.percentile(99.9))
+
+    def test_values_past_the_last_bucket_are_kept(self):
+        histogram = stats.Histogram()
+        histogram.record(3600)
+
+        self.assertEqual(1, histogram.counts[-1])
+        self.assertEqual(3600000000, histogram.snapshot()['max'])
+
+
+class WhenTimingFilters(unittest.TestCase):
+
+    def tearDown(self):
+        filtering.enable_filter_stats(False)
+        filtering.reset_filter_stats()
+
+    def test_handlers_are_not_wrapped_when_disabled(self):
+        http_filter = TimedFilter()
+        pipeline = filtering.HttpFilterPipeline()
+        pipeline.add_filter(http_filter)
+
+        self.assertEqual(
+            http_filter.on_req_head, pipeline._req_head_chain[0][0])
+
+    def test_handlers_are_timed_per_phase(self):
+        filtering.enable_filter_stats()
+
+        pipeline = filtering.HttpFilterPipeline()
+        pipeline.add_filter(TimedFilter())
+
+        pipeline.on_request_head(mock.MagicMock())
+        pipeline.on_response_body(mock.MagicMock(), mock.MagicMock())
+        pipeline.on_response_body(mock.MagicMock(), mock.MagicMock())
+
+        filter_stats = filtering.filter_stats()[_TIMED_FILTER]
+        self.assertEqual(1, filter_stats[stats.REQUEST_HEAD]['count'])
+        self.assertEqual(2, filter_stats[stats.RESPONSE_BODY]['count'])
+        self.assertNotIn(stats.REQUEST_BODY, filter_stats)
+        self.assertIn(_TIMED_FILTER, filtering.format_filter_stats())
+
+
+if __name__ == '__main__':
+    unittest.main()
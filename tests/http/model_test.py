@@ -1,6 +1,6 @@
 import unittest
 
-from pyrox.http import HttpHeader, HttpMessage, HttpRequest, HttpResponse
+from pyrox.http import HttpMessage, HttpRequest
 
 
 class WhenManipulatingHeaders(unittest.TestCase):
@@ -32,6 +32,124 @@ class WhenManipulatingHeaders(unittest.TestCase):
         http_msg = HttpMessage()
         self.assertIsNone(http_msg.get_header('test'))
 
+    def test_header_fields_fold_into_headers_on_lookup(self):
+        http_msg = HttpMessage()
+        http_msg.set_header_fields(
+            ['Accept', 'text/plain', 'Host', 'localhost', 'accept', '*/*'])
+
+        header = http_msg.get_header('ACCEPT')
+        self.assertEqual('Accept', header.name)
+        self.assertEqual(['text/plain', '*/*'], header.values)
+        self.assertIs(header, http_msg.header('accept'))
+
+        self.assertTrue(http_msg.remove_header('host'))
+        self.assertIsNone(http_msg.get_header('host'))
+        self.assertEqual(['accept'], list(http_msg.headers))
+
+    def test_unread_header_fields_are_serialized(self):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.url = '/'
+        request.set_header_fields(['Host', 'localhost', 'Content-Length', '0'])
+        request.header('Accept').values.append('*/*')
+
+        head = request.to_bytes()
+        self.assertTrue(head.startswith(
+            'GET / HTTP/1.1\r\n'
+            'Host: localhost\r\n'
+            'Content-Length: 0\r\n'))
+        self.assertTrue(head.endswith('Accept: */*\r\n\r\n'))
+
+
+RAW_REQUEST_HEAD = (
+    'GET /test HTTP/1.1\r\n'
+    'Host: example.com\r\n'
+    'Accept: */*\r\n'
+    '\r\n')
+
+
+def raw_request():
+    request = HttpRequest()
+    request.method = 'GET'
+    request.url = '/test'
+    request.version = '1.1'
+    request.set_header_fields(
+        ['Host', 'example.com', 'Accept', '*/*'], RAW_REQUEST_HEAD)
+    return request
+
+
+class WhenHoldingLocalData(unittest.TestCase):
+
+    def test_local_data_starts_empty(self):
+        self.assertEqual(dict(), HttpRequest().local_data)
+
+    def test_local_data_may_be_replaced(self):
+        request = HttpRequest()
+        request.local_data = {'user': 'bob'}
+
+        self.assertEqual({'user': 'bob'}, request.local_data)
+
+
+class WhenSerializingRawMessages(unittest.TestCase):
+
+    def test_unmodified_message_returns_raw_head(self):
+        request = raw_request()
+        self.assertIs(RAW_REQUEST_HEAD, request.to_bytes())
+
+    def test_reading_headers_does_not_modify_message(self):
+        request = raw_request()
+
+        self.assertEqual(['*/*'], request.get_header('accept').values)
+        self.assertIs(RAW_REQUEST_HEAD, request.to_bytes())
+
+    def test_replaced_header_is_spliced_into_raw_head(self):
+        request = raw_request()
+        request.replace_header('Host').values.append('localhost:8080')
+
+        self.assertEqual(
+            'GET /test HTTP/1.1\r\n'
+            'Accept: */*\r\n'
+            'Host: localhost:8080\r\n'
+            '\r\n', request.to_bytes())
+
+    def test_modified_start_line_is_serialized(self):
+        request = raw_request()
+        request.url = '/other'
+        request.remove_header('accept')
+
+        self.assertEqual(
+            'GET /other HTTP/1.1\r\n'
+            'Host: example.com\r\n'
+            '\r\n', request.to_bytes())
+
+
+class WhenSerializingToBuffers(unittest.TestCase):
+
+    def test_unmodified_message_is_a_single_buffer(self):
+        request = raw_request()
+        self.assertEqual([RAW_REQUEST_HEAD], request.to_buffers())
+
+    def test_spliced_buffers_match_bytes(self):
+        request = raw_request()
+        request.replace_header('Host').values.append('localhost:8080')
+
+        buffers = request.to_buffers()
+
+        self.assertTrue(len(buffers) > 1)
+        self.assertEqual(request.to_bytes(),
+                         ''.join(memoryview(buf).tobytes() for buf in buffers))
+
+    def test_writes_into_buffer(self):
+        request = HttpRequest()
+        request.method = 'GET'
+        request.url = '/test'
+        request.header('Host').values.append('localhost')
+
+        buffer = bytearray('prefix')
+
+        self.assertIs(buffer, request.write_into(buffer))
+        self.assertEqual('prefix' + request.to_bytes(), buffer)
+
 
 if __name__ == '__main__':
     unittest.main()
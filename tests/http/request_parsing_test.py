@@ -170,6 +170,188 @@ class WhenParsingRequests(unittest.TestCase):
             BODY_SLOT: 4,
             BODY_COMPLETE_SLOT: 1}, self)
 
+    def test_reading_request_with_batched_headers(self):
+        tracker = TrackingDelegate(NonChunkedValidatingDelegate(self))
+        parser = RequestParser(tracker, batch_headers=True)
+
+        chunk_message(NORMAL_REQUEST, parser)
+
+        tracker.validate_hits({
+            REQUEST_METHOD_SLOT: 1,
+            REQUEST_URI_SLOT: 1,
+            REQUEST_HTTP_VERSION_SLOT: 1,
+            HEADER_FIELD_SLOT: 2,
+            HEADER_VALUE_SLOT: 2,
+            BODY_SLOT: 2,
+            BODY_COMPLETE_SLOT: 1}, self)
+
+    def test_batched_headers_are_delivered_in_one_call(self):
+        headers = list()
+
+        class HeadersDelegate(ParserDelegate):
+
+            def on_headers(self, batch):
+                headers.append(batch)
+
+        parser = RequestParser(HeadersDelegate(), batch_headers=True)
+        chunk_message(NORMAL_REQUEST, parser)
+
+        self.assertEqual(1, len(headers))
+        self.assertEqual(
+            ['Connection', 'keep-alive', 'Content-Length', '12'],
+            headers[0])
+
+    def test_batched_headers_are_not_counted(self):
+        headers = list()
+
+        class HeadersDelegate(ParserDelegate):
+
+            def on_headers(self, batch):
+                headers.extend(batch)
+
+        message = 'GET / HTTP/1.1\r\n{}\r\n'.format(''.join(
+            'X-Header-{}: {}\r\n'.format(idx, idx) for idx in range(300)))
+
+        parser = RequestParser(HeadersDelegate(), batch_headers=True)
+        parser.execute(message)
+
+        self.assertEqual(600, len(headers))
+        self.assertEqual(['X-Header-299', '299'], headers[-2:])
+
+    def test_header_buffer_grows_for_large_heads(self):
+        values = list()
+
+        class ValueDelegate(ParserDelegate):
+
+            def on_header_value(self, value):
+                values.append(value)
+
+        parser = RequestParser(ValueDelegate())
+        chunk_message(
+            'GET / HTTP/1.1\r\nCookie: {}\r\n\r\n'.format('x' * 20000),
+            parser,
+            chunk_size=4096)
+
+        self.assertEqual(['x' * 20000], values)
+
+    def test_reset_parser_accepts_new_delegate(self):
+        tracker = TrackingDelegate(NonChunkedValidatingDelegate(self))
+        parser = RequestParser(ParserDelegate())
+
+        parser.execute(NORMAL_REQUEST[:20])
+        parser.reset(tracker)
+        chunk_message(NORMAL_REQUEST, parser)
+
+        tracker.validate_hits({
+            REQUEST_METHOD_SLOT: 1,
+            BODY_COMPLETE_SLOT: 1}, self)
+
+    def test_parsing_bytearray_and_memoryview_in_place(self):
+        for data in (bytearray(NORMAL_REQUEST),
+                     memoryview(bytearray(NORMAL_REQUEST))):
+            tracker = TrackingDelegate(NonChunkedValidatingDelegate(self))
+            parser = RequestParser(tracker)
+
+            self.assertEqual(len(NORMAL_REQUEST), parser.execute(data))
+            tracker.validate_hits({
+                REQUEST_METHOD_SLOT: 1,
+                BODY_COMPLETE_SLOT: 1}, self)
+
+    def test_pausing_reports_bytes_consumed(self):
+        data = bytearray(NORMAL_REQUEST * 2)
+        tracker = TrackingDelegate(NonChunkedValidatingDelegate(self))
+        parser = RequestParser(tracker)
+
+        class PausingDelegate(ParserDelegate):
+
+            def on_message_complete(self, is_chunked, keep_alive):
+                tracker.on_message_complete(is_chunked, keep_alive)
+                parser.pause()
+
+        parser.reset(PausingDelegate())
+
+        consumed = parser.execute(data)
+        self.assertEqual(len(NORMAL_REQUEST), consumed)
+
+        parser.resume()
+        self.assertEqual(
+            len(NORMAL_REQUEST), parser.execute(data, consumed))
+        tracker.validate_hits({BODY_COMPLETE_SLOT: 2}, self)
+
+    def test_connection_close_disables_keep_alive(self):
+        results = list()
+
+        class KeepAliveDelegate(ParserDelegate):
+
+            def on_message_complete(self, is_chunked, keep_alive):
+                results.append(keep_alive)
+
+        parser = RequestParser(KeepAliveDelegate())
+        parser.execute('GET / HTTP/1.1\r\nConnection: close\r\n\r\n')
+        parser.execute('GET / HTTP/1.1\r\nConnection: keep-alive\r\n\r\n')
+        parser.execute('GET / HTTP/1.1\r\n\r\n')
+
+        self.assertEqual([0, 1, 1], results)
+
+    def test_connection_close_must_be_a_whole_token(self):
+        results = list()
+
+        class KeepAliveDelegate(ParserDelegate):
+
+            def on_message_complete(self, is_chunked, keep_alive):
+                results.append(keep_alive)
+
+        for value in ('closed', 'closeX', 'close ', 'close, upgrade'):
+            parser = RequestParser(KeepAliveDelegate(), batch_headers=True)
+            parser.execute(
+                'GET / HTTP/1.1\r\nConnection: {}\r\n\r\n'.format(value))
+
+        self.assertEqual([1, 1, 0, 0], results)
+
+    def test_raw_chunks_are_delivered_as_read(self):
+        raw_body = (
+            '1e;ext=1\r\nall your base are belong to us\r\n'
+            '0\r\n'
+            'Trailer: value\r\n'
+            '\r\n')
+        message = CHUNKED_REQUEST[:CHUNKED_REQUEST.index('1e')] + raw_body
+        body = bytearray()
+        completed = list()
+
+        class RawDelegate(ParserDelegate):
+
+            def on_body(self, data, length, is_chunked):
+                body.extend(data)
+
+            def on_message_complete(self, is_chunked, keep_alive):
+                completed.append(is_chunked)
+
+        parser = RequestParser(RawDelegate(), raw_chunks=True)
+        self.assertTrue(parser.raw_chunks)
+
+        for idx in range(0, len(message), 7):
+            parser.execute(message[idx:idx + 7])
+
+        self.assertEqual(raw_body, str(body))
+        self.assertEqual(1, len(completed))
+
+    def test_capturing_raw_heads(self):
+        heads = list()
+
+        class HeadDelegate(ParserDelegate):
+
+            def on_raw_head(self, head):
+                heads.append(head)
+
+        parser = RequestParser(HeadDelegate(), capture_head=True)
+        message = '\r\n' + NORMAL_REQUEST
+
+        for idx in range(0, len(message), 5):
+            parser.execute(message[idx:idx + 5])
+
+        self.assertEqual(
+            [NORMAL_REQUEST[:NORMAL_REQUEST.index('\r\n\r\n') + 4]], heads)
+
 
 if __name__ == '__main__':
     unittest.main()
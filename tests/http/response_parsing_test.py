@@ -135,6 +135,22 @@ class WhenParsingResponses(unittest.TestCase):
             BODY_SLOT: 4,
             BODY_COMPLETE_SLOT: 1}, self)
 
+    def test_reading_body_as_views(self):
+        parts = list()
+
+        class BodyDelegate(ParserDelegate):
+
+            def on_body(self, data, length, is_chunked):
+                parts.append(data)
+
+        parser = ResponseParser(BodyDelegate(), body_views=True)
+        chunk_message(CHUNKED_RESPONSE, parser)
+
+        self.assertTrue(all(type(part) is memoryview for part in parts))
+        self.assertEqual(
+            'all your base are belong to us',
+            ''.join(part.tobytes() for part in parts))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from pyrox.http.selection import HttpMessageSelector, SelectorIndex
+
+
+def _index(*selectors):
+    return SelectorIndex(
+        [(1 << idx, selector) for idx, selector in enumerate(selectors)])
+
+
+class WhenIndexingSelectors(unittest.TestCase):
+
+    def test_prefixes(self):
+        index = _index(
+            HttpMessageSelector(path_prefix='/v1/'),
+            HttpMessageSelector(path_prefix='/v1/objects'),
+            HttpMessageSelector(path_prefix='/v2/'))
+
+        self.assertEqual(3, index.select_request('GET', '/v1/objects/1'))
+        self.assertEqual(1, index.select_request('GET', '/v1/'))
+        self.assertEqual(4, index.select_request('GET', '/v2/a'))
+        self.assertEqual(0, index.select_request('GET', '/v3/a'))
+
+    def test_path_expressions(self):
+        index = _index(
+            HttpMessageSelector(path=r'/users/(\d+)$'),
+            HttpMessageSelector(path=r'/users/'),
+            HttpMessageSelector(path=r'/admin', path_prefix='/adm'))
+
+        self.assertEqual(3, index.select_request('GET', '/users/12'))
+        self.assertEqual(2, index.select_request('GET', '/users/bob'))
+        self.assertEqual(4, index.select_request('GET', '/admin/x'))
+        self.assertEqual(0, index.select_request('GET', '/x/users/12'))
+
+    def test_methods(self):
+        index = _index(
+            HttpMessageSelector(methods=('GET', 'HEAD')),
+            HttpMessageSelector(path_prefix='/', methods=('PUT',)),
+            HttpMessageSelector())
+
+        self.assertEqual(5, index.select_request('HEAD', '/'))
+        self.assertEqual(6, index.select_request('PUT', '/'))
+        self.assertEqual(4, index.select_request('DELETE', '/'))
+
+    def test_status_codes(self):
+        index = _index(
+            HttpMessageSelector(status_codes=(404,)),
+            HttpMessageSelector(status_codes=('500', 503), methods=('GET',)))
+
+        self.assertEqual(1, index.select_response('404 Not Found'))
+        self.assertEqual(2, index.select_response('503 Service Unavailable'))
+        self.assertEqual(0, index.select_response(
+            '503 Service Unavailable', 'PUT', '/'))
+        self.assertEqual(0, index.select_response('200 OK'))
+
+    def test_many_path_expressions(self):
+        selectors = [HttpMessageSelector(path=r'/({})/(a|b)'.format(idx))
+                     for idx in range(100)]
+        index = _index(*selectors)
+
+        self.assertEqual(1 << 99, index.select_request('GET', '/99/a'))
+        self.assertEqual(1, index.select_request('GET', '/0/b'))
+        self.assertEqual(0, index.select_request('GET', '/0/c'))
+
+    def test_named_groups_do_not_clash(self):
+        index = _index(
+            HttpMessageSelector(path=r'/(?P<id>\d+)'),
+            HttpMessageSelector(path=r'/x/(?P<id>\d+)'),
+            HttpMessageSelector(path=r'/x/'))
+
+        self.assertEqual(1, index.select_request('GET', '/12'))
+        self.assertEqual(6, index.select_request('GET', '/x/5'))
+        self.assertEqual(4, index.select_request('GET', '/x/y'))
+
+    def test_inline_flags_stay_with_their_expression(self):
+        index = _index(
+            HttpMessageSelector(path=r'(?i)/abc'),
+            HttpMessageSelector(path=r'/x/\d+'))
+
+        self.assertEqual(1, index.select_request('GET', '/ABC'))
+        self.assertEqual(2, index.select_request('GET', '/x/5'))
+        self.assertEqual(0, index.select_request('GET', '/X/5'))
+
+
+if __name__ == '__main__':
+    unittest.main()
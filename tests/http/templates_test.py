@@ -0,0 +1,68 @@
+import unittest
+
+import pyrox.filtering as filtering
+from pyrox.http import HttpResponse, get_template, register_template
+from pyrox.http.templates import REJECTION, configure_templates
+
+
+class WhenUsingResponseTemplates(unittest.TestCase):
+
+    def tearDown(self):
+        configure_templates()
+
+    def test_templates_are_serialized_once(self):
+        template = get_template(REJECTION)
+
+        self.assertTrue(template.to_bytes().startswith(
+            'HTTP/1.1 400 Bad Request\r\n'))
+        self.assertIs(template.to_bytes(), template.to_bytes())
+
+    def test_configured_status_codes_are_applied(self):
+        configure_templates(rejection_sc=403,
+                            named_templates={'maintenance': 503})
+
+        self.assertEqual('403 Forbidden', get_template(REJECTION).status)
+        self.assertEqual(
+            '503 Service Unavailable', get_template('maintenance').status)
+
+    def test_unknown_templates_raise(self):
+        with self.assertRaises(KeyError):
+            get_template('not a template')
+
+    def test_rejecting_with_a_template_name(self):
+        template = register_template('teapot', 418)
+        action = filtering.reject('teapot')
+
+        self.assertIs(template, action.payload[0])
+
+    def test_default_rejection_uses_template(self):
+        action = filtering.reject()
+        self.assertIs(get_template(REJECTION), action.payload[0])
+
+    def test_templates_read_like_responses(self):
+        template = filtering.reject().payload[0]
+
+        self.assertEqual('400 Bad Request', template.status)
+        self.assertEqual(['0'], template.header('Content-Length').values)
+        self.assertIsNone(template.get_header('X-Missing'))
+        self.assertEqual([], template.header('X-Missing').values)
+
+    def test_template_headers_are_copies(self):
+        template = get_template(REJECTION)
+        template.header('content-length').values.append('1')
+
+        self.assertEqual(['0'], template.header('content-length').values)
+        self.assertEqual(
+            ['0'], template.new_response().header('content-length').values)
+
+    def test_replying_with_a_body_copies_the_template(self):
+        action = filtering.reply(REJECTION, 'body')
+        response = action.payload[0]
+
+        self.assertIsInstance(response, HttpResponse)
+        self.assertEqual('400 Bad Request', response.status)
+        self.assertEqual(['0'], response.get_header('content-length').values)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,6 +15,53 @@ class WhenManipulatingHeaders(unittest.TestCase):
         self.assertIsNotNone(self.cfg)
         self.assertEqual(self.cfg.core.processes, 0)
 
+    def test_http_parser_limits(self):
+        self.assertEqual(self.cfg.http.max_header_size, 81920)
+        self.assertEqual(self.cfg.http.parser_pool_size, 128)
+        self.assertEqual(self.cfg.http.max_pipelined_requests, 16)
+
+    def test_offload_pools(self):
+        self.assertEqual(self.cfg.offload.thread_pool_size, 4)
+        self.assertIsNone(self.cfg.offload.process_pool_size)
+
+    def test_filter_timing_is_off(self):
+        self.assertFalse(self.cfg.stats.filter_timing)
+
+    def test_header_rules_are_not_filter_aliases(self):
+        self.cfg.pipeline._cfg.set(
+            'pipeline', 'rule.hide_server', 'response remove Server')
+
+        self.assertEqual(self.cfg.pipeline.header_rules,
+                         [('hide_server', 'response remove Server')])
+        self.assertNotIn('rule.hide_server', self.cfg.pipeline._filter_dict())
+
+    def test_health_checks(self):
+        self.assertFalse(self.cfg.health.enabled)
+        self.assertEqual(self.cfg.health.interval, 5.0)
+        self.assertEqual(self.cfg.health.timeout, 2.0)
+        self.assertEqual(self.cfg.health.rise, 2)
+        self.assertEqual(self.cfg.health.fall, 3)
+        self.assertIsNone(self.cfg.health.path)
+
+    def test_outlier_detection(self):
+        self.assertFalse(self.cfg.outliers.enabled)
+        self.assertEqual(self.cfg.outliers.consecutive_errors, 5)
+        self.assertEqual(self.cfg.outliers.consecutive_server_errors, 5)
+        self.assertEqual(self.cfg.outliers.latency_factor, 0.0)
+        self.assertEqual(self.cfg.outliers.ejection_time, 30.0)
+        self.assertEqual(self.cfg.outliers.max_ejection_time, 300.0)
+        self.assertEqual(self.cfg.outliers.max_ejected_percent, 50)
+
+    def test_router(self):
+        self.assertEqual(self.cfg.routing.router, 'round_robin')
+        self.assertEqual(self.cfg.routing.hash_key, 'path')
+        self.assertEqual(self.cfg.routing.hash_load_factor, 1.25)
+
+    def test_templates(self):
+        self.assertEqual(self.cfg.templates.pyrox_error_sc, 502)
+        self.assertEqual(self.cfg.templates.rejection_sc, 400)
+        self.assertEqual(self.cfg.templates.named_templates, dict())
+
     def test_split_and_strip_multiple_paths(self):
         values_str = '/usr/share/project/python,/usr/share/other/python'
         split_on = ','
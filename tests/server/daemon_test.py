@@ -0,0 +1,46 @@
+import mock
+import unittest
+
+from pyrox.http import RequestParser
+from pyrox.server.config import load_pyrox_config
+from pyrox.server.daemon import _build_plfactories
+from pyrox.server.proxyng import DownstreamHandler
+
+
+GET = (
+    'GET /index.html HTTP/1.1\r\n'
+    'Host: localhost\r\n'
+    'X-Debug: true\r\n'
+    '\r\n')
+
+
+class WhenBuildingPipelines(unittest.TestCase):
+
+    def setUp(self):
+        self.cfg = load_pyrox_config('./examples/config/pyrox.conf')
+        self.cfg.pipeline._cfg.set(
+            'pipeline', 'rule.no_debug', 'request remove X-Debug')
+        self.cfg.pipeline._cfg.set(
+            'pipeline', 'rule.tag', 'request add X-Proxied pyrox')
+
+    def test_request_rules_rewrite_proxied_requests(self):
+        upstream, downstream = _build_plfactories(self.cfg)
+        connect_upstream = mock.Mock()
+
+        handler = DownstreamHandler(
+            mock.MagicMock(), downstream(), connect_upstream)
+        RequestParser(handler, batch_headers=True).execute(GET)
+
+        request = connect_upstream.call_args[0][0]
+        self.assertIsNone(request.get_header('X-Debug'))
+        self.assertEqual(['pyrox'], request.get_header('X-Proxied').values)
+
+    def test_request_rules_stay_out_of_the_response_pipeline(self):
+        upstream, downstream = _build_plfactories(self.cfg)
+
+        self.assertEqual(0, len(upstream()._req_head_chain))
+        self.assertEqual(0, len(upstream()._resp_head_chain))
+
+
+if __name__ == '__main__':
+    unittest.main()
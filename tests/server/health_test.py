@@ -0,0 +1,127 @@
+import socket
+import unittest
+
+from tornado.netutil import bind_sockets, add_accept_handler
+from tornado.testing import AsyncTestCase
+
+from pyrox.server import routing
+from pyrox.server.health import HealthChecker
+
+
+ROUTES = ['http://a:80', 'http://b:80']
+A, B = [routing.parse_route_url(route) for route in ROUTES]
+
+
+class WhenCountingProbes(unittest.TestCase):
+
+    def setUp(self):
+        self.router = routing.RoundRobinRouter(ROUTES)
+        self.checker = HealthChecker(self.router, rise=2, fall=3)
+
+    def test_routes_fall_after_failing_in_a_row(self):
+        self.checker.on_probed(A, False)
+        self.checker.on_probed(A, False)
+        self.assertTrue(self.router.healthy(A))
+
+        self.checker.on_probed(A, False)
+        self.assertFalse(self.router.healthy(A))
+        self.assertEqual([B], self.router.available_routes())
+
+    def test_passing_probes_reset_the_fall_count(self):
+        self.checker.on_probed(A, False)
+        self.checker.on_probed(A, False)
+        self.checker.on_probed(A, True)
+        self.checker.on_probed(A, False)
+
+        self.assertTrue(self.router.healthy(A))
+
+    def test_routes_rise_after_passing_in_a_row(self):
+        for _ in range(3):
+            self.checker.on_probed(A, False)
+
+        self.checker.on_probed(A, True)
+        self.assertFalse(self.router.healthy(A))
+
+        self.checker.on_probed(A, True)
+        self.assertTrue(self.router.healthy(A))
+
+
+class WhenProbingUpstreams(AsyncTestCase):
+
+    def setUp(self):
+        super(WhenProbingUpstreams, self).setUp()
+        self.response = b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n'
+        self.listener = bind_sockets(0, '127.0.0.1')[0]
+        self.port = self.listener.getsockname()[1]
+        self.accepted = list()
+        add_accept_handler(self.listener, self._on_accept, self.io_loop)
+
+    def tearDown(self):
+        self.io_loop.remove_handler(self.listener)
+        self.listener.close()
+
+        for conn in self.accepted:
+            conn.close()
+
+        super(WhenProbingUpstreams, self).tearDown()
+
+    def _on_accept(self, conn, address):
+        self.accepted.append(conn)
+        conn.send(self.response)
+
+    def _probe(self, route, path=None):
+        router = routing.RoundRobinRouter([route])
+        checker = HealthChecker(router, timeout=1.0, fall=1, path=path,
+                                io_loop=self.io_loop)
+        results = list()
+
+        def on_probed(probed, healthy):
+            results.append(healthy)
+            self.stop()
+
+        checker.on_probed = on_probed
+        checker.check()
+        self.wait()
+        return results[0]
+
+    def _closed_port(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        return port
+
+    def test_listening_hosts_pass(self):
+        self.assertTrue(
+            self._probe('http://127.0.0.1:{}'.format(self.port)))
+
+    def test_refused_connections_fail(self):
+        self.assertFalse(
+            self._probe('http://127.0.0.1:{}'.format(self._closed_port())))
+
+    def test_http_probes_check_the_status_code(self):
+        route = 'http://127.0.0.1:{}'.format(self.port)
+        self.assertTrue(self._probe(route, '/health'))
+
+        self.response = b'HTTP/1.1 503 Service Unavailable\r\n\r\n'
+        self.assertFalse(self._probe(route, '/health'))
+
+
+class WhenRoutingAroundUnhealthyRoutes(unittest.TestCase):
+
+    def test_unhealthy_routes_are_skipped(self):
+        router = routing.LeastOutstandingRouter(ROUTES)
+        router.set_healthy(B, False)
+
+        self.assertEqual(set([A]), set(router.get_next() for _ in range(4)))
+
+    def test_no_route_is_given_when_all_are_unhealthy(self):
+        router = routing.RoundRobinRouter(ROUTES)
+        router.set_healthy(A, False)
+        router.set_healthy(B, False)
+
+        self.assertIsNone(router.get_next())
+
+
+if __name__ == '__main__':
+    unittest.main()
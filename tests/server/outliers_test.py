@@ -0,0 +1,113 @@
+import mock
+import unittest
+
+from pyrox.server import routing
+from pyrox.server.outliers import OutlierDetector
+
+
+ROUTES = ['http://a:80', 'http://b:80', 'http://c:80', 'http://d:80']
+A, B, C, D = [routing.parse_route_url(route) for route in ROUTES]
+
+
+class WhenDetectingOutliers(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.timeouts = list()
+
+        self.io_loop = mock.Mock()
+        self.io_loop.time.side_effect = lambda: self.now
+        self.io_loop.add_timeout.side_effect = (
+            lambda deadline, callback: self.timeouts.append(
+                (deadline, callback)))
+
+        self.router = routing.RoundRobinRouter(ROUTES)
+        self.detector = OutlierDetector(
+            self.router, consecutive_errors=3, consecutive_server_errors=3,
+            ejection_time=10.0, max_ejection_time=25.0,
+            max_ejected_percent=50, io_loop=self.io_loop)
+
+    def _run_timeouts(self):
+        timeouts = self.timeouts
+        self.timeouts = list()
+
+        for deadline, callback in timeouts:
+            self.now = deadline
+            callback()
+
+    def test_consecutive_errors_eject(self):
+        self.detector.on_request_failed(A)
+        self.detector.on_request_failed(A)
+        self.assertFalse(self.router.ejected(A))
+
+        self.detector.on_request_failed(A)
+        self.assertTrue(self.router.ejected(A))
+        self.assertNotIn(A, self.router.available_routes())
+
+    def test_responses_reset_the_error_count(self):
+        self.detector.on_request_failed(A)
+        self.detector.on_request_failed(A)
+        self.detector.on_request_complete(A, 0.1, 200)
+        self.detector.on_request_failed(A)
+
+        self.assertFalse(self.router.ejected(A))
+
+    def test_consecutive_server_errors_eject(self):
+        for _ in range(3):
+            self.detector.on_request_complete(A, 0.1, 503)
+
+        self.assertTrue(self.router.ejected(A))
+
+    def test_ejected_routes_return(self):
+        for _ in range(3):
+            self.detector.on_request_failed(A)
+
+        self.assertEqual(10.0, self.timeouts[0][0])
+
+        self._run_timeouts()
+        self.assertFalse(self.router.ejected(A))
+
+    def test_repeat_ejections_last_longer(self):
+        for expected in (10.0, 20.0, 25.0):
+            started = self.now
+
+            for _ in range(3):
+                self.detector.on_request_failed(A)
+
+            self.assertEqual(expected, self.timeouts[0][0] - started)
+            self._run_timeouts()
+
+        self.now += 25.0
+
+        for _ in range(3):
+            self.detector.on_request_failed(A)
+        self.assertEqual(1, self.detector.ejections(A))
+
+    def test_ejections_are_capped(self):
+        for route in (A, B, C):
+            for _ in range(3):
+                self.detector.on_request_failed(route)
+
+        self.assertTrue(self.router.ejected(A))
+        self.assertTrue(self.router.ejected(B))
+        self.assertFalse(self.router.ejected(C))
+
+    def test_slow_routes_eject(self):
+        detector = OutlierDetector(self.router, latency_factor=3.0,
+                                   io_loop=self.io_loop)
+
+        for _ in range(20):
+            for route in (B, C, D):
+                detector.on_request_complete(route, 0.1, 200)
+            detector.on_request_complete(A, 0.05, 200)
+
+        self.assertFalse(self.router.ejected(A))
+
+        for _ in range(30):
+            detector.on_request_complete(A, 2.0, 200)
+
+        self.assertTrue(self.router.ejected(A))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,264 @@
+import unittest
+import mock
+
+from tornado.concurrent import Future
+from tornado.testing import AsyncTestCase
+
+import pyrox.filtering as filtering
+from pyrox.http import RequestParser
+from pyrox.filtering import HttpFilterPipeline
+from pyrox.server.proxyng import DownstreamHandler
+
+
+PIPELINED_GETS = (
+    'GET /first HTTP/1.1\r\n'
+    'Host: localhost\r\n'
+    '\r\n'
+    'GET /second HTTP/1.1\r\n'
+    'Host: localhost\r\n'
+    '\r\n'
+    'GET /third HTTP/1.1\r\n'
+    'Host: localhost\r\n'
+    '\r\n')
+
+CHUNKED_BODY = (
+    '5\r\n'
+    'hello\r\n'
+    '0\r\n'
+    '\r\n')
+
+JSON_POST = (
+    'POST /upload HTTP/1.1\r\n'
+    'Content-Type: application/json\r\n'
+    'Content-Length: 2\r\n'
+    '\r\n'
+    '{}')
+
+TEXT_POST = (
+    'POST /upload HTTP/1.1\r\n'
+    'Content-Type: text/plain\r\n'
+    'Content-Length: 2\r\n'
+    '\r\n'
+    'hi')
+
+CHUNKED_POST = (
+    'POST /upload HTTP/1.1\r\n'
+    'Transfer-Encoding: chunked\r\n'
+    '\r\n' +
+    CHUNKED_BODY)
+
+
+class RejectFirstFilter(filtering.HttpFilter):
+
+    @filtering.handles_request_head
+    def on_request_head(self, request_head):
+        if request_head.url == '/first':
+            return filtering.reject()
+
+
+class TestDownstreamHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.downstream = mock.MagicMock()
+        self.downstream.closed = mock.Mock(return_value=False)
+        self.connect_upstream = mock.Mock()
+
+    def _requested_urls(self):
+        return [args[0].url for args, kwargs in
+                self.connect_upstream.call_args_list]
+
+    def test_pipelined_requests_are_proxied_in_order(self):
+        handler = DownstreamHandler(
+            self.downstream, HttpFilterPipeline(), self.connect_upstream)
+        parser = RequestParser(handler, batch_headers=True)
+
+        consumed = parser.execute(PIPELINED_GETS)
+
+        self.assertEqual(consumed, len(PIPELINED_GETS))
+        self.assertEqual(self._requested_urls(), ['/first'])
+
+        handler.on_upstream_connect(mock.MagicMock())
+        handler.on_response_complete()
+        self.assertEqual(self._requested_urls(), ['/first', '/second'])
+
+        handler.on_upstream_connect(mock.MagicMock())
+        handler.on_response_complete()
+        self.assertEqual(
+            self._requested_urls(), ['/first', '/second', '/third'])
+
+        # Each request gets its own message
+        requests = [args[0] for args, kwargs in
+                    self.connect_upstream.call_args_list]
+        for request in requests:
+            self.assertEqual(len(request.get_header('host').values), 1)
+
+    def test_holds_reading_when_pipeline_is_full(self):
+        on_hold = mock.Mock()
+        on_release = mock.Mock()
+
+        handler = DownstreamHandler(
+            self.downstream, HttpFilterPipeline(), self.connect_upstream,
+            max_pipelined=1, on_hold=on_hold, on_release=on_release)
+        parser = RequestParser(handler, batch_headers=True)
+        on_hold.side_effect = parser.pause
+
+        consumed = parser.execute(PIPELINED_GETS)
+
+        self.assertEqual(on_hold.call_count, 1)
+        self.assertTrue(consumed < len(PIPELINED_GETS))
+        self.assertTrue(PIPELINED_GETS[consumed:].startswith('GET /third'))
+
+        handler.on_upstream_connect(mock.MagicMock())
+        handler.on_response_complete()
+
+        self.assertEqual(on_release.call_count, 1)
+        self.assertEqual(self._requested_urls(), ['/first', '/second'])
+
+    def test_closes_after_last_request(self):
+        handler = DownstreamHandler(
+            self.downstream, HttpFilterPipeline(), self.connect_upstream)
+        parser = RequestParser(handler, batch_headers=True)
+
+        parser.execute('GET / HTTP/1.1\r\nConnection: close\r\n\r\n')
+        handler.on_upstream_connect(mock.MagicMock())
+
+        self.assertFalse(self.downstream.close.called)
+        handler.on_response_complete()
+        self.assertTrue(self.downstream.close.called)
+
+    def test_serves_requests_after_a_rejection(self):
+        self.downstream.write.side_effect = (
+            lambda data, callback=None: callback and callback())
+
+        pipeline = HttpFilterPipeline()
+        pipeline.add_filter(RejectFirstFilter())
+
+        handler = DownstreamHandler(
+            self.downstream, pipeline, self.connect_upstream)
+        parser = RequestParser(handler, batch_headers=True)
+
+        parser.execute(PIPELINED_GETS)
+
+        self.assertEqual(self._requested_urls(), ['/second'])
+        self.assertFalse(self.downstream.close.called)
+
+    def test_forwards_chunked_bodies_as_read(self):
+        handler = DownstreamHandler(
+            self.downstream, HttpFilterPipeline(), self.connect_upstream)
+        parser = RequestParser(handler, batch_headers=True, raw_chunks=True)
+        upstream = mock.MagicMock()
+
+        parser.execute(CHUNKED_POST)
+        handler.on_upstream_connect(upstream)
+
+        written = ''.join(
+            str(args[0]) for args, kwargs in upstream.write.call_args_list)
+        self.assertEqual(written, CHUNKED_BODY)
+
+
+class JsonBodyFilter(filtering.HttpFilter):
+
+    def __init__(self):
+        self.bodies = list()
+
+    @filtering.handles_request_head
+    def on_request_head(self, request_head):
+        content_type = request_head.get_header('content-type')
+
+        if content_type and content_type.values[0] == 'application/json':
+            return filtering.intercept_body()
+
+    @filtering.handles_request_body(on_demand=True)
+    def on_request_body(self, body_part, output):
+        self.bodies.append(str(body_part))
+
+
+class TestDownstreamHandlerBodies(unittest.TestCase):
+
+    def setUp(self):
+        self.downstream = mock.MagicMock()
+        self.downstream.closed = mock.Mock(return_value=False)
+        self.connect_upstream = mock.Mock()
+        self.body_filter = JsonBodyFilter()
+
+        pipeline = HttpFilterPipeline()
+        pipeline.add_filter(self.body_filter)
+
+        self.handler = DownstreamHandler(
+            self.downstream, pipeline, self.connect_upstream)
+        self.handler.parser = RequestParser(
+            self.handler, batch_headers=True)
+
+    def _proxied_request(self):
+        return self.connect_upstream.call_args[0][0]
+
+    def test_bodies_no_filter_wants_keep_their_framing(self):
+        self.handler.parser.execute(TEXT_POST)
+        request = self._proxied_request()
+
+        self.assertEqual(self.body_filter.bodies, [])
+        self.assertTrue(self.handler.parser.raw_chunks)
+        self.assertIsNotNone(request.get_header('content-length'))
+        self.assertIsNone(request.get_header('transfer-encoding'))
+
+    def test_bodies_filters_ask_for_are_intercepted(self):
+        self.handler.parser.execute(JSON_POST)
+        request = self._proxied_request()
+
+        self.assertEqual(self.body_filter.bodies, ['{}'])
+        self.assertFalse(self.handler.parser.raw_chunks)
+        self.assertIsNone(request.get_header('content-length'))
+        self.assertEqual(
+            request.get_header('transfer-encoding').values, ['chunked'])
+
+
+class AsyncRequestFilter(filtering.HttpFilter):
+
+    def __init__(self):
+        self.futures = list()
+
+    @filtering.handles_request_head
+    def on_request_head(self, request_head):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+class TestDownstreamHandlerSuspension(AsyncTestCase):
+
+    def setUp(self):
+        super(TestDownstreamHandlerSuspension, self).setUp()
+        self.downstream = mock.MagicMock()
+        self.downstream.closed = mock.Mock(return_value=False)
+        self.connect_upstream = mock.Mock()
+
+    def test_reading_is_held_until_filter_action_resolves(self):
+        on_hold = mock.Mock()
+        on_release = mock.Mock()
+        async_filter = AsyncRequestFilter()
+
+        pipeline = HttpFilterPipeline()
+        pipeline.add_filter(async_filter)
+
+        handler = DownstreamHandler(
+            self.downstream, pipeline, self.connect_upstream,
+            on_hold=on_hold, on_release=on_release)
+        parser = RequestParser(handler, batch_headers=True)
+        on_hold.side_effect = parser.pause
+
+        consumed = parser.execute(PIPELINED_GETS)
+
+        self.assertEqual(on_hold.call_count, 1)
+        self.assertTrue(PIPELINED_GETS[consumed:].startswith('GET /second'))
+        self.assertFalse(self.connect_upstream.called)
+
+        on_release.side_effect = lambda: self.io_loop.add_callback(self.stop)
+        async_filter.futures[0].set_result(filtering.next())
+        self.wait()
+
+        self.assertEqual(self.connect_upstream.call_count, 1)
+        self.assertEqual(on_release.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -56,3 +56,53 @@ class TestUpstreamHandler(unittest.TestCase):
 
         self.assertTrue(on_head_got_request)
         self.assertTrue(on_body_got_request)
+
+
+class ObservingBodyFilter(filtering.HttpFilter):
+    def __init__(self):
+        self.seen = 0
+
+    @filtering.handles_response_body
+    def on_response_body(self, msg_part, output):
+        self.seen += len(msg_part)
+
+
+class UppercasingBodyFilter(filtering.HttpFilter):
+    @filtering.handles_response_body
+    def on_response_body(self, msg_part, output):
+        output.write(msg_part.upper())
+
+
+class TestUpstreamHandlerBodies(unittest.TestCase):
+    def _handler(self, http_filter):
+        pipeline = HttpFilterPipeline()
+        pipeline.add_filter(http_filter)
+
+        self.downstream = mock.MagicMock()
+        handler = UpstreamHandler(
+            self.downstream, mock.MagicMock(), pipeline, mock.Mock())
+        handler.on_status(200)
+        handler.on_headers_complete()
+        return handler
+
+    def test_unchanged_chunks_are_forwarded_as_is(self):
+        observer = ObservingBodyFilter()
+        handler = self._handler(observer)
+
+        body = 'hello'
+        handler.on_body(bytes=body, length=len(body), is_chunked=False)
+
+        self.assertIs(body, self.downstream.write.call_args[0][0])
+        self.assertEqual(5, observer.seen)
+        self.assertIsNone(handler._accumulator._bytes)
+
+    def test_written_chunks_replace_the_input(self):
+        handler = self._handler(UppercasingBodyFilter())
+
+        handler.on_body(bytes='hello', length=5, is_chunked=False)
+        handler.on_body(bytes='world', length=5, is_chunked=False)
+
+        written = [args[0] for args, kwargs in
+                   self.downstream.write.call_args_list]
+        self.assertEqual(bytearray('HELLO'), written[-2])
+        self.assertEqual(bytearray('WORLD'), written[-1])
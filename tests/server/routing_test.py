@@ -0,0 +1,169 @@
+import mock
+import unittest
+
+from pyrox.http import HttpRequest
+from pyrox.server import routing
+
+
+ROUTES = ['http://a:80', 'http://b:80', 'http://c:80']
+A, B, C = [routing.parse_route_url(route) for route in ROUTES]
+
+
+class WhenRoutingByLoad(unittest.TestCase):
+
+    def test_least_outstanding_avoids_busy_routes(self):
+        router = routing.LeastOutstandingRouter(ROUTES)
+        router.on_request_start(A)
+        router.on_request_start(B)
+
+        self.assertEqual(C, router.get_next())
+
+        router.on_request_start(C)
+        router.on_request_complete(B, 0.1)
+        self.assertEqual(B, router.get_next())
+
+    def test_least_outstanding_shares_idle_routes(self):
+        router = routing.LeastOutstandingRouter(ROUTES)
+
+        picked = set(router.get_next() for _ in range(3))
+        self.assertEqual(set([A, B, C]), picked)
+
+    def test_failures_end_requests(self):
+        router = routing.LeastOutstandingRouter(ROUTES)
+        router.on_request_start(A)
+        router.on_request_failed(A)
+        router.on_request_failed(A)
+
+        self.assertEqual(0, router.outstanding(A))
+
+    def test_power_of_two_picks_the_less_busy_choice(self):
+        router = routing.PowerOfTwoRouter(ROUTES)
+        router.on_request_start(A)
+
+        with mock.patch.object(routing.random, 'sample',
+                               return_value=[A, B]):
+            self.assertEqual(B, router.get_next())
+
+    def test_ewma_prefers_faster_routes(self):
+        router = routing.EwmaRouter(ROUTES, decay=10.0)
+        router.on_request_complete(A, 0.5, now=0.0)
+        router.on_request_complete(B, 0.1, now=0.0)
+
+        with mock.patch.object(routing.random, 'sample',
+                               return_value=[A, B]):
+            self.assertEqual(B, router.get_next())
+
+    def test_ewma_decays_old_measurements(self):
+        router = routing.EwmaRouter(ROUTES, decay=10.0)
+        router.on_request_complete(A, 1.0, now=0.0)
+        router.on_request_complete(A, 0.0, now=10.0)
+
+        self.assertAlmostEqual(0.3679, router.latency(A), places=4)
+
+    def test_routers_are_created_by_name(self):
+        self.assertIsInstance(routing.new_router(routing.EWMA, ROUTES),
+                              routing.EwmaRouter)
+
+        with self.assertRaises(ValueError):
+            routing.new_router('fastest', ROUTES)
+
+
+def request_for(url, **headers):
+    request = HttpRequest()
+    request.url = url
+
+    for name, value in headers.items():
+        request.header(name).values.append(value)
+    return request
+
+
+class WhenRoutingByHash(unittest.TestCase):
+
+    def test_same_path_goes_to_the_same_route(self):
+        router = routing.ConsistentHashRouter(ROUTES)
+        route = router.get_next(request_for('/images/cat.png'))
+
+        for _ in range(10):
+            self.assertEqual(route, router.get_next(
+                request_for('/images/cat.png?size=large')))
+
+    def test_keys_spread_over_routes(self):
+        router = routing.ConsistentHashRouter(ROUTES)
+        picked = set(router.get_next(request_for('/{}'.format(idx)))
+                     for idx in range(100))
+
+        self.assertEqual(set([A, B, C]), picked)
+
+    def test_adding_a_route_only_moves_keys_to_it(self):
+        router = routing.ConsistentHashRouter(ROUTES)
+        paths = ['/{}'.format(idx) for idx in range(1000)]
+        before = [router.get_next(request_for(path)) for path in paths]
+
+        router = routing.ConsistentHashRouter(ROUTES + ['http://d:80'])
+        after = [router.get_next(request_for(path)) for path in paths]
+
+        moved = [new for old, new in zip(before, after) if old != new]
+        self.assertTrue(0 < len(moved) < 400)
+        self.assertEqual(set([('d', 80, routing.PROTOCOL_HTTP)]), set(moved))
+
+    def test_overloaded_routes_spill_over(self):
+        router = routing.ConsistentHashRouter(ROUTES, load_factor=1.0)
+        request = request_for('/hot')
+        route = router.get_next(request)
+        router.on_request_start(route)
+
+        spilled = router.get_next(request)
+        self.assertNotEqual(route, spilled)
+
+        router.on_request_complete(route, 0.1)
+        self.assertEqual(route, router.get_next(request))
+
+    def test_unhealthy_routes_hand_their_keys_on(self):
+        router = routing.ConsistentHashRouter(ROUTES)
+        paths = ['/{}'.format(idx) for idx in range(300)]
+        before = [router.get_next(request_for(path)) for path in paths]
+
+        router.set_healthy(A, False)
+        after = [router.get_next(request_for(path)) for path in paths]
+
+        self.assertNotIn(A, after)
+        for old, new in zip(before, after):
+            if old != A:
+                self.assertEqual(old, new)
+
+    def test_header_keys(self):
+        router = routing.ConsistentHashRouter(ROUTES, key='header:X-Tenant')
+        route = router.get_next(request_for('/a', **{'X-Tenant': 'acme'}))
+
+        self.assertEqual(route, router.get_next(
+            request_for('/b', **{'x-tenant': 'acme'})))
+
+    def test_cookie_keys(self):
+        router = routing.ConsistentHashRouter(ROUTES, key='cookie:session')
+        route = router.get_next(
+            request_for('/a', Cookie='theme=dark; session=abc'))
+
+        self.assertEqual(route, router.get_next(
+            request_for('/b', Cookie='session=abc')))
+
+    def test_requests_without_keys_go_to_the_least_loaded_route(self):
+        router = routing.ConsistentHashRouter(ROUTES, key='cookie:session')
+        router.on_request_start(A)
+        router.on_request_start(C)
+
+        self.assertEqual(B, router.get_next(request_for('/')))
+
+    def test_unknown_keys_are_rejected(self):
+        with self.assertRaises(ValueError):
+            routing.ConsistentHashRouter(ROUTES, key='body')
+
+    def test_hash_options_are_passed_by_name(self):
+        router = routing.new_router(
+            routing.CONSISTENT_HASH, ROUTES, 'header:Host', 2.0)
+
+        self.assertIsInstance(router, routing.ConsistentHashRouter)
+        self.assertEqual(2.0, router._load_factor)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import mock
+import unittest
+
+from pyrox.tstream.iostream import SocketIOHandler, WriteQueue
+
+
+class WhenGatheringQueuedWrites(unittest.TestCase):
+
+    def setUp(self):
+        self.write_queue = WriteQueue()
+        self.write_queue.extend(['head', 'body'])
+        self.write_queue.append('tail')
+
+    def _gathered(self):
+        return ''.join(
+            memoryview(src).tobytes() for src in self.write_queue.gather())
+
+    def test_gathers_queued_buffers_in_order(self):
+        self.assertEqual('headbodytail', self._gathered())
+
+    def test_gather_is_limited(self):
+        self.assertEqual(['head', 'body'], self.write_queue.gather(2))
+
+    def test_advancing_across_buffers(self):
+        self.write_queue.advance(6)
+        self.assertEqual('dytail', self._gathered())
+
+    def test_advancing_past_everything_empties_the_queue(self):
+        self.write_queue.advance(12)
+        self.assertFalse(self.write_queue.has_next())
+
+
+class WhenCoalescingQueuedWrites(unittest.TestCase):
+
+    def setUp(self):
+        self.write_queue = WriteQueue()
+
+    def test_small_buffers_are_joined(self):
+        self.write_queue.extend(['5\r\n', memoryview('hello'), '\r\n'])
+
+        self.assertEqual('5\r\nhello\r\n', self.write_queue.coalesce())
+
+        self.write_queue.advance(10)
+        self.assertFalse(self.write_queue.has_next())
+
+    def test_large_buffers_are_not_copied(self):
+        body = 'x' * 100
+        self.write_queue.extend([body, 'tail'])
+
+        self.assertIs(body, self.write_queue.coalesce(max_bytes=64))
+
+    def test_partial_sends_continue_where_they_left_off(self):
+        self.write_queue.extend(['head', 'body'])
+        self.write_queue.coalesce()
+        self.write_queue.advance(3)
+
+        self.assertEqual(
+            'dbody', memoryview(self.write_queue.coalesce()).tobytes())
+
+    def test_unicode_is_sent_as_bytes(self):
+        self.write_queue.append(u'h\xe9llo')
+        self.write_queue.advance(3)
+
+        self.assertEqual(
+            'llo', memoryview(self.write_queue.coalesce()).tobytes())
+
+
+class WhenSendingQueuedWrites(unittest.TestCase):
+
+    def setUp(self):
+        self.sock = mock.Mock()
+        self.sock.fileno.return_value = 1
+        self.sends = list()
+
+        self.handler = SocketIOHandler(
+            self.sock, io_loop=mock.Mock(READ=1, WRITE=4, ERROR=24))
+        self.handler.write(['head', 'body', 'tail'])
+
+    def _send(self, sent):
+        def send(src):
+            self.sends.append(memoryview(src).tobytes())
+            return sent
+        return send
+
+    def _sendmsg(self, sent_counts):
+        sent_counts = list(sent_counts)
+
+        def sendmsg(srcs):
+            self.sends.append(
+                [memoryview(src).tobytes() for src in srcs])
+            return sent_counts.pop(0)
+        return sendmsg
+
+    def test_gathering_sockets_send_every_buffer_at_once(self):
+        self.handler._gathers = True
+        self.sock.sendmsg.side_effect = self._sendmsg([6, 6])
+
+        self.handler.handle_write()
+
+        self.assertEqual(
+            [['head', 'body', 'tail'], ['dy', 'tail']], self.sends)
+        self.assertFalse(self.sock.send.called)
+
+    def test_gathering_a_single_buffer_sends_it_as_is(self):
+        self.handler._gathers = True
+        self.handler._write_queue.advance(8)
+        self.sock.send.side_effect = self._send(4)
+
+        self.handler.handle_write()
+
+        self.assertEqual(['tail'], self.sends)
+        self.assertFalse(self.sock.sendmsg.called)
+
+    def test_other_sockets_send_joined_buffers(self):
+        self.handler._gathers = False
+        self.sock.send.side_effect = self._send(12)
+
+        self.handler.handle_write()
+
+        self.assertEqual(['headbodytail'], self.sends)
+
+
+if __name__ == '__main__':
+    unittest.main()